@@ -12,9 +12,8 @@ class _SmuModule(types.ModuleType):
         super().__setattr__(name, value)
 
 
-globals().update(smu_parts.public_exports())
-sys.modules[__name__].__class__ = _SmuModule
-
-
 if __name__ == "__main__":
-    main()
+    smu_parts.run_cli()
+else:
+    globals().update(smu_parts.public_exports())
+    sys.modules[__name__].__class__ = _SmuModule
@@ -1,88 +1,186 @@
 """Package exports for the set-me-up installer CLI."""
 
-from . import core
-from . import profile_commands
-from . import catalog_registry
-from . import adapters
-from . import catalog_packs
-from . import nix_provisioning
-from . import provisioning_adapters
-from . import provisioning_tools
-from . import provisioning_preflight
-from . import blueprint_providers
-from . import blueprint_tools
-from . import vps_tools
-from . import provisioning_cli
-from .ops import adapter_dashboard
-from .ops import machine_profiles
-from . import setup_profiles
-from .ops import trust_runtime
-from .ops import secrets_runtime
-from . import doctors_and_system
-from . import module_discovery
-from . import module_lifecycle
-from . import state
-from .ops import rollback_runtime
-from . import client_update
-from . import repository_update
-from . import update_runtime
-from . import product_runtime
-from .ops import conformance_runtime
-from .ops import support_runtime
-from .ops import plan_runtime
-from .ops import release_notes_runtime
-from .ops import migration_pr_runtime
-from .ops import nix_doctor_runtime
-from .ops import productization_runtime
-from .ops import product_ops_runtime
-from . import operability_runtime
-from . import cli
-
-
-PARTS = (
-    core,
-    profile_commands,
-    catalog_registry,
-    adapters,
-    catalog_packs,
-    nix_provisioning,
-    provisioning_adapters,
-    provisioning_tools,
-    provisioning_preflight,
-    blueprint_providers,
-    blueprint_tools,
-    vps_tools,
-    adapter_dashboard,
-    provisioning_cli,
-    machine_profiles,
-    setup_profiles,
-    trust_runtime,
-    secrets_runtime,
-    doctors_and_system,
-    module_discovery,
-    module_lifecycle,
-    state,
-    rollback_runtime,
-    client_update,
-    repository_update,
-    update_runtime,
-    product_runtime,
-    conformance_runtime,
-    support_runtime,
-    plan_runtime,
-    release_notes_runtime,
-    migration_pr_runtime,
-    nix_doctor_runtime,
-    productization_runtime,
-    product_ops_runtime,
-    operability_runtime,
-    cli,
+import importlib
+import sys
+
+
+# Parts in caches/ each own one persistent cache under ~/.cache/set-me-up
+# (module index, file digests, tree index, HTTP bodies, drift scan) and its
+# invalidation rules; ops/ holds command runtimes and provisioning machinery.
+PART_NAMES = (
+    "core",
+    "caches.http_cache",
+    "profile_commands",
+    "catalog_registry",
+    "adapters",
+    "catalog_packs",
+    "nix_provisioning",
+    "provisioning_adapters",
+    "provisioning_tools",
+    "provisioning_preflight",
+    "blueprint_providers",
+    "blueprint_tools",
+    "vps_tools",
+    "ops.adapter_dashboard",
+    "provisioning_cli",
+    "ops.machine_profiles",
+    "setup_profiles",
+    "ops.trust_runtime",
+    "ops.secrets_runtime",
+    "ops.bash_worker",
+    "ops.provision_checkpoint",
+    "ops.step_telemetry",
+    "doctors_and_system",
+    "caches.module_index",
+    "module_discovery",
+    "ops.package_snapshot",
+    "ops.provision_fingerprints",
+    "ops.provision_scheduler",
+    "ops.apt_transaction",
+    "module_lifecycle",
+    "caches.file_hashes",
+    "caches.tree_index",
+    "ops.snapshot_store",
+    "ops.state_store",
+    "state",
+    "ops.rollback_runtime",
+    "client_update",
+    "repository_update",
+    "update_runtime",
+    "product_runtime",
+    "ops.conformance_runtime",
+    "ops.support_runtime",
+    "ops.plan_runtime",
+    "ops.release_notes_runtime",
+    "ops.migration_pr_runtime",
+    "ops.nix_doctor_runtime",
+    "caches.drift_scan",
+    "ops.productization_runtime",
+    "ops.product_ops_runtime",
+    "operability_runtime",
+    "cli",
+)
+
+# Parts behind the state ledger, update history, file snapshots and digests.
+_STATE_PARTS = ("caches.file_hashes", "caches.tree_index", "ops.snapshot_store", "ops.state_store", "state")
+# Parts that run module shell steps and resolve module paths.
+_MODULE_RUNTIME_PARTS = (
+    "ops.bash_worker", "ops.provision_checkpoint", "ops.step_telemetry", "doctors_and_system",
+    "caches.module_index", "module_discovery",
+)
+_MODULE_LIFECYCLE_PARTS = _MODULE_RUNTIME_PARTS + (
+    "ops.package_snapshot", "ops.provision_fingerprints", "ops.provision_scheduler", "ops.apt_transaction",
+    "module_lifecycle", *_STATE_PARTS,
+)
+_STATUS_PARTS = ("catalog_registry", "caches.http_cache", "adapters", *_MODULE_LIFECYCLE_PARTS)
+_PRODUCT_OPS_PARTS = (
+    "catalog_registry", "caches.http_cache", "provisioning_adapters", "ops.machine_profiles", "ops.trust_runtime",
+    *_MODULE_LIFECYCLE_PARTS,
+    "caches.drift_scan", "ops.productization_runtime", "ops.product_ops_runtime",
 )
+_PROVISIONING_CLI_PARTS = (
+    "profile_commands", "nix_provisioning", "provisioning_adapters", "provisioning_tools",
+    "provisioning_preflight", "blueprint_tools", "ops.adapter_dashboard", "provisioning_cli",
+    *_MODULE_LIFECYCLE_PARTS,
+    "ops.nix_doctor_runtime",
+)
+_PLAN_PARTS = _PRODUCT_OPS_PARTS + (
+    "profile_commands", "adapters", "ops.secrets_runtime", "ops.rollback_runtime",
+    "product_runtime", "ops.plan_runtime",
+)
+_ROLLBACK_PARTS = _STATUS_PARTS + ("ops.rollback_runtime", "product_runtime")
+
+# Parts each subcommand needs beyond `core` and `cli`. Commands that are not
+# listed here (including the legacy argparse flags) load every part.
+# tests/test_smu_parts_package.py checks each entry against the names its
+# branch of cli.main reaches.
+COMMAND_PARTS = {
+    "help": ("operability_runtime",),
+    "--help": ("operability_runtime",),
+    "bootstrap": _PLAN_PARTS + ("client_update", "operability_runtime"),
+    "init": _PLAN_PARTS + ("client_update", "operability_runtime"),
+    "plan": _PLAN_PARTS,
+    "inventory": _PRODUCT_OPS_PARTS,
+    "facts": _PRODUCT_OPS_PARTS,
+    "lock": _PRODUCT_OPS_PARTS + ("profile_commands", "adapters"),
+    "approval": _PRODUCT_OPS_PARTS,
+    "golden-examples": _PRODUCT_OPS_PARTS,
+    "provenance": _PRODUCT_OPS_PARTS,
+    "policy": _PRODUCT_OPS_PARTS,
+    "machine-profile": ("ops.machine_profiles",),
+    "secrets": ("catalog_registry", *_STATE_PARTS, "ops.secrets_runtime"),
+    "trust": _STATUS_PARTS + ("provisioning_adapters", "ops.trust_runtime"),
+    "support": _STATUS_PARTS + (
+        "profile_commands", "provisioning_adapters", "ops.adapter_dashboard", "ops.machine_profiles",
+        "ops.secrets_runtime", "client_update", "update_runtime", "product_runtime", "ops.support_runtime",
+    ),
+    "conformance": (
+        "catalog_registry", "provisioning_adapters", "blueprint_providers", "blueprint_tools",
+        "vps_tools", *_STATE_PARTS, "ops.conformance_runtime",
+    ),
+    "release-notes": ("catalog_registry", *_STATE_PARTS, "ops.release_notes_runtime"),
+    "migration-pr": ("catalog_registry", *_STATE_PARTS, "ops.migration_pr_runtime"),
+    "release-package": _PRODUCT_OPS_PARTS,
+    "fleet": _PRODUCT_OPS_PARTS,
+    "blueprint-registry": _PRODUCT_OPS_PARTS,
+    "module-graph": _PRODUCT_OPS_PARTS,
+    "tui": _PRODUCT_OPS_PARTS,
+    "post-install": _PRODUCT_OPS_PARTS,
+    "product-docs": _PRODUCT_OPS_PARTS,
+    "drift": _ROLLBACK_PARTS + ("profile_commands", "nix_provisioning", "caches.drift_scan", "ops.productization_runtime"),
+    "rollback-test": _ROLLBACK_PARTS + ("caches.drift_scan", "ops.productization_runtime"),
+    "completion": ("profile_commands", "operability_runtime"),
+    "state": _ROLLBACK_PARTS + (
+        "profile_commands", "nix_provisioning", "caches.drift_scan", "ops.productization_runtime",
+        "ops.product_ops_runtime", "operability_runtime",
+    ),
+    "profile": ("profile_commands", "doctors_and_system"),
+    "provisioning-adapter": _PROVISIONING_CLI_PARTS,
+    "provisioning-adapters": _PROVISIONING_CLI_PARTS,
+    "nix": _PROVISIONING_CLI_PARTS,
+    "blueprint": (
+        "catalog_registry", "nix_provisioning", "provisioning_adapters", "blueprint_providers",
+        "blueprint_tools", "vps_tools", "doctors_and_system", "caches.module_index", "module_discovery",
+    ),
+    "vps": ("catalog_registry", "provisioning_adapters", "blueprint_tools", "vps_tools"),
+    "theme": (
+        "profile_commands", "adapters", *_MODULE_RUNTIME_PARTS,
+    ),
+    "prompt": ("profile_commands", "adapters", "doctors_and_system"),
+    "preset": ("profile_commands", *_MODULE_RUNTIME_PARTS),
+    "catalog": (
+        "profile_commands", "catalog_registry", "caches.http_cache", "adapters", "catalog_packs", "doctors_and_system",
+        *_STATE_PARTS, "product_runtime", "operability_runtime",
+    ),
+    "adapter": (
+        "profile_commands", "adapters", *_MODULE_RUNTIME_PARTS,
+        *_STATE_PARTS, "operability_runtime",
+    ),
+    "status": _STATUS_PARTS,
+    "diff": _STATUS_PARTS + ("profile_commands",),
+    "rollback": _ROLLBACK_PARTS,
+    "update": _ROLLBACK_PARTS + (
+        "profile_commands", "catalog_packs", "client_update", "repository_update",
+        "update_runtime", "operability_runtime",
+    ),
+}
+
+
+def _part_module_name(name):
+    return f"{__name__}.{name}"
 
 
-def _exports_from_parts():
+def loaded_parts():
+    return tuple(
+        sys.modules[_part_module_name(name)]
+        for name in PART_NAMES
+        if _part_module_name(name) in sys.modules
+    )
+
+
+def _exports_from_parts(parts=None):
     exports = {}
-    for module in PARTS:
+    for module in parts if parts is not None else loaded_parts():
         for name, value in vars(module).items():
             if name.startswith("__"):
                 continue
@@ -91,25 +189,54 @@ def _exports_from_parts():
 
 
 def _sync_part_globals():
-    exports = _exports_from_parts()
-    for module in PARTS:
+    parts = loaded_parts()
+    exports = _exports_from_parts(parts)
+    for module in parts:
         vars(module).update(exports)
 
 
-_sync_part_globals()
+def load_parts(names=None):
+    """Import the named parts (all parts when None) and share their globals."""
+    for name in PART_NAMES if names is None else ("core",) + tuple(names):
+        importlib.import_module(_part_module_name(name))
+    _sync_part_globals()
+    return loaded_parts()
+
+
+def command_parts(command):
+    if command not in COMMAND_PARTS:
+        return None
+    return ("cli",) + COMMAND_PARTS[command]
+
+
+def load_command_parts(command):
+    return load_parts(command_parts(command))
+
+
+def run_cli():
+    load_parts(("cli",))
+    return sys.modules[_part_module_name("cli")].main()
+
+
+def __getattr__(name):
+    if name == "PARTS":
+        return load_parts()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def public_exports():
-    exports = _exports_from_parts()
-    exports["__smu_parts__"] = tuple(module.__name__ for module in PARTS)
+    parts = load_parts()
+    exports = _exports_from_parts(parts)
+    exports["__smu_parts__"] = tuple(module.__name__ for module in parts)
     return exports
 
 
 def set_part_attribute(name, value):
+    parts = loaded_parts()
     if name == "__file__":
         installer_root = __import__("os").path.dirname(value)
-        for module in PARTS:
+        for module in parts:
             setattr(module, "installer_root", installer_root)
-    for module in PARTS:
+    for module in parts:
         if hasattr(module, name):
             setattr(module, name, value)
@@ -153,8 +153,7 @@ def _adapter_target_conflicts(entry):
     target = entry["target"]
     if not os.path.lexists(target):
         return False
-    snapshot = file_snapshot(target)
-    if snapshot.get("type") == "symlink" and snapshot.get("link_target") == entry["source"]:
+    if os.path.islink(target) and os.readlink(target) == entry["source"]:
         return False
     source_hash = file_sha256(entry["source"])
     target_hash = file_sha256(target)
@@ -164,6 +163,7 @@ def _adapter_target_conflicts(entry):
 def materialize_adapters(theme=None, prompt=None, dry_run=False, force=False):
     entries = materializable_adapters(theme, prompt)
     state_items = []
+    backup_dir = None
     for entry in entries:
         source = entry["source"]
         target = entry["target"]
@@ -176,12 +176,14 @@ def materialize_adapters(theme=None, prompt=None, dry_run=False, force=False):
         if not force and _adapter_target_conflicts(entry):
             die(f"Adapter target has unmanaged content: {target}. Use --force to overwrite.")
         os.makedirs(os.path.dirname(target), exist_ok=True)
+        if backup_dir is None:
+            backup_dir = new_snapshot_backup_dir()
         state_items.append({
             "kind": entry["kind"],
             "manifest_id": entry["manifest_id"],
             "name": entry["name"],
             "target": target,
-            "before": file_snapshot(target),
+            "before": file_snapshot(target, backup_dir),
         })
         if mode == "symlink":
             tmp_target = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.tmp")
@@ -201,6 +203,8 @@ def materialize_adapters(theme=None, prompt=None, dry_run=False, force=False):
         else:
             die(f"Unsupported adapter materialization mode '{mode}' for {entry['name']}")
 
+    if backup_dir and not os.listdir(backup_dir):
+        os.rmdir(backup_dir)
     if not dry_run:
         _write_adapter_manifest(entries)
         record_state_event("materialize_adapters", state_items)
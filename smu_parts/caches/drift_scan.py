@@ -0,0 +1,254 @@
+from ..core import *
+
+
+DRIFT_SCAN_VERSION = 1
+drift_scan_cache_path = os.path.join(os.path.expanduser("~"), ".cache", "set-me-up", "drift-scan.json")
+
+# Levels listed below each managed directory; stale dotfile links live next
+# to the managed files. Shared directories (below) are never descended into.
+DRIFT_SCAN_MAX_DEPTH = 2
+# Directory names that are never entered: VCS metadata, caches, toolchains.
+DRIFT_SCAN_PRUNED = frozenset((
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv",
+    ".cache", "Cache", "Caches", "cache", ".npm", ".yarn", ".pnpm-store", ".cargo", ".rustup",
+    ".gradle", ".m2", ".nvm", ".pyenv", ".rbenv", ".vscode-server", ".Trash", "Trash", "Library",
+    "go", ".local/share", ".local/state", "snap",
+))
+# Directories this close to "now" may change again within the same mtime tick.
+DRIFT_SCAN_RACY_NS = 2 * 1000 * 1000 * 1000
+# Home directories shared by many programs; loose files there are not reported.
+DRIFT_SHARED_DIRS = (".config", ".local", ".local/bin", "Library/Application Support")
+
+
+def _drift_home():
+    return os.path.expanduser("~")
+
+
+def drift_ignore_patterns():
+    """fnmatch patterns, relative to $HOME, from SMU_DRIFT_IGNORE (colon separated)."""
+    return [pattern for pattern in os.getenv("SMU_DRIFT_IGNORE", "").split(":") if pattern]
+
+
+def _load_drift_scan_cache(home):
+    try:
+        with open(drift_scan_cache_path) as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get("version") == DRIFT_SCAN_VERSION and data.get("home") == home:
+            return data.get("dirs", {})
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _save_drift_scan_cache(home, dirs):
+    try:
+        os.makedirs(os.path.dirname(drift_scan_cache_path), exist_ok=True)
+        tmp_path = f"{drift_scan_cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": DRIFT_SCAN_VERSION, "home": home, "dirs": dirs}, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, drift_scan_cache_path)
+    except OSError:
+        pass
+
+
+def _list_drift_dir(path, st, cached):
+    """Return [name, kind, link_target] rows for path, reusing cached rows when its mtime matches."""
+    if cached and cached.get("mtime") == st.st_mtime_ns:
+        return cached["entries"], True
+    entries = []
+    try:
+        with os.scandir(path) as scan:
+            for entry in scan:
+                if entry.is_symlink():
+                    try:
+                        entries.append([entry.name, "l", os.readlink(entry.path)])
+                    except OSError:
+                        continue
+                elif entry.is_dir(follow_symlinks=False):
+                    entries.append([entry.name, "d", None])
+                elif entry.is_file(follow_symlinks=False):
+                    entries.append([entry.name, "f", None])
+    except OSError:
+        return [], False
+    return entries, False
+
+
+def _walk_drift_tree(home, rel_root, max_depth, skip, cache):
+    """Walk one directory up to max_depth levels down; return (records, files) for the scan."""
+    records = {}
+    files = []
+    stack = [(rel_root, 0)]
+    while stack:
+        rel_dir, depth = stack.pop()
+        path = os.path.join(home, rel_dir) if rel_dir else home
+        try:
+            st = os.lstat(path)
+        except OSError:
+            continue
+        entries, reused = _list_drift_dir(path, st, cache.get(rel_dir))
+        stable = time.time_ns() - st.st_mtime_ns >= DRIFT_SCAN_RACY_NS
+        records[rel_dir] = {"mtime": st.st_mtime_ns if stable else None, "entries": entries, "reused": reused}
+        for name, kind, link_target in entries:
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            if kind == "d":
+                if depth < max_depth and not skip(rel_path, name):
+                    stack.append((rel_path, depth + 1))
+            else:
+                files.append((rel_path, kind, link_target))
+    return records, files
+
+
+def scan_home_tree(home=None, roots=None, max_depth=None, jobs=None):
+    """List files and symlinks in the given directories below $HOME, one thread each.
+
+    `roots` are directories relative to home (default: home itself). $HOME and
+    the shared directories are listed without descending; other roots are
+    walked max_depth levels down. Directories whose mtime is unchanged since
+    the previous scan are not listed again; their entries come from
+    ~/.cache/set-me-up/drift-scan.json.
+    """
+    home = os.path.abspath(home or _drift_home())
+    max_depth = max_depth or int(os.getenv("SMU_DRIFT_MAX_DEPTH") or DRIFT_SCAN_MAX_DEPTH)
+    patterns = drift_ignore_patterns()
+    owned = [os.path.relpath(path, home) for path in (smu_home_dir, installer_root) if path.startswith(home + os.sep)]
+
+    def skip(rel_path, name):
+        return (
+            name in DRIFT_SCAN_PRUNED or rel_path in DRIFT_SCAN_PRUNED or rel_path in owned
+            or any(fnmatch.fnmatch(rel_path, pattern) for pattern in patterns)
+        )
+
+    roots = [root for root in dict.fromkeys(roots or [""]) if not root or not skip(root, os.path.basename(root))]
+    shared = ("", *DRIFT_SHARED_DIRS)
+    started = time.monotonic()
+    cache = _load_drift_scan_cache(home)
+    records, files = {}, {}
+    jobs = jobs or min(8, max(1, len(roots)), (os.cpu_count() or 1) * 2)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        walks = pool.map(lambda root: _walk_drift_tree(home, root, 0 if root in shared else max_depth, skip, cache), roots)
+        for root_records, root_files in walks:
+            records.update(root_records)
+            # Nested roots list some directories twice.
+            files.update((row[0], row) for row in root_files)
+    _save_drift_scan_cache(home, {
+        rel_dir: {"mtime": record["mtime"], "entries": record["entries"]}
+        for rel_dir, record in records.items() if record["mtime"] is not None
+    })
+    return {
+        "home": home,
+        "files": sorted(files.values()),
+        "dirs": len(records),
+        "reused_dirs": sum(1 for record in records.values() if record["reused"]),
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+def rcm_managed_paths():
+    """Return {destination: source} from `lsrc`, or None when rcm is not installed."""
+    if not shutil.which("lsrc"):
+        return None
+    dotfiles_dir = os.path.join(smu_home_dir, "dotfiles")
+    result = subprocess.run(
+        ["lsrc", "-d", dotfiles_dir], capture_output=True, text=True, env={**os.environ, "RCRC": rcrc},
+    )
+    managed = {}
+    for line in result.stdout.splitlines() if result.returncode == 0 else []:
+        destination, separator, source = line.partition("->") if "->" in line else line.partition(":")
+        if separator and destination.strip():
+            managed[os.path.abspath(destination.strip())] = source.strip()
+    return managed
+
+
+def _adapter_target_stale(entry):
+    target, source = entry.get("target"), entry.get("source")
+    if not target:
+        return None
+    if not os.path.lexists(target):
+        return "adapter-target-missing"
+    if entry.get("mode") == "symlink":
+        return None if os.path.islink(target) and os.readlink(target) == source else "adapter-target-replaced"
+    if cached_file_sha256(target) != cached_file_sha256(source):
+        return "adapter-target-changed"
+    return None
+
+
+def drift_file_report(home=None):
+    """Compare a scan of the managed directories with lsrc and the adapter manifest.
+
+    Only $HOME itself and the directories that hold rcm destinations or
+    adapter targets are scanned.
+    """
+    home = os.path.abspath(home or _drift_home())
+    managed = rcm_managed_paths()
+    rcm_destinations = set(managed or {})
+    manifest = _read_adapter_manifest()
+    adapter_targets = {os.path.abspath(entry["target"]) for entry in manifest if entry.get("target")}
+    parents = {os.path.dirname(path) for path in rcm_destinations | adapter_targets if path.startswith(home + os.sep)}
+    scan = scan_home_tree(home, [""] + sorted(os.path.relpath(parent, home) for parent in parents - {home}))
+    dotfiles_dir = os.path.join(smu_home_dir, "dotfiles")
+    dotfiles_roots = tuple({dotfiles_dir + os.sep, os.path.realpath(dotfiles_dir) + os.sep})
+    managed_dirs = {os.path.dirname(path) for path in rcm_destinations | adapter_targets}
+    managed_dirs -= {home, *(os.path.join(home, rel) for rel in DRIFT_SHARED_DIRS)}
+
+    unmanaged, stale = [], []
+    for rel_path, kind, link_target in scan["files"]:
+        path = os.path.join(home, rel_path)
+        if kind == "l":
+            resolved = os.path.normpath(os.path.join(os.path.dirname(path), link_target))
+            if not resolved.startswith(dotfiles_roots):
+                continue
+            if not os.path.exists(resolved):
+                stale.append({"path": path, "reason": "broken-link", "target": resolved})
+            elif managed is not None and path not in rcm_destinations:
+                stale.append({"path": path, "reason": "not-in-lsrc", "target": resolved})
+        elif path in rcm_destinations:
+            unmanaged.append({"path": path, "reason": "shadows-managed-dotfile"})
+        elif os.path.dirname(path) in managed_dirs and path not in adapter_targets:
+            unmanaged.append({"path": path, "reason": "unmanaged-in-managed-dir"})
+
+    for entry in manifest:
+        reason = _adapter_target_stale(entry)
+        if reason:
+            stale.append({"path": entry["target"], "reason": reason, "target": entry.get("source")})
+    save_file_hash_cache()
+    return {
+        "unmanaged_files": unmanaged,
+        "stale_config": stale,
+        "scan": {**{key: scan[key] for key in ("home", "dirs", "reused_dirs", "seconds")}, "rcm": managed is not None},
+    }
+
+
+def _module_package_entries(module):
+    path = get_module_path(module)
+    basename = os.path.basename(path or "")
+    if basename == "packages" and debian:
+        return [(kind, groups) for kind, groups in _packages_entries(path) if kind in ("apt", "deb", "snap", "ppa", "source")]
+    if basename == "brewfile" and macOS:
+        return _brewfile_entries(path) or []
+    return []
+
+
+def drift_package_report(events=None):
+    """Packages of ledger-provisioned modules that are gone, and of uninstalled ones still present."""
+    provisioned = {}
+    for event in read_state_ledger() if events is None else events:
+        for item in event.get("items", []):
+            module = item.get("module") if isinstance(item, dict) else None
+            if module and event.get("operation") == "provision_modules":
+                provisioned[module] = True
+            elif module and event.get("operation") == "uninstall_modules":
+                provisioned[module] = False
+    entries = {module: _module_package_entries(module) for module in sorted(provisioned)}
+    wanted = {entry for module, present in provisioned.items() if present for entry in entries[module]}
+    missing, unexpected = [], []
+    for module, present in sorted(provisioned.items()):
+        for kind, groups in entries[module]:
+            installed = package_snapshot_entry_installed(kind, groups)
+            if present and not installed:
+                missing.append({"module": module, "kind": kind, "name": groups[0]})
+            elif not present and installed and (kind, groups) not in wanted:
+                unexpected.append({"module": module, "kind": kind, "name": groups[0]})
+    return {"missing": missing, "unexpected": unexpected}
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
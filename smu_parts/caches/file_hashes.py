@@ -0,0 +1,86 @@
+from ..core import *
+
+
+FILE_HASH_CACHE_VERSION = 1
+file_hash_cache_path = os.path.join(os.path.expanduser("~"), ".cache", "set-me-up", "file-hashes.json")
+
+# A file whose mtime is this close to "now" may be written again within the
+# same timestamp tick without its stat fingerprint changing, so its digest is
+# not cached until the mtime has settled.
+FILE_HASH_RACY_NS = 2 * 1000 * 1000 * 1000
+
+_file_hash_cache_state = {}
+_file_hash_cache_lock = threading.Lock()
+
+
+def _stat_fingerprint(st):
+    return [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def _load_file_hash_cache():
+    if _file_hash_cache_state.get("path") == file_hash_cache_path:
+        return _file_hash_cache_state["entries"]
+    entries = {}
+    try:
+        with open(file_hash_cache_path) as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get("version") == FILE_HASH_CACHE_VERSION \
+                and isinstance(data.get("files"), dict):
+            entries = data["files"]
+    except (OSError, ValueError):
+        pass
+    _file_hash_cache_state.update({"entries": entries, "path": file_hash_cache_path, "dirty": False})
+    return entries
+
+
+def save_file_hash_cache():
+    """Write the digest cache back if it changed, dropping paths that are gone."""
+    with _file_hash_cache_lock:
+        if not _file_hash_cache_state.get("dirty"):
+            return
+        entries = {path: entry for path, entry in _load_file_hash_cache().items() if os.path.lexists(path)}
+        try:
+            os.makedirs(os.path.dirname(file_hash_cache_path), exist_ok=True)
+            tmp_path = f"{file_hash_cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"version": FILE_HASH_CACHE_VERSION, "files": entries}, f, separators=(",", ":"), sort_keys=True)
+            os.replace(tmp_path, file_hash_cache_path)
+        except OSError:
+            return
+        _file_hash_cache_state.update({"entries": entries, "dirty": False})
+
+
+def cached_file_sha256(path):
+    """Return file_sha256(path), re-hashing only when its stat fingerprint changed.
+
+    Entries are keyed by path and checked against (st_dev, st_ino, st_size,
+    st_mtime_ns). Call save_file_hash_cache() to persist new digests.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    key = os.path.abspath(path)
+    fingerprint = _stat_fingerprint(st)
+    with _file_hash_cache_lock:
+        entry = _load_file_hash_cache().get(key)
+    if entry and entry.get("stat") == fingerprint:
+        return entry["sha256"]
+    digest = file_sha256(path)
+    try:
+        settled = _stat_fingerprint(os.stat(path)) == fingerprint and time.time_ns() - st.st_mtime_ns >= FILE_HASH_RACY_NS
+    except OSError:
+        settled = False
+    with _file_hash_cache_lock:
+        entries = _load_file_hash_cache()
+        if settled:
+            entries[key] = {"stat": fingerprint, "sha256": digest}
+            _file_hash_cache_state["dirty"] = True
+        elif entries.pop(key, None) is not None:
+            _file_hash_cache_state["dirty"] = True
+    return digest
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
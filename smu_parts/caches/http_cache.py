@@ -0,0 +1,204 @@
+from ..core import *
+
+
+HTTP_CACHE_VERSION = 2
+http_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "set-me-up", "http")
+HTTP_CHUNK_SIZE = 1024 * 1024
+
+
+def http_offline():
+    """True when `--offline` or SMU_OFFLINE asks for cached responses only."""
+    return os.getenv("SMU_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+def _http_cache_base(url):
+    return os.path.join(http_cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+
+def _read_http_cache_json(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def http_cache_entry(url):
+    """Return the stored {url, etag, last_modified, sha256, size, fetched_at} for url, or None."""
+    base = _http_cache_base(url)
+    meta = _read_http_cache_json(f"{base}.json")
+    if not meta or meta.get("version") != HTTP_CACHE_VERSION or meta.get("url") != url:
+        return None
+    if not os.path.exists(f"{base}.body"):
+        return None
+    return meta
+
+
+def _write_http_cache_meta(meta_path, meta):
+    tmp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp_path, meta_path)
+
+
+def _discard_http_partial(base):
+    for path in (f"{base}.part", f"{base}.part.json"):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def _verify_http_sha256(url, actual, expected):
+    if expected and actual.lower() != expected.lower():
+        raise ValueError(f"sha256 mismatch for {url}: expected {expected}, got {actual}")
+
+
+def _http_declared_size(response, offset):
+    """Whole-body size from Content-Range (206) or Content-Length, or None."""
+    total = (response.headers.get("Content-Range") or "").rpartition("/")[2]
+    if total.isdigit():
+        return int(total)
+    length = response.headers.get("Content-Length") or ""
+    return offset + int(length) if length.isdigit() else None
+
+
+def _stream_http_body(url, response, path, digest, offset, limit):
+    with open(path, "ab" if offset else "wb") as f:
+        for chunk in iter(lambda: response.read(HTTP_CHUNK_SIZE), b""):
+            offset += len(chunk)
+            if limit is not None and offset > limit:
+                raise ValueError(f"{url} exceeds its declared size of {limit} bytes")
+            digest.update(chunk)
+            f.write(chunk)
+    return offset
+
+
+def http_fetch(url, timeout=30, sha256=None, max_bytes=None, validate=None):
+    """Fetch url through the HTTP cache and return the path of the cached body.
+
+    Stored ETag and Last-Modified validators are sent as If-None-Match and
+    If-Modified-Since; a 304 answer is served from disk. In offline mode
+    only cached bodies are returned and a miss raises URLError.
+
+    New bodies stream into <key>.part and are hashed on the way. Exceeding
+    max_bytes (or the size the server declared) aborts the transfer, and a
+    sha256 mismatch or a ValueError from validate(path) discards it before it
+    replaces the cached body. A transfer cut off by a network error resumes
+    with Range and If-Range on the next call.
+    """
+    return _http_fetch(url, timeout, sha256, max_bytes, validate)[0]
+
+
+def http_fetch_to(url, target, timeout=30, sha256=None, max_bytes=None, validate=None):
+    """Fetch url like http_fetch, link its body to target, and return the body's sha256.
+
+    The link is made before the URL's lock is released, so the digest always
+    describes target even if another process refreshes the cache right after.
+    """
+    return _http_fetch(url, timeout, sha256, max_bytes, validate, target)[1]
+
+
+def _link_http_body(body, target):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(target)
+    try:
+        os.link(body, target)
+    except OSError:
+        shutil.copyfile(body, target)
+
+
+def _http_fetch(url, timeout, sha256, max_bytes, validate, target=None):
+    """Return (cached body path, its sha256) for http_fetch and http_fetch_to."""
+    base = _http_cache_base(url)
+    if http_offline() and not http_cache_entry(url):
+        raise urllib.error.URLError(f"offline and not cached: {url}")
+    os.makedirs(http_cache_dir, exist_ok=True)
+    # One transfer per URL at a time, across threads and processes.
+    with open(f"{base}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if http_offline():
+            meta = http_cache_entry(url)
+            if not meta:
+                raise urllib.error.URLError(f"offline and not cached: {url}")
+            _verify_http_sha256(url, meta["sha256"], sha256)
+            digest = meta["sha256"]
+        else:
+            digest = _http_fetch_locked(url, base, timeout, sha256, max_bytes, validate)
+        if target:
+            _link_http_body(f"{base}.body", target)
+    return f"{base}.body", digest
+
+
+def _http_fetch_locked(url, base, timeout, sha256, max_bytes, validate):
+    """Bring the cached body of url up to date; return its sha256."""
+    meta = http_cache_entry(url)
+    part_path = f"{base}.part"
+    partial = _read_http_cache_json(f"{part_path}.json") if os.path.exists(part_path) else None
+    offset = os.path.getsize(part_path) if partial and partial.get("url") == url else 0
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = partial.get("etag") or partial.get("last_modified")
+    request = urllib.request.Request(url, headers=headers)
+    digest = hashlib.sha256()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            if response.status != 206 or not (response.headers.get("Content-Range") or "").startswith(f"bytes {offset}-"):
+                offset = 0
+            elif offset:
+                with open(part_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(HTTP_CHUNK_SIZE), b""):
+                        digest.update(chunk)
+            validators = {"url": url, "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+            if validators["etag"] or validators["last_modified"]:
+                _write_http_cache_meta(f"{part_path}.json", validators)
+            else:
+                _discard_http_partial(base)
+            declared = _http_declared_size(response, offset)
+            if max_bytes and declared and declared > max_bytes:
+                raise ValueError(f"{url} declares {declared} bytes, more than the pinned {max_bytes}")
+            size = _stream_http_body(url, response, part_path, digest, offset, max_bytes or declared)
+            if declared is not None and size < declared:
+                # Connection closed early; keep the partial body for a Range retry.
+                raise urllib.error.URLError(f"{url} ended after {size} of {declared} bytes")
+        _verify_http_sha256(url, digest.hexdigest(), sha256)
+        if validate:
+            validate(part_path)
+    except urllib.error.HTTPError as e:
+        if e.code != 304 or not meta:
+            if "Range" in headers:
+                _discard_http_partial(base)
+            raise
+        e.close()
+        _discard_http_partial(base)
+        meta["fetched_at"] = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        _write_http_cache_meta(f"{base}.json", meta)
+        _verify_http_sha256(url, meta["sha256"], sha256)
+        return meta["sha256"]
+    except ValueError:
+        _discard_http_partial(base)
+        raise
+    os.replace(part_path, f"{base}.body")
+    _discard_http_partial(base)
+    _write_http_cache_meta(f"{base}.json", {
+        "version": HTTP_CACHE_VERSION,
+        "url": url,
+        "etag": validators["etag"],
+        "last_modified": validators["last_modified"],
+        "sha256": digest.hexdigest(),
+        "size": size,
+        "fetched_at": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    })
+    return digest.hexdigest()
+
+
+def http_fetch_bytes(url, timeout=30):
+    with open(http_fetch(url, timeout=timeout), "rb") as f:
+        return f.read()
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
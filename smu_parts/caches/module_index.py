@@ -0,0 +1,203 @@
+from ..core import *
+
+
+MODULE_MANIFEST = "module.toml"
+MODULE_INDEX_VERSION = 1
+module_index_path = os.path.join(os.path.expanduser("~"), ".cache", "set-me-up", "module-index.json")
+
+# Directory mtimes this close to "now" may still change within the same
+# timestamp tick, so they are recorded as unknown and rescanned next time.
+MODULE_INDEX_RACY_NS = 2 * 1000 * 1000 * 1000
+
+_module_index_state = {}
+# Scheduler threads resolve module paths concurrently; the index is refreshed
+# and saved under this lock.
+_module_index_lock = threading.Lock()
+
+
+def _empty_module_index():
+    return {"version": MODULE_INDEX_VERSION, "module_path": module_path, "dirs": {}}
+
+
+def _stable_mtime_ns(st):
+    if time.time_ns() - st.st_mtime_ns < MODULE_INDEX_RACY_NS:
+        return None
+    return st.st_mtime_ns
+
+
+def _load_module_index():
+    cached = _module_index_state.get("index")
+    if (
+        cached
+        and cached.get("module_path") == module_path
+        and _module_index_state.get("path") == module_index_path
+    ):
+        return cached
+
+    index = _empty_module_index()
+    try:
+        with open(module_index_path) as f:
+            data = json.load(f)
+        if (
+            isinstance(data, dict)
+            and data.get("version") == MODULE_INDEX_VERSION
+            and data.get("module_path") == module_path
+            and isinstance(data.get("dirs"), dict)
+        ):
+            index = data
+    except (OSError, ValueError):
+        pass
+    _module_index_state.update({"index": index, "path": module_index_path, "dirty": False})
+    return index
+
+
+def _save_module_index():
+    if not _module_index_state.get("dirty"):
+        return
+    index = _module_index_state["index"]
+    try:
+        os.makedirs(os.path.dirname(module_index_path), exist_ok=True)
+        tmp_path = f"{module_index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, module_index_path)
+    except OSError:
+        return
+    _module_index_state["dirty"] = False
+
+
+def _module_manifest_adapter_ids(manifest_path):
+    adapters = smu_contract.read_manifest(manifest_path).get("adapters", {})
+    return sorted(adapters.keys()) if isinstance(adapters, dict) else []
+
+
+def _scan_module_dir(rel_dir, path, st):
+    """Build the index record for one directory from a single scandir pass."""
+    basename = os.path.basename(rel_dir)
+    markers = (f"{basename}.sh", "brewfile", "packages", MODULE_MANIFEST)
+    dirs = []
+    files = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    # Match os.walk(followlinks=False): only the bucket level may be a symlink.
+                    if not rel_dir or not entry.is_symlink():
+                        dirs.append(entry.name)
+                elif entry.name in markers:
+                    files.append(entry.name)
+    except OSError:
+        pass
+
+    record = {"mtime_ns": _stable_mtime_ns(st), "dirs": sorted(dirs), "files": sorted(files)}
+    for kind, filename in zip(("script", "brewfile", "packages", "manifest"), markers):
+        if filename in files:
+            record["kind"] = kind
+            record["path"] = filename
+            break
+    return record
+
+
+def _refresh_module_manifest(record, path):
+    if MODULE_MANIFEST not in record["files"]:
+        record.pop("adapters", None)
+        record.pop("manifest_mtime_ns", None)
+        return False
+    manifest_path = os.path.join(path, MODULE_MANIFEST)
+    try:
+        st = os.stat(manifest_path)
+    except OSError:
+        return False
+    if "adapters" in record and record.get("manifest_mtime_ns") == st.st_mtime_ns:
+        return False
+    record["adapters"] = _module_manifest_adapter_ids(manifest_path)
+    record["manifest_mtime_ns"] = _stable_mtime_ns(st)
+    return True
+
+
+def _refresh_module_record(index, rel_dir):
+    """Return the up-to-date record for `rel_dir`, rescanning only if its mtime moved."""
+    path = os.path.join(module_path, rel_dir) if rel_dir else module_path
+    try:
+        st = os.stat(path)
+    except OSError:
+        if index["dirs"].pop(rel_dir, None) is not None:
+            _module_index_state["dirty"] = True
+        return None
+    if not stat.S_ISDIR(st.st_mode):
+        return None
+
+    record = index["dirs"].get(rel_dir)
+    if not record or record.get("mtime_ns") is None or record["mtime_ns"] != st.st_mtime_ns:
+        record = _scan_module_dir(rel_dir, path, st)
+        index["dirs"][rel_dir] = record
+        _module_index_state["dirty"] = True
+    if _refresh_module_manifest(record, path):
+        _module_index_state["dirty"] = True
+    return record
+
+
+def module_index():
+    """Return {relative_dir: record} for every directory under the modules path.
+
+    Every directory is stat'ed, but only directories whose mtime changed since
+    the last run are listed again, and module.toml files are only re-read when
+    their own mtime changed.
+    """
+    with _module_index_lock:
+        index = _load_module_index()
+        visited = set()
+        pending = [""]
+        while pending:
+            rel_dir = pending.pop()
+            record = _refresh_module_record(index, rel_dir)
+            if record is None:
+                continue
+            visited.add(rel_dir)
+            pending.extend(os.path.join(rel_dir, child) if rel_dir else child for child in record["dirs"])
+
+        for rel_dir in set(index["dirs"]) - visited:
+            del index["dirs"][rel_dir]
+            _module_index_state["dirty"] = True
+        _save_module_index()
+        return {rel_dir: record for rel_dir, record in index["dirs"].items() if rel_dir}
+
+
+def indexed_module_record(rel_dir):
+    """Return the index record for one module directory without walking the tree."""
+    rel_dir = os.path.normpath(rel_dir)
+    if rel_dir in ("", "."):
+        return None
+    with _module_index_lock:
+        record = _refresh_module_record(_load_module_index(), rel_dir)
+        _save_module_index()
+        return record
+
+
+def indexed_module_path(rel_dir, script_name):
+    """Resolve a module payload path the same way get_module_path probes files."""
+    record = indexed_module_record(rel_dir)
+    if not record:
+        return None
+    for filename in (script_name, "brewfile", "packages", MODULE_MANIFEST):
+        if filename in record["files"]:
+            return os.path.join(module_path, rel_dir, filename)
+    return None
+
+
+def indexed_module_adapter_ids(module_dir):
+    """Return module.toml adapter ids from the index, or None outside the modules path."""
+    rel_dir = os.path.relpath(os.path.abspath(module_dir), module_path)
+    if rel_dir == os.curdir or rel_dir.startswith(os.pardir):
+        return None
+    record = indexed_module_record(rel_dir)
+    if not record:
+        return None
+    return tuple(record.get("adapters", ()))
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
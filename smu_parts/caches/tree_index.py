@@ -0,0 +1,244 @@
+from ..core import *
+
+
+TREE_INDEX_VERSION = 1
+tree_index_dir = os.path.join(os.path.expanduser("~"), ".cache", "set-me-up", "tree-index")
+
+# Root digests kept so "changed since" can diff against recent lockfiles.
+TREE_INDEX_HISTORY = 16
+TREE_INDEX_SKIP = (".git", "__pycache__", ".mypy_cache")
+# Files modified this close to "now" may change again without a new stat
+# fingerprint, so their digests are not reused by the next refresh.
+TREE_INDEX_RACY_NS = 2 * 1000 * 1000 * 1000
+
+_tree_index_state = {}
+_tree_index_lock = threading.Lock()
+
+
+def tree_index_path(root):
+    return os.path.join(tree_index_dir, f"{hashlib.sha256(os.fsencode(root)).hexdigest()[:16]}.json")
+
+
+def _load_tree_index(root):
+    index = {"version": TREE_INDEX_VERSION, "root": root, "digest": None, "history": [],
+             "files": {}, "nodes": {}, "results": {}}
+    try:
+        with open(tree_index_path(root)) as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get("version") == TREE_INDEX_VERSION and data.get("root") == root:
+            index.update(data)
+    except (OSError, ValueError):
+        pass
+    return index
+
+
+def _save_tree_index(index):
+    """Write the index, keeping only nodes reachable from recent and recorded digests."""
+    keep = {}
+    stack = list(index["history"]) + [result["digest"] for result in index["results"].values()]
+    while stack:
+        digest = stack.pop()
+        if digest in keep or digest not in index["nodes"]:
+            continue
+        keep[digest] = index["nodes"][digest]
+        stack.extend(child for _, kind, child in keep[digest] if kind == "d")
+    index["nodes"] = keep
+    try:
+        os.makedirs(tree_index_dir, exist_ok=True)
+        path = tree_index_path(index["root"])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def _walk_tree(root):
+    """Return ({rel_dir: [child names]}, {rel_path: (kind, stat fingerprint or link target)})."""
+    dirs, files = {}, {}
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        children = []
+        try:
+            with os.scandir(os.path.join(root, rel_dir)) as scan:
+                entries = list(scan)
+        except OSError:
+            entries = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_symlink():
+                    files[rel_path] = ("l", os.readlink(entry.path))
+                elif entry.is_dir(follow_symlinks=False):
+                    if entry.name in TREE_INDEX_SKIP:
+                        continue
+                    stack.append(rel_path)
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    kind = "x" if st.st_mode & 0o111 else "f"
+                    files[rel_path] = (kind, [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns])
+                else:
+                    continue
+            except OSError:
+                continue
+            children.append(entry.name)
+        dirs[rel_dir] = children
+    return dirs, files
+
+
+def refresh_tree_index(root=None, jobs=None):
+    """Bring the Merkle index of root (default $SMU_HOME_DIR) up to date and return it.
+
+    Every file is stat'ed, but only files whose (st_dev, st_ino, st_size,
+    st_mtime_ns) changed are hashed again, in parallel threads. Directory
+    digests roll up the sorted (name, kind, digest) rows of their children.
+    """
+    root = os.path.abspath(root or smu_home_dir)
+    with _tree_index_lock:
+        index = _tree_index_state.get(root) or _load_tree_index(root)
+        if not os.path.isdir(root):
+            index["digest"] = None
+            return index
+        dirs, files = _walk_tree(root)
+        previous = index["files"]
+        digests = {}
+        pending = []
+        for rel_path, (kind, value) in files.items():
+            if kind == "l":
+                digests[rel_path] = hashlib.sha256(os.fsencode(value)).hexdigest()
+            elif previous.get(rel_path, [None])[:4] == value:
+                digests[rel_path] = previous[rel_path][4]
+            else:
+                pending.append(rel_path)
+        workers = jobs or min(8, (os.cpu_count() or 1) * 2)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            hashed = pool.map(lambda rel_path: file_sha256(os.path.join(root, rel_path)), pending)
+            digests.update(zip(pending, hashed))
+
+        now = time.time_ns()
+        index["files"] = {
+            rel_path: value + [digests[rel_path]]
+            for rel_path, (kind, value) in files.items()
+            if kind != "l" and digests[rel_path] and now - value[3] >= TREE_INDEX_RACY_NS
+        }
+        dir_digests = {}
+        for rel_dir in sorted(dirs, key=lambda rel: rel.count("/") + 1 if rel else 0, reverse=True):
+            rows = []
+            for name in sorted(dirs[rel_dir]):
+                rel_path = f"{rel_dir}/{name}" if rel_dir else name
+                if rel_path in dir_digests:
+                    rows.append([name, "d", dir_digests[rel_path]])
+                else:
+                    rows.append([name, files[rel_path][0], digests.get(rel_path) or ""])
+            digest = hashlib.sha256(json.dumps(rows, separators=(",", ":")).encode()).hexdigest()
+            index["nodes"][digest] = rows
+            dir_digests[rel_dir] = digest
+        index["digest"] = dir_digests[""]
+        index["dirs"] = dir_digests
+        if index["digest"] not in index["history"][-1:]:
+            index["history"] = (index["history"] + [index["digest"]])[-TREE_INDEX_HISTORY:]
+        _save_tree_index({key: value for key, value in index.items() if key != "dirs"})
+        _tree_index_state[root] = index
+        return index
+
+
+def tree_digest(root=None):
+    return refresh_tree_index(root)["digest"]
+
+
+def tree_subtree_digest(path, root=None):
+    """Digest of a directory below root as of this process's last refresh, or None."""
+    root = os.path.abspath(root or smu_home_dir)
+    index = _tree_index_state.get(root)
+    if not index or "dirs" not in index:
+        index = refresh_tree_index(root)
+    rel_path = os.path.relpath(os.path.abspath(path), root)
+    return index.get("dirs", {}).get("" if rel_path == "." else rel_path)
+
+
+def _tree_leaves(nodes, row, rel_path):
+    kind, digest = row
+    if kind != "d":
+        return [rel_path]
+    leaves = []
+    for name, child_kind, child in nodes.get(digest, []):
+        leaves.extend(_tree_leaves(nodes, (child_kind, child), f"{rel_path}/{name}" if rel_path else name))
+    return leaves
+
+
+def _diff_tree_nodes(nodes, old, new, rel_dir, changes):
+    old_rows = {name: (kind, digest) for name, kind, digest in nodes[old]}
+    new_rows = {name: (kind, digest) for name, kind, digest in nodes[new]}
+    for name in sorted(set(old_rows) | set(new_rows)):
+        before, after = old_rows.get(name), new_rows.get(name)
+        if before == after:
+            continue
+        rel_path = f"{rel_dir}/{name}" if rel_dir else name
+        if before and after and before[0] == after[0] == "d":
+            _diff_tree_nodes(nodes, before[1], after[1], rel_path, changes)
+        elif before and after and "d" not in (before[0], after[0]):
+            changes.append({"path": rel_path, "change": "modified"})
+        else:
+            if before:
+                changes.extend({"path": path, "change": "removed"} for path in _tree_leaves(nodes, before, rel_path))
+            if after:
+                changes.extend({"path": path, "change": "added"} for path in _tree_leaves(nodes, after, rel_path))
+
+
+def tree_changes_since(digest, root=None, index=None):
+    """Return [{path, change}] between an earlier root digest and now.
+
+    Only subtrees whose digests differ are visited. Returns None when digest
+    is no longer in the index, in which case callers treat everything as changed.
+    Pass index to reuse a refresh_tree_index() result from the same command.
+    """
+    index = index or refresh_tree_index(root)
+    if digest == index["digest"]:
+        return []
+    if index["digest"] is None or digest not in index["nodes"]:
+        return None
+    changes = []
+    _diff_tree_nodes(index["nodes"], digest, index["digest"], "", changes)
+    return changes
+
+
+def tree_files(root=None, index=None):
+    """Relative paths of every file and symlink in the current tree."""
+    index = index or refresh_tree_index(root)
+    return _tree_leaves(index["nodes"], ("d", index["digest"]), "") if index["digest"] else []
+
+
+def tree_index_result(name, root=None):
+    """Return a {digest, value} a command stored against an earlier tree digest."""
+    root = os.path.abspath(root or smu_home_dir)
+    index = _tree_index_state.get(root) or _load_tree_index(root)
+    return index["results"].get(name)
+
+
+def store_tree_index_result(name, digest, value, root=None):
+    root = os.path.abspath(root or smu_home_dir)
+    with _tree_index_lock:
+        index = _tree_index_state.get(root) or _load_tree_index(root)
+        index["results"][name] = {"digest": digest, "value": value}
+        _save_tree_index({key: value for key, value in index.items() if key != "dirs"})
+
+
+def tree_file_sha256(path):
+    """file_sha256, answered from the $SMU_HOME_DIR index while the file's stat is unchanged."""
+    root = os.path.abspath(smu_home_dir)
+    path = os.path.abspath(path)
+    if path.startswith(root + os.sep):
+        index = _tree_index_state.get(root) or _tree_index_state.setdefault(root, _load_tree_index(root))
+        entry = index["files"].get(os.path.relpath(path, root))
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return None
+        if entry and entry[:4] == [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]:
+            return entry[4]
+    return file_sha256(path)
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
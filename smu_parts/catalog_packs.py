@@ -147,7 +147,9 @@ def catalog_install(pack_dir, dry_run=False, force=False):
             print(f"{COL_RED}FAIL{COL_RESET} catalog pack not found: {requested}")
             return 1
         try:
-            pack_dir = _resolve_pack_source(registry_entry["source"], sha256=registry_entry.get("sha256"))
+            pack_dir = _resolve_pack_source(
+                registry_entry["source"], sha256=registry_entry.get("sha256"), size=registry_entry.get("size"),
+            )
         except (OSError, ValueError, zipfile.BadZipFile) as e:
             print(f"{COL_RED}FAIL{COL_RESET} catalog pack could not be loaded: {e}")
             return 1
@@ -21,16 +21,26 @@ def _url_cache_name(source):
     name = "__".join(parts) or "index"
     return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
 
-def _download_url(source, cache_subdir):
+def _download_url(source, cache_subdir, sha256=None, size=None, validate=None):
     if not _is_https_url(source):
         raise ValueError(f"Only https:// catalog sources are supported: {source}")
+    if sha256 and not _valid_sha256(sha256):
+        raise ValueError("sha256 must be 64 hexadecimal characters")
     cache_dir = os.path.join(catalog_cache_path, cache_subdir)
     os.makedirs(cache_dir, exist_ok=True)
     target = os.path.join(cache_dir, _url_cache_name(source))
-    with urllib.request.urlopen(source, timeout=30) as response:
-        with open(target, "wb") as f:
-            shutil.copyfileobj(response, f)
-    return target
+    digest = http_fetch_to(source, target, timeout=30, sha256=sha256, max_bytes=size, validate=validate)
+    return target, digest
+
+def _validate_zip_pack(path):
+    """Reject a downloaded pack that is not a complete, CRC-clean zip archive."""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            corrupt = archive.testzip()
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"downloaded pack is not a valid zip archive: {e}")
+    if corrupt:
+        raise ValueError(f"downloaded pack has a corrupt member: {corrupt}")
 
 def _valid_sha256(value):
     return isinstance(value, str) and bool(re.fullmatch(r"[A-Fa-f0-9]{64}", value))
@@ -42,6 +52,9 @@ def _sha256_file(path):
             digest.update(chunk)
     return digest.hexdigest()
 
+def _valid_pack_size(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
 def _verify_sha256(path, expected):
     if not expected:
         return
@@ -51,19 +64,7 @@ def _verify_sha256(path, expected):
     if actual.lower() != expected.lower():
         raise ValueError(f"sha256 mismatch for downloaded pack: expected {expected}, got {actual}")
 
-def _unpack_zip_pack(archive_path, cache_subdir):
-    target_dir = os.path.join(catalog_cache_path, cache_subdir, os.path.splitext(os.path.basename(archive_path))[0])
-    if os.path.exists(target_dir):
-        shutil.rmtree(target_dir)
-    os.makedirs(target_dir, exist_ok=True)
-    with zipfile.ZipFile(archive_path) as archive:
-        target_root = os.path.abspath(target_dir)
-        for member in archive.infolist():
-            member_path = os.path.abspath(os.path.join(target_dir, member.filename))
-            if not member_path.startswith(target_root + os.sep) and member_path != target_root:
-                raise ValueError(f"Pack archive contains unsafe path: {member.filename}")
-        archive.extractall(target_dir)
-
+def _pack_root(target_dir):
     if os.path.exists(os.path.join(target_dir, "pack.toml")):
         return target_dir
     children = [
@@ -76,6 +77,36 @@ def _unpack_zip_pack(archive_path, cache_subdir):
             return child
     return target_dir
 
+def _unpack_zip_pack(archive_path, digest):
+    """Extract a pack archive once per content digest and return its pack root.
+
+    Trees live in <catalog cache>/extracted/<sha256>/ and are shared by every
+    registry that publishes the same bytes. Extraction goes to a temporary
+    sibling that is renamed into place, so a tree is either complete or absent.
+    """
+    extracted_dir = os.path.join(catalog_cache_path, "extracted")
+    target_dir = os.path.join(extracted_dir, digest.lower())
+    if os.path.isdir(target_dir):
+        return _pack_root(target_dir)
+    os.makedirs(extracted_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".{digest[:12]}.", dir=extracted_dir)
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            tmp_root = os.path.abspath(tmp_dir)
+            for member in archive.infolist():
+                member_path = os.path.abspath(os.path.join(tmp_dir, member.filename))
+                if not member_path.startswith(tmp_root + os.sep) and member_path != tmp_root:
+                    raise ValueError(f"Pack archive contains unsafe path: {member.filename}")
+            archive.extractall(tmp_dir)
+        os.rename(tmp_dir, target_dir)
+    except OSError:
+        # Another process finished the same digest first.
+        if not os.path.isdir(target_dir):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return _pack_root(target_dir)
+
 def _read_catalog_registries():
     manifest = _read_simple_toml(catalog_registries_path)
     registries = manifest.get("registries", {})
@@ -163,6 +194,8 @@ def _catalog_registry_lock_validation_errors(lock):
                 errors.append(f"registry lock: pack {pack_id} missing source")
             if pack.get("sha256") and not _valid_sha256(pack["sha256"]):
                 errors.append(f"registry lock: pack {pack_id} sha256 must be 64 hexadecimal characters")
+            if "size" in pack and not _valid_pack_size(pack["size"]):
+                errors.append(f"registry lock: pack {pack_id} size must be a positive integer")
     return errors
 
 def _catalog_registry_lock_snapshot():
@@ -174,8 +207,7 @@ def _catalog_registry_lock_snapshot():
         "schema_version": smu_contract.SUPPORTED_SCHEMA_VERSION,
         "registries": {},
     }
-    for registry_name, source in sorted(_read_catalog_registries().items()):
-        index_path = _registry_index_path(source, download_remote=True)
+    for registry_name, source, index_path, _error in _catalog_registry_indexes():
         index = _read_simple_toml(index_path)
         packs = {}
         for pack_id, pack in sorted(index.get("packs", {}).items()):
@@ -187,6 +219,8 @@ def _catalog_registry_lock_snapshot():
                 locked_pack["description"] = pack["description"]
             if pack.get("sha256"):
                 locked_pack["sha256"] = pack["sha256"]
+            if pack.get("size"):
+                locked_pack["size"] = pack["size"]
             packs[pack_id] = locked_pack
         lock["registries"][registry_name] = {
             "source": source,
@@ -284,7 +318,7 @@ def _registry_index_path(source, download_remote=False):
         if not _is_https_url(source):
             raise ValueError(f"Registry URL must use https://: {source}")
         if download_remote:
-            return _download_url(source, "registries")
+            return _download_url(source, "registries")[0]
         return None
     source = os.path.abspath(os.path.expanduser(source))
     if os.path.isdir(source):
@@ -337,15 +371,43 @@ def _registry_index_errors(registry_name, source, index):
             errors.append(f"registry {registry_name}: pack {pack_id} source does not exist")
         if pack.get("sha256") and not _valid_sha256(pack["sha256"]):
             errors.append(f"registry {registry_name}: pack {pack_id} sha256 must be 64 hexadecimal characters")
+        if "size" in pack and not _valid_pack_size(pack["size"]):
+            errors.append(f"registry {registry_name}: pack {pack_id} size must be a positive integer")
     return errors
 
+# Registry index paths (or load errors) resolved by this invocation, keyed
+# by catalog cache directory and source, so each remote index is fetched once.
+_registry_index_results = {}
+_registry_index_lock = threading.Lock()
+
+def _catalog_registry_indexes(jobs=None):
+    """Return (name, source, index_path, error) for each configured registry, sorted by name.
+
+    Indexes are resolved on a bounded thread pool; a registry that cannot be
+    loaded only carries its own error.
+    """
+    def resolve(item):
+        registry_name, source = item
+        key = (catalog_cache_path, source)
+        with _registry_index_lock:
+            result = _registry_index_results.get(key)
+        if result is None:
+            try:
+                result = (_registry_index_path(source, download_remote=True), None)
+            except (OSError, ValueError) as e:
+                result = (None, e)
+            if _is_url(source):
+                with _registry_index_lock:
+                    _registry_index_results[key] = result
+        return (registry_name, source, *result)
+
+    return parallel_map(resolve, sorted(_read_catalog_registries().items()), jobs)
+
 def _catalog_registry_entries():
     entries = []
-    for registry_name, source in sorted(_read_catalog_registries().items()):
-        try:
-            index_path = _registry_index_path(source, download_remote=True)
-        except (OSError, ValueError) as e:
-            warn(f"Registry {registry_name} could not be loaded: {e}")
+    for registry_name, source, index_path, error in _catalog_registry_indexes():
+        if error:
+            warn(f"Registry {registry_name} could not be loaded: {error}")
             continue
         if not index_path or not os.path.exists(index_path):
             warn(f"Registry {registry_name} index does not exist: {index_path}")
@@ -366,14 +428,12 @@ def _catalog_registry_entries():
 
 def _catalog_registry_errors():
     errors = []
-    for registry_name, source in sorted(_read_catalog_registries().items()):
+    for registry_name, source, index_path, error in _catalog_registry_indexes():
         if not _valid_catalog_id(registry_name):
             errors.append(f"registry {registry_name} name must be kebab-case")
             continue
-        try:
-            index_path = _registry_index_path(source, download_remote=True)
-        except (OSError, ValueError) as e:
-            errors.append(f"registry {registry_name} could not be loaded: {e}")
+        if error:
+            errors.append(f"registry {registry_name} could not be loaded: {error}")
             continue
         if not index_path or not os.path.exists(index_path):
             errors.append(f"registry {registry_name} index does not exist: {index_path}")
@@ -387,18 +447,16 @@ def _catalog_registry_entry(pack_id):
             return entry
     return None
 
-def _resolve_pack_source(source, sha256=None):
+def _resolve_pack_source(source, sha256=None, size=None):
     if not _is_url(source):
         resolved = os.path.abspath(os.path.expanduser(source))
         _verify_sha256(resolved, sha256)
         if zipfile.is_zipfile(resolved):
-            return _unpack_zip_pack(resolved, "packs")
+            return _unpack_zip_pack(resolved, sha256 or _sha256_file(resolved))
         return resolved
-    downloaded = _download_url(source, "packs")
-    _verify_sha256(downloaded, sha256)
-    if zipfile.is_zipfile(downloaded):
-        return _unpack_zip_pack(downloaded, "packs")
-    return downloaded
+    # sha256 and size are checked while the archive streams in.
+    downloaded, digest = _download_url(source, "packs", sha256=sha256, size=size, validate=_validate_zip_pack)
+    return _unpack_zip_pack(downloaded, digest)
 
 def catalog_search(query=""):
     query = query.lower()
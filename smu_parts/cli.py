@@ -1,21 +1,18 @@
-from .adapters import *
-from .catalog_packs import *
-from .catalog_registry import *
 from .core import *
-from .doctors_and_system import *
-from .module_discovery import *
-from .module_lifecycle import *
-from .profile_commands import *
-from .provisioning_adapters import *
-from .setup_profiles import *
-from .state import *
-from .client_update import *
+from . import load_command_parts
 
 
 def main():
+    load_command_parts(sys.argv[1] if len(sys.argv) > 1 else None)
     if len(sys.argv) > 1:
         command = sys.argv[1]
         command_args = sys.argv[2:]
+        if "--offline" in command_args:
+            os.environ["SMU_OFFLINE"] = "1"
+            command_args = [arg for arg in command_args if arg != "--offline"]
+        if command in ("status", "diff", "plan") and "--brew-bundle-check" in command_args:
+            os.environ["SMU_BREW_BUNDLE_CHECK"] = "1"
+            command_args = [arg for arg in command_args if arg != "--brew-bundle-check"]
         if command in ("help", "--help"):
             raise SystemExit(print_help_topic(command_args))
         if command == "bootstrap" and command_args and command_args[0] == "bundle":
@@ -83,7 +80,11 @@ def main():
                 raise SystemExit(state_timeline_command(command_args[1:]))
             if command_args and command_args[0] == "prune":
                 raise SystemExit(locked_call("state prune", state_prune, command_args[1:]))
-            die("Usage: smu state [timeline|prune] [--json]")
+            if command_args and command_args[0] == "migrate":
+                raise SystemExit(locked_call("state migrate", state_migrate_command, command_args[1:]))
+            if command_args and command_args[0] == "export":
+                raise SystemExit(state_export_command(command_args[1:]))
+            die("Usage: smu state [timeline|prune|migrate|export] [--json]")
         if command == "profile":
             handle_profile_command(command_args)
             return
@@ -127,10 +128,11 @@ def main():
             verbose = "--verbose" in command_args or "-V" in command_args
             show_all = "--all" in command_args
             search = _option_value(command_args, "--search")
+            jobs = parse_jobs(_option_value(command_args, "--jobs"))
             if json_output:
-                print_status_json(search=search, show_all=show_all, verbose=verbose)
+                print_status_json(search=search, show_all=show_all, verbose=verbose, jobs=jobs)
             else:
-                status_modules(search=search, show_all=show_all, verbose=verbose)
+                status_modules(search=search, show_all=show_all, verbose=verbose, jobs=jobs)
             return
         if command == "diff":
             modules = [arg for arg in command_args if not arg.startswith("--")]
@@ -142,6 +144,10 @@ def main():
             dry_run = "--dry-run" in command_args
             if command_args and command_args[0] == "doctor":
                 raise SystemExit(print_rollback_doctor(json_output="--json" in command_args))
+            until = _option_value(command_args, "--until")
+            if until:
+                raise SystemExit(0 if rollback_until_event(
+                    until, dry_run=dry_run, json_output="--json" in command_args) else 1)
             target = _option_value(command_args, "--to")
             if "--json" in command_args:
                 raise SystemExit(print_rollback_preview(json_output=True, event_id=target))
@@ -178,6 +184,7 @@ def main():
                     force_reset=force_reset,
                     dry_run=dry_run,
                     validate=validate,
+                    force="--force" in command_args,
                 ))
             if "schedule" in command_args:
                 actions = [arg for arg in command_args if arg in ("install", "remove", "status")]
@@ -242,8 +249,14 @@ def main():
     parser.add_argument("-u", "--uninstall", action="store_true", help="Uninstall the given modules")
     parser.add_argument("-iu", "--uninstall-interactive", action="store_true", help="Pick modules to uninstall via fzf")
     parser.add_argument("--dry-run", action="store_true", help="With --uninstall: print the plan, do nothing")
+    parser.add_argument("--force", action="store_true", help="With --provision / --interactive: rerun modules whose inputs are unchanged")
+    parser.add_argument("--resume", action="store_true", help="With --provision: continue the last interrupted provisioning batch")
+    parser.add_argument("--module-timeout", metavar="SECONDS", help="With --provision: stop any module that runs longer than SECONDS")
+    parser.add_argument("--timeout", metavar="SECONDS", help="With --provision: stop the whole batch after SECONDS")
+    parser.add_argument("--apt-transaction", action="store_true", help="With --provision / --setup-profile: install all Debian packages modules in one apt transaction")
     parser.add_argument("-y", "--yes", action="store_true", help="With --uninstall: skip the confirmation prompt")
     parser.add_argument("-V", "--verbose", action="store_true", help="With --status: show per-entry detail")
+    parser.add_argument("--jobs", metavar="N", help="With --status / --provision: run up to N modules in parallel")
     parser.add_argument("--search", metavar="QUERY", help="Filter --list-modules / --status / --interactive by substring (case-insensitive)")
     parser.add_argument("--all", action="store_true", help="With --list-modules / --status / --interactive, include modules for other OS buckets")
     parser.add_argument("--theme", choices=supported_themes(), help="Save the selected set-me-up theme before provisioning")
@@ -254,6 +267,12 @@ def main():
 
     args = parser.parse_args()
 
+    if args.apt_transaction:
+        os.environ["SMU_APT_TRANSACTION"] = "1"
+    if args.module_timeout:
+        os.environ["SMU_MODULE_TIMEOUT"] = args.module_timeout
+    if args.timeout:
+        os.environ["SMU_PROVISION_TIMEOUT"] = args.timeout
     if args.preset:
         set_preset(args.preset)
     if args.theme:
@@ -293,11 +312,11 @@ def main():
         return
 
     if args.status_json:
-        print_status_json(search=args.search, show_all=args.all, verbose=args.verbose)
+        print_status_json(search=args.search, show_all=args.all, verbose=args.verbose, jobs=parse_jobs(args.jobs))
         return
 
     if args.status:
-        status_modules(search=args.search, show_all=args.all, verbose=args.verbose)
+        status_modules(search=args.search, show_all=args.all, verbose=args.verbose, jobs=parse_jobs(args.jobs))
         return
 
     if args.diff:
@@ -371,6 +390,14 @@ def main():
         adapter_id = require_available_provisioning_adapter(args.provisioning_adapter)
         modules = list(args.modules)
 
+        if args.resume:
+            checkpoint = read_provision_checkpoint()
+            if not checkpoint:
+                die("There is no interrupted provisioning batch to resume.")
+            provision_modules_batch(checkpoint["modules"], force=args.force,
+                                    jobs=parse_jobs(args.jobs) if args.jobs else 1, resume=True)
+            return
+
         # If the 'base' module is not in the module list, add it to the beginning.
         if adapter_id == DEFAULT_PROVISIONING_ADAPTER and args.base and "base" not in modules:
             modules.insert(0, "base")
@@ -380,7 +407,7 @@ def main():
             modules.remove("base")
 
         if adapter_id == DEFAULT_PROVISIONING_ADAPTER:
-            provision_modules_batch(modules)
+            provision_modules_batch(modules, force=args.force, jobs=parse_jobs(args.jobs) if args.jobs else 1)
             return
         raise SystemExit(apply_provisioning_adapter_modules(adapter_id, modules))
     elif args.interactive:
@@ -395,7 +422,7 @@ def main():
             modules.remove("base")
 
         if adapter_id == DEFAULT_PROVISIONING_ADAPTER:
-            provision_modules_batch(modules)
+            provision_modules_batch(modules, force=args.force, jobs=parse_jobs(args.jobs) if args.jobs else 1)
             return
         raise SystemExit(apply_provisioning_adapter_modules(adapter_id, modules))
     elif args.modules:
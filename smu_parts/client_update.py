@@ -30,9 +30,10 @@ def client_update_status(ref=None):
     repositories = client_update_repository_status()
     drift = config_drift_report()
     return {
-        "update_lock_path": update_lock_path,
+        "state_backend": state_backend(),
+        "update_lock_path": state_record_path(update_lock_path),
         "update_policy_path": update_policy_path,
-        "update_history_path": update_history_path,
+        "update_history_path": state_record_path(update_history_path),
         "last_update": read_update_lock(),
         "history": read_update_history()[-5:],
         "client": client_identity(),
@@ -165,7 +166,7 @@ def update_policy_doctor():
     checks = []
     checks.append({"name": "policy", "status": "present" if os.path.exists(update_policy_path) else "default"})
     checks.append({"name": "policy_schema", "status": "failed" if policy_errors else "passed", "errors": policy_errors})
-    checks.append({"name": "lockfile", "status": "present" if os.path.exists(update_lock_path) else "missing"})
+    checks.append({"name": "lockfile", "status": "present" if read_update_lock() else "missing"})
     checks.append({"name": "config_drift", "status": "failed" if report["config_drift"]["drifted"] else "passed"})
     checks.append({"name": "schedule", "status": "configured" if policy.get("schedule") else "manual"})
     checks.append({"name": "rate_limit", **report["rate_limit"]})
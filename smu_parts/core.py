@@ -1,25 +1,40 @@
 #!/usr/bin/env python3
 
 import argparse
+import atexit
+import codecs
+import concurrent.futures
 import contextlib
+import copy
 import datetime
+import errno
+import fnmatch
 import hashlib
+import heapq
 import importlib.util
 import io
 import json
 import fcntl
 import platform
 import re
+import select
 import subprocess
 import os
 import shlex
 import shutil
+import signal
+import sqlite3
+import stat
 import sys
 import tempfile
+import termios
+import threading
+import time
 import urllib.error
 import urllib.parse
 import urllib.request
 import zipfile
+import zlib
 
 installer_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, os.path.join(installer_root, "scripts"))
@@ -64,6 +79,7 @@ update_launchd_path = os.path.join(config_dir, "launchd", "com.dotbrains.smu-upd
 update_systemd_dir = os.path.join(config_dir, "systemd")
 contracts_path = os.path.join(installer_root, "docs", "json-contracts")
 catalog_cache_path = os.path.join(os.path.expanduser("~"), ".cache", "set-me-up", "catalogs")
+compiled_catalog_path = os.path.join(os.path.expanduser("~"), ".cache", "set-me-up", "compiled-catalogs.json")
 adapter_state_path = os.path.join(config_dir, "adapters")
 adapter_manifest_env_path = os.path.join(adapter_state_path, "manifest.env")
 adapter_manifest_json_path = os.path.join(adapter_state_path, "manifest.json")
@@ -143,6 +159,33 @@ def die(message, exit_code=1):
     print(f"{COL_RED}[error]{COL_RESET} {message}", file=sys.stderr)
     sys.exit(exit_code)
 
+def default_jobs():
+    return min(8, os.cpu_count() or 1)
+
+
+def parse_jobs(value):
+    """Validate a --jobs value; None means the default worker count."""
+    if value is None:
+        return default_jobs()
+    try:
+        jobs = int(value)
+    except (TypeError, ValueError):
+        jobs = 0
+    if jobs < 1:
+        die(f"--jobs must be a positive integer: {value}")
+    return jobs
+
+
+def parallel_map(func, items, jobs=None):
+    """Apply func to items on a bounded thread pool, keeping input order."""
+    items = list(items)
+    jobs = default_jobs() if jobs is None else jobs
+    if jobs <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+        return list(pool.map(func, items))
+
+
 def _parse_profile_line(line):
     if "=" not in line:
         return None, None
@@ -158,44 +201,46 @@ def _parse_profile_line(line):
 def _read_simple_toml(path):
     return smu_contract.read_manifest(path)
 
-def _load_theme_registry():
-    registry_path = os.path.join(colorscheme_module_dir(), "scripts", "theme_registry.py")
-    if not os.path.exists(registry_path):
-        return None
+# Registry scripts imported by this process, keyed by path and checked
+# against (st_size, st_mtime_ns); counters feed `smu doctor`.
+_registry_module_state = {}
+registry_load_counts = {}
 
-    spec = importlib.util.spec_from_file_location("smu_theme_registry", registry_path)
-    if not spec or not spec.loader:
-        return None
 
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    return module
+def _load_registry_module(module_name, registry_path):
+    """Import a registry script once per path and mtime.
 
-def _load_prompt_registry():
-    registry_path = os.path.join(installer_root, "scripts", "prompt_registry.py")
-    if not os.path.exists(registry_path):
+    SourceFileLoader reuses the script's __pycache__ bytecode, so a reload
+    after an edit only recompiles that file.
+    """
+    try:
+        st = os.stat(registry_path)
+    except OSError:
         return None
+    counts = registry_load_counts.setdefault(module_name, {"loads": 0, "hits": 0})
+    cached = _registry_module_state.get(registry_path)
+    if cached and cached[0] == (st.st_size, st.st_mtime_ns):
+        counts["hits"] += 1
+        return cached[1]
 
-    spec = importlib.util.spec_from_file_location("smu_prompt_registry", registry_path)
+    spec = importlib.util.spec_from_file_location(module_name, registry_path)
     if not spec or not spec.loader:
         return None
 
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
+    _registry_module_state[registry_path] = ((st.st_size, st.st_mtime_ns), module)
+    counts["loads"] += 1
     return module
 
-def _load_preset_registry():
-    registry_path = os.path.join(installer_root, "scripts", "preset_registry.py")
-    if not os.path.exists(registry_path):
-        return None
+def _load_theme_registry():
+    return _load_registry_module("smu_theme_registry", os.path.join(colorscheme_module_dir(), "scripts", "theme_registry.py"))
 
-    spec = importlib.util.spec_from_file_location("smu_preset_registry", registry_path)
-    if not spec or not spec.loader:
-        return None
+def _load_prompt_registry():
+    return _load_registry_module("smu_prompt_registry", os.path.join(installer_root, "scripts", "prompt_registry.py"))
 
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    return module
+def _load_preset_registry():
+    return _load_registry_module("smu_preset_registry", os.path.join(installer_root, "scripts", "preset_registry.py"))
 
 def _merge_manifest(parent, child):
     return smu_contract.merge_manifest(parent, child)
@@ -220,6 +265,104 @@ def _read_manifest_dir(path, registry=None):
                 manifests.append(manifest)
     return manifests
 
+COMPILED_CATALOG_VERSION = 1
+# Catalog files modified this close to "now" may change again within the same
+# mtime tick, so a catalog built from them is not memoized.
+COMPILED_CATALOG_RACY_NS = 2 * 1000 * 1000 * 1000
+
+_compiled_catalog_state = {}
+_compiled_catalog_lock = threading.Lock()
+
+
+def _catalog_source_key(paths, registry):
+    """Fingerprint catalog inputs, or return (None, False) when they cannot be fingerprinted.
+
+    The key holds each directory's mtime and the size and mtime of its TOML
+    files (in-place edits do not touch the directory), plus the parser sources.
+    """
+    sources = [smu_contract.__file__]
+    if registry is not None:
+        if not getattr(registry, "__file__", None):
+            return None, False
+        sources.append(registry.__file__)
+    key, newest = [], 0
+    try:
+        for path in paths:
+            if not os.path.isdir(path):
+                key.append([path, None, []])
+                continue
+            files = []
+            with os.scandir(path) as scan:
+                for entry in scan:
+                    if entry.name.endswith(".toml"):
+                        st = entry.stat()
+                        files.append([entry.name, st.st_size, st.st_mtime_ns])
+                        newest = max(newest, st.st_mtime_ns)
+            st = os.stat(path)
+            newest = max(newest, st.st_mtime_ns)
+            key.append([path, st.st_mtime_ns, sorted(files)])
+        for source in sources:
+            st = os.stat(source)
+            key.append([source, st.st_size, st.st_mtime_ns])
+    except OSError:
+        return None, False
+    return key, time.time_ns() - newest >= COMPILED_CATALOG_RACY_NS
+
+
+def _load_compiled_catalogs():
+    try:
+        with open(compiled_catalog_path) as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get("version") == COMPILED_CATALOG_VERSION:
+            return data.get("catalogs", {})
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _save_compiled_catalog(kind, key, manifests):
+    catalogs = _load_compiled_catalogs()
+    catalogs[kind] = {"key": key, "manifests": manifests}
+    try:
+        os.makedirs(os.path.dirname(compiled_catalog_path), exist_ok=True)
+        tmp_path = f"{compiled_catalog_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": COMPILED_CATALOG_VERSION, "catalogs": catalogs}, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, compiled_catalog_path)
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def compiled_catalog(kind, builtin_dir, user_dir, registry=None):
+    """Return {"manifests", "by_id", "ids"} for one catalog layer pair.
+
+    The merged, inheritance-resolved manifests are memoized in-process and in
+    ~/.cache/set-me-up/compiled-catalogs.json while _catalog_source_key()
+    is unchanged. The record is shared; copy manifests before changing them.
+    """
+    key, stable = _catalog_source_key((builtin_dir, user_dir), registry)
+    with _compiled_catalog_lock:
+        record = _compiled_catalog_state.get(kind)
+        if stable and record and record["key"] == key:
+            return record
+        cached = _load_compiled_catalogs().get(kind) if stable else None
+    if cached and cached.get("key") == key:
+        manifests = cached["manifests"]
+    else:
+        manifests = _merge_catalog_manifests(
+            _read_manifest_dir(builtin_dir, registry),
+            _read_manifest_dir(user_dir, registry),
+        )
+        if stable:
+            _save_compiled_catalog(kind, key, manifests)
+    by_id = {entry["id"]: entry for entry in manifests if entry.get("id")}
+    record = {"key": key, "manifests": manifests, "by_id": by_id, "ids": tuple(entry.get("id") for entry in manifests)}
+    if stable:
+        with _compiled_catalog_lock:
+            _compiled_catalog_state[kind] = record
+    return record
+
+
 def _catalog_duplicate_ids(entries):
     return smu_contract.duplicate_ids(entries)
 
@@ -46,14 +46,12 @@ def catalog_doctor():
 
     preset_registry = _load_preset_registry()
     if preset_registry:
+        themes = supported_themes()
+        prompts = supported_prompts()
         for preset in preset_profiles():
             errors.extend(
                 f"presets: {error}"
-                for error in preset_registry.validate_preset(
-                    preset,
-                    supported_themes(),
-                    supported_prompts(),
-                )
+                for error in preset_registry.validate_preset(preset, themes, prompts)
             )
 
     errors.extend(_manifest_authoring_errors("themes", theme_manifests()))
@@ -121,6 +119,9 @@ def doctor():
     failed = theme_doctor(theme) != 0 or failed
     print(f"\n{BOLD}Prompt:{NORMAL} {prompt}")
     failed = prompt_doctor(prompt) != 0 or failed
+    print(f"\n{BOLD}Registries:{NORMAL}")
+    for name, counts in sorted(registry_load_counts.items()):
+        print(f"     {name}: loaded {counts['loads']}, reused {counts['hits']}")
 
     return 1 if failed else 0
 
@@ -302,142 +303,39 @@ def get_module_path(module_name):
     """
     Get the path to the given module.
     If the module is not supported on the current OS or does not exist then return None.
-    """
 
-    def extract_dir_and_module_name(module):
-        """
-        Extract the directory name and module name from the given string.
-        """
-
-        # Get the directory name and module name
-        # e.g., python/pip (module_name)
-        # dir_name = python/pip
-        # module_name = pip
-
-        # Split the string by '/'
-        parts = module.split('/')
-
-        # The directory name is the input string itself
-        dir_name = module
-
-        # The module name is the last part of the split string
-        module_name = parts[-1]
-
-        return dir_name, module_name
-
-    def obtain_universal_module_path(module_name):
-        """
-        Get the path to the given universal module.
-        If the module does not exist then return None.
-        """
-
-        # If the module name contains a '/', then the module is in a subdirectory of the 'universal' directory
-        # e.g., modules/universal/python/pip/pip.sh
-        if '/' in module_name:
-            dir_name, extracted_module_name = extract_dir_and_module_name(module_name)
-            module_dir = os.path.join(module_path, "universal", dir_name)
-            script_path = os.path.join(module_dir, f"{extracted_module_name}.sh")
-            brewfile_path = os.path.join(module_dir, "brewfile")
-            packages_path = os.path.join(module_dir, "packages")
-            manifest_path = os.path.join(module_dir, MODULE_MANIFEST)
-
-            if os.path.exists(script_path):
-                return script_path
-            if os.path.exists(brewfile_path):
-                return brewfile_path
-            if os.path.exists(packages_path):
-                return packages_path
-            if os.path.exists(manifest_path):
-                return manifest_path
-            return None
-
-        # Universal module path
-        # e.g., modules/universal/fonts/fonts.sh
-        module_dir = os.path.join(module_path, "universal", module_name)
-        script_path = os.path.join(module_dir, f"{module_name}.sh")
-        brewfile_path = os.path.join(module_dir, "brewfile")
-        packages_path = os.path.join(module_dir, "packages")
-        manifest_path = os.path.join(module_dir, MODULE_MANIFEST)
-
-        if os.path.exists(script_path):
-            return script_path
-        if os.path.exists(brewfile_path):
-            return brewfile_path
-        if os.path.exists(packages_path):
-            return packages_path
-        if os.path.exists(manifest_path):
-            return manifest_path
-        return None
+    Candidates are probed through the module index in order: a module directly
+    under the modules path (e.g. modules/colorschemes/colorschemes.sh), the
+    current OS bucket (e.g. modules/macos/productivity/rectangle-pro/rectangle-pro.sh),
+    then the 'universal' bucket (e.g. modules/universal/python/pip/pip.sh).
+    Within a directory '<name>.sh' wins over 'brewfile', 'packages' and 'module.toml'.
+    """
 
     # If we are trying to get the 'base' module, then return the path to the 'base' directory
     if module_name == "base":
         return os.path.join(smu_home_dir, "dotfiles/base", f"{module_name}.sh")
 
-    direct_module_dir = os.path.join(module_path, module_name)
-    direct_script_path = os.path.join(direct_module_dir, f"{module_name}.sh")
-    direct_brewfile_path = os.path.join(direct_module_dir, "brewfile")
-    direct_packages_path = os.path.join(direct_module_dir, "packages")
-    direct_manifest_path = os.path.join(direct_module_dir, MODULE_MANIFEST)
-
-    if os.path.exists(direct_script_path):
-        return direct_script_path
-    if os.path.exists(direct_brewfile_path):
-        return direct_brewfile_path
-    if os.path.exists(direct_packages_path):
-        return direct_packages_path
-    if os.path.exists(direct_manifest_path):
-        return direct_manifest_path
-
-    # Determine the OS of the module by checking if the module is part of an OS-specific directory
-    # e.g., modules/macos/fonts/fonts.sh
-    #       modules/debian/fonts/fonts.sh
-    #       modules/arch/fonts/fonts.sh
-    # If the module is not part of an OS-specific directory, then the module is universal, so
-    # check the 'universal' directory for the module
-    # e.g., modules/universal/python/pip/pip.sh
-
-    if not macOS and not debian and not arch:
-        return obtain_universal_module_path(module_name)
-
-    smu_os = ""
-
-    if macOS:
-        smu_os = "macos"
-    elif debian:
-        smu_os = "debian"
-    elif arch:
-        smu_os = "arch"
-
-    # Module path
-    # e.g., modules/macos/fonts/fonts.sh
-    #       modules/macos/productivity/rectangle-pro/rectangle-pro.sh
-    #       modules/debian/fonts/fonts.sh
-    if '/' in module_name:
-        dir_name, extracted_module_name = extract_dir_and_module_name(module_name)
-        module_dir = os.path.join(module_path, smu_os, dir_name)
-        script_path = os.path.join(module_dir, f"{extracted_module_name}.sh")
-        brewfile_path = os.path.join(module_dir, "brewfile")
-        packages_path = os.path.join(module_dir, "packages")
-        manifest_path = os.path.join(module_dir, MODULE_MANIFEST)
-    else:
-        module_dir = os.path.join(module_path, smu_os, module_name)
-        script_path = os.path.join(module_dir, f"{module_name}.sh")
-        brewfile_path = os.path.join(module_dir, "brewfile")
-        packages_path = os.path.join(module_dir, "packages")
-        manifest_path = os.path.join(module_dir, MODULE_MANIFEST)
-
-    if os.path.exists(script_path):
-        return script_path
-    if os.path.exists(brewfile_path):
-        return brewfile_path
-    if os.path.exists(packages_path):
-        return packages_path
-    if os.path.exists(manifest_path):
-        return manifest_path
-    return obtain_universal_module_path(module_name)
+    # e.g., python/pip -> pip.sh
+    script_name = f"{module_name.split('/')[-1]}.sh"
+    candidates = [(module_name, f"{module_name}.sh")]
+    smu_os = _current_os_bucket()
+    if smu_os:
+        candidates.append((os.path.join(smu_os, module_name), script_name))
+    candidates.append((os.path.join("universal", module_name), script_name))
+
+    for rel_dir, candidate_script in candidates:
+        path = indexed_module_path(rel_dir, candidate_script)
+        if path:
+            return path
+    return None
 
 
 def provision_module(module_name):
+    """Run a module's steps; return True, False when it was skipped, or "errored".
+
+    "errored" means a step exited non-zero, so the module must not be recorded
+    as provisioned (nor its input fingerprint).
+    """
     # Get the path to the module
     script_path = get_module_path(module_name)
 
@@ -453,40 +351,44 @@ def provision_module(module_name):
 
     action(f"Running {script_path} module\n")
 
+    # Steps get the module directory as cwd instead of chdir-ing the whole
+    # process, so modules can be provisioned from several threads at once.
     script_dir = os.path.dirname(script_path)
-    os.chdir(script_dir)
+
+    def step(label, command, runnable=None):
+        runnable = runnable or (lambda: run_bash_step(command, cwd=script_dir))
+        returncode, _ = run_module_step(module_name, label, command, script_dir, runnable)
+        if returncode != 0:
+            print(f"'{module_name}' step '{label}' failed with exit code {returncode}", file=sys.stderr)
+        return returncode == 0
 
     if os.path.basename(script_path) == "brewfile":
-        subprocess.run("brew bundle install --file brewfile", shell=True)
-        return True
+        command = "brew bundle install --file brewfile"
+        runnable = lambda: (subprocess.run(command, shell=True, cwd=script_dir).returncode, "")
+        return True if step("brew bundle install", command, runnable) else "errored"
 
     if os.path.basename(script_path) == "packages":
         if not debian:
             warn(f"'{script_path}' is only supported on Debian-based systems, skipping.")
             return False
-        utilities = os.path.join(smu_home_dir, "dotfiles/utilities/utilities.sh")
-        subprocess.run(
-            f"bash -c 'source {utilities} && apt_install_from_file packages'",
-            shell=True,
-        )
-        return True
+        return True if step("apt_install_from_file packages", "apt_install_from_file packages") else "errored"
 
     if os.path.basename(script_path) == MODULE_MANIFEST:
         warn(f"'{script_path}' declares adapter metadata but no rcm payload, skipping.")
         return False
 
-    # Execute before.sh if exists
+    # before.sh, the main script and after.sh run in order; the first one that
+    # exits non-zero stops the module.
     before_script = os.path.join(script_dir, "before.sh")
-    if os.path.exists(before_script):
-        subprocess.run(f"bash -c 'source {before_script}'", shell=True)
+    if os.path.exists(before_script) and not step("before.sh", f"source {shlex.quote(before_script)}"):
+        return "errored"
 
-    # Execute main script
-    subprocess.run(f"bash -c 'source {script_path}'", shell=True)
+    if not step(os.path.basename(script_path), f"source {shlex.quote(script_path)}"):
+        return "errored"
 
-    # Execute after.sh if exists
     after_script = os.path.join(script_dir, "after.sh")
-    if os.path.exists(after_script):
-        subprocess.run(f"bash -c 'source {after_script}'", shell=True)
+    if os.path.exists(after_script) and not step("after.sh", f"source {shlex.quote(after_script)}"):
+        return "errored"
 
     return True
 
@@ -1,7 +1,7 @@
 from .core import *
+from .caches.module_index import *
 
 
-MODULE_MANIFEST = "module.toml"
 LEGACY_MODULE_MARKERS = ("script", "brewfile", "packages")
 
 
@@ -17,7 +17,7 @@ def _current_os_bucket():
 
 
 def discover_modules():
-    """Walk the modules directory and return {bucket: [(name, kind), ...]}.
+    """Return {bucket: [(name, kind), ...]} from the on-disk module index.
 
     A module is any directory containing '<basename>.sh', 'brewfile',
     'packages', or 'module.toml'. `name` is the path relative to the bucket
@@ -28,36 +28,13 @@ def discover_modules():
         return {}
 
     buckets = {}
-    for bucket in sorted(os.listdir(module_path)):
-        bucket_dir = os.path.join(module_path, bucket)
-        if not os.path.isdir(bucket_dir):
+    for rel_dir, record in module_index().items():
+        if not record.get("kind") or os.sep not in rel_dir:
             continue
+        bucket, name = rel_dir.split(os.sep, 1)
+        buckets.setdefault(bucket, []).append((name, record["kind"]))
 
-        modules = []
-        for dirpath, _dirnames, filenames in os.walk(bucket_dir):
-            if dirpath == bucket_dir:
-                continue
-            basename = os.path.basename(dirpath)
-            has_script = f"{basename}.sh" in filenames
-            has_brewfile = "brewfile" in filenames
-            has_packages = "packages" in filenames
-            has_manifest = MODULE_MANIFEST in filenames
-            if has_script or has_brewfile or has_packages or has_manifest:
-                rel = os.path.relpath(dirpath, bucket_dir)
-                if has_script:
-                    kind = "script"
-                elif has_brewfile:
-                    kind = "brewfile"
-                elif has_packages:
-                    kind = "packages"
-                else:
-                    kind = "manifest"
-                modules.append((rel, kind))
-
-        if modules:
-            buckets[bucket] = sorted(modules)
-
-    return buckets
+    return {bucket: sorted(modules) for bucket, modules in sorted(buckets.items())}
 
 
 def module_manifest_path_for_dir(module_dir):
@@ -79,6 +56,9 @@ def module_manifest_adapters(module_dir):
 
 
 def module_adapter_ids(module_dir):
+    adapter_ids = indexed_module_adapter_ids(module_dir)
+    if adapter_ids is not None:
+        return adapter_ids
     return tuple(sorted(module_manifest_adapters(module_dir).keys()))
 
 
@@ -1,5 +1,10 @@
 from .core import *
 from .module_discovery import *
+from .ops.package_snapshot import *
+from .ops.bash_worker import *
+from .ops.provision_fingerprints import *
+from .ops.provision_scheduler import *
+from .ops.apt_transaction import *
 
 
 def _module_basename(script_path):
@@ -42,36 +47,23 @@ def _packages_entries(packages_file):
 
 
 def _packages_entry_installed(kind, groups):
-    """Return True if the given parsed entry is currently installed."""
-    if kind in ("apt", "deb"):
-        package = groups[0]
-        return subprocess.call(
-            f"dpkg -s {package}",
-            shell=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        ) == 0
-    if kind == "snap":
-        package = groups[0]
-        return subprocess.call(
-            f"snap list {package}",
-            shell=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        ) == 0
-    if kind == "ppa":
-        ppa = groups[0]
-        slug = ppa.replace("/", "-")
-        result = subprocess.run(
-            f"ls /etc/apt/sources.list.d/ 2>/dev/null | grep -i {slug}",
-            shell=True,
-            capture_output=True,
-        )
-        return result.returncode == 0
-    if kind == "source":
-        list_name = groups[0]
-        return os.path.exists(f"/etc/apt/sources.list.d/{list_name}")
-    return False
+    """Return True if the given parsed entry is currently installed.
+
+    Answers come from one dpkg status parse, one `snap list` call and one
+    sources.list.d listing per invocation instead of a shell per entry.
+    """
+    return package_snapshot_entry_installed(kind, groups)
+
+
+def _entries_status(entries):
+    if not entries:
+        return ("unknown", "no installable entries declared")
+    present = sum(1 for k, g in entries if _packages_entry_installed(k, g))
+    if present == len(entries):
+        return ("installed", f"{present}/{len(entries)} entries present")
+    if present == 0:
+        return ("missing", f"0/{len(entries)} entries present")
+    return ("partial", f"{present}/{len(entries)} entries present")
 
 
 def module_status(module_name):
@@ -80,10 +72,14 @@ def module_status(module_name):
     Returns a tuple (state, detail) where state is one of:
       - 'installed': everything declared by the module is present
       - 'missing':   nothing declared by the module is present
-      - 'partial':   some entries present, others not (packages-only)
+      - 'partial':   some entries present, others not (packages/brewfile)
       - 'unknown':   *.sh module with no <name>.installed marker, or off-OS
     """
-    script_path = get_module_path(module_name)
+    return module_path_status(get_module_path(module_name))
+
+
+def module_path_status(script_path):
+    """Return module_status() for an already resolved module payload path."""
     if not script_path:
         return ("unknown", "module path not found")
 
@@ -93,26 +89,27 @@ def module_status(module_name):
     if basename == "brewfile":
         if not macOS:
             return ("unknown", "brewfile is only supported on macOS")
+        entries = None if brew_bundle_check_enabled() else _brewfile_entries(script_path)
+        status = _entries_status(entries) if entries is not None else None
+        if status is not None and status[0] in ("installed", "unknown"):
+            return status
+        # brew resolves names the snapshot may not know, so a miss is confirmed
+        # with `brew bundle check` before the module is reported incomplete.
         result = subprocess.run(
             f"cd {script_dir} && brew bundle check --file brewfile --no-upgrade",
             shell=True,
             capture_output=True,
         )
-        return ("installed", None) if result.returncode == 0 else ("missing", None)
+        if result.returncode == 0:
+            return ("installed", None)
+        return status or ("missing", None)
 
     if basename == "packages":
         if not debian:
             return ("unknown", "packages is only supported on Debian-based systems")
         entries = list(_packages_entries(script_path))
         installable = [(k, g) for k, g in entries if k in ("apt", "deb", "snap", "ppa", "source")]
-        if not installable:
-            return ("unknown", "no installable entries declared")
-        present = sum(1 for k, g in installable if _packages_entry_installed(k, g))
-        if present == len(installable):
-            return ("installed", f"{present}/{len(installable)} entries present")
-        if present == 0:
-            return ("missing", f"0/{len(installable)} entries present")
-        return ("partial", f"{present}/{len(installable)} entries present")
+        return _entries_status(installable)
 
     # *.sh module: defer to optional <basename>.installed marker
     name = _module_basename(script_path)
@@ -120,14 +117,8 @@ def module_status(module_name):
     if not os.path.exists(marker):
         return ("unknown", f"no {name}.installed marker")
 
-    utilities = os.path.join(smu_home_dir, "dotfiles/utilities/utilities.sh")
-    result = subprocess.run(
-        f"bash -c 'source {utilities} && source {marker}'",
-        shell=True,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
-    return ("installed", None) if result.returncode == 0 else ("missing", None)
+    returncode, _ = run_bash_step(f"source {shlex.quote(marker)}", capture=True)
+    return ("installed", None) if returncode == 0 else ("missing", None)
 
 
 def _uninstall_steps(script_path):
@@ -152,12 +143,8 @@ def _uninstall_steps(script_path):
                 lambda: subprocess.run("brew bundle cleanup --file brewfile --force", shell=True))
 
     def _packages_step(path):
-        utilities = os.path.join(smu_home_dir, "dotfiles/utilities/utilities.sh")
         return ("apt_remove_from_file packages",
-                lambda: subprocess.run(
-                    f"bash -c 'source {utilities} && apt_remove_from_file packages'",
-                    shell=True,
-                ))
+                lambda: run_bash_step("apt_remove_from_file packages"))
 
     if basename == "brewfile":
         if not macOS:
@@ -180,7 +167,7 @@ def _uninstall_steps(script_path):
 
     steps.append((
         f"{name}.uninstall.sh",
-        lambda: subprocess.run(f"bash -c 'source {uninstaller}'", shell=True),
+        lambda: run_bash_step(f"source {shlex.quote(uninstaller)}"),
     ))
 
     sibling_packages = os.path.join(script_dir, "packages")
@@ -229,13 +216,14 @@ def uninstall_module(module_name, dry_run=False):
     return True
 
 
-def module_status_report(search=None, show_all=False, verbose=False):
+def module_status_report(search=None, show_all=False, verbose=False, jobs=None):
+    """Return status rows in discovery order, probing up to `jobs` modules at once."""
     buckets = discover_modules()
     if not buckets:
         return []
 
     current = _current_os_bucket()
-    report = []
+    rows = []
     for bucket, mods in buckets.items():
         if not show_all and current and bucket not in (current, "universal"):
             continue
@@ -243,22 +231,26 @@ def module_status_report(search=None, show_all=False, verbose=False):
             needle = search.lower()
             mods = [(name, kind) for name, kind in mods if needle in name.lower()]
         for name, kind in mods:
-            state, detail = module_status(name)
-            script_path = get_module_path(name)
-            item = {"bucket": bucket, "name": name, "kind": kind, "state": state}
-            if script_path:
-                adapter_ids = module_adapter_ids(os.path.dirname(script_path))
-                if adapter_ids:
-                    item["adapters"] = list(adapter_ids)
-            if verbose and detail:
-                item["detail"] = detail
-            report.append(item)
+            rows.append((bucket, name, kind, get_module_path(name)))
+
+    # Paths are resolved above so worker threads never touch the module index.
+    statuses = parallel_map(lambda row: module_path_status(row[3]), rows, jobs)
+    report = []
+    for (bucket, name, kind, script_path), (state, detail) in zip(rows, statuses):
+        item = {"bucket": bucket, "name": name, "kind": kind, "state": state}
+        if script_path:
+            adapter_ids = module_adapter_ids(os.path.dirname(script_path))
+            if adapter_ids:
+                item["adapters"] = list(adapter_ids)
+        if verbose and detail:
+            item["detail"] = detail
+        report.append(item)
     return report
 
 
-def status_modules(search=None, show_all=False, verbose=False):
+def status_modules(search=None, show_all=False, verbose=False, jobs=None):
     """Print an installed/missing report grouped by bucket."""
-    rows = module_status_report(search=search, show_all=show_all, verbose=verbose)
+    rows = module_status_report(search=search, show_all=show_all, verbose=verbose, jobs=jobs)
     if not rows:
         if not discover_modules():
             warn(f"No modules found in '{module_path}'.")
@@ -400,10 +392,20 @@ def uninstall_modules_batch(modules, dry_run=False, no_confirm=False):
         ])
 
 
-def provision_modules_batch(modules):
-    """Provision a list of modules and print a per-module summary."""
+def provision_modules_batch(modules, force=False, jobs=1, resume=False):
+    """Provision a list of modules and print a per-module summary.
+
+    Modules run in dependency order from module.toml, up to `jobs` at a time,
+    without overlapping package-manager locks (see module_schedule_nodes);
+    with SMU_APT_TRANSACTION=1 packages modules share one apt transaction.
+    Modules whose input fingerprint matches their last recorded run (and that
+    are not reported missing) are skipped unless `force` is set. Progress is
+    checkpointed (see provision_checkpoint); `resume` skips the modules that an
+    interrupted batch already finished. Returns how many modules errored or
+    were cancelled.
+    """
     if not modules:
-        return
+        return 0
 
     warn("This script will execute the following modules:")
     for module in modules:
@@ -411,43 +413,56 @@ def provision_modules_batch(modules):
 
     warn(f"'{BOLD}set-me-up{NORMAL}' may overwrite existing files in your home directory.")
 
-    provisioned = set()
-    errored = set()
-    skipped = set()
-
-    for module in modules:
+    # One parallel refresh of the blueprint index; fingerprints then reuse its digests.
+    refresh_tree_index()
+    fingerprints = {module: module_input_fingerprint(module) for module in modules}
+    recorded = {} if force else recorded_module_fingerprints()
+    results = {
+        module: ("unchanged", None)
+        for module in modules
+        if not force and module_provision_unchanged(module, fingerprints[module], recorded)
+    }
+    with provision_checkpoint(modules, fingerprints, resume) as checkpoint:
+        results.update(checkpoint["completed"])
+        fingerprints.update(checkpoint["fingerprints"])
+        pending = [module for module in modules if module not in results]
+        start_provision_run(pending, jobs)
         try:
-            was_provisioned = provision_module(module)
-            if was_provisioned:
-                provisioned.add(module)
-            else:
-                skipped.add(module)
-        except subprocess.CalledProcessError as e:
-            errored.add(module)
-            print(f"Failed to provision '{module}': {e}", file=sys.stderr)
-
-    if provisioned:
-        print("Modules that were successfully provisioned:")
-        for module in provisioned:
-            success(f"  - '{BOLD}{module}{NORMAL}'\n")
-
-    if errored:
-        print("Modules that failed to provision:")
-        for module in errored:
-            warn(f"  - '{BOLD}{module}{NORMAL}'\n")
-
-    if skipped:
-        print("Modules that were skipped:")
-        for module in skipped:
-            warn(f"  - '{BOLD}{module}{NORMAL}'\n")
-
+            results = run_provisioning_schedule(
+                modules, checkpoint["run"], jobs, results, apt_transaction_batches(pending), checkpoint["run_batch"]
+            )
+        finally:
+            report_path = finish_provision_run(results)
+    by_status = {
+        status: [module for module in dict.fromkeys(modules) if results[module][0] == status]
+        for status in ("provisioned", "unchanged", "errored", "skipped", "blocked", "cancelled")
+    }
+    if by_status["provisioned"]:
+        reset_package_snapshot()
+
+    for status, heading, show in (
+        ("provisioned", "Modules that were successfully provisioned:", success),
+        ("unchanged", "Modules that were unchanged since their last run (use --force to rerun):", success),
+        ("errored", "Modules that failed to provision:", warn),
+        ("skipped", "Modules that were skipped:", warn),
+        ("blocked", "Modules that were not run:", warn),
+        ("cancelled", "Modules that were stopped before finishing:", warn),
+    ):
+        if by_status[status]:
+            print(heading)
+        for module in by_status[status]:
+            detail = results[module][1]
+            show(f"  - '{BOLD}{module}{NORMAL}'" + (f" ({detail})" if detail else "") + "\n")
+
+    if report_path:
+        print(f"Run report: {report_path}")
     warn("It is recommended to restart your computer to ensure all updates take effect.")
     success(f"Completed running '{BOLD}set-me-up{NORMAL}'.")
-    if provisioned:
+    if by_status["provisioned"]:
         record_state_event("provision_modules", [
-            {"module": module}
-            for module in sorted(provisioned)
+            {"module": module, "fingerprint": fingerprints[module], "report": report_path}
+            for module in sorted(by_status["provisioned"])
         ])
-
+    return len(by_status["errored"]) + len(by_status["cancelled"])
 
 __all__ = [name for name in globals() if not name.startswith("__")]
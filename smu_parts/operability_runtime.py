@@ -45,7 +45,7 @@ HELP_TOPICS = {
         "Write scheduler payloads plus launchd/systemd user-service files.",
     ],
     "rollback": [
-        "smu rollback [doctor|--json|--dry-run|--to event-id]",
+        "smu rollback [doctor|--json|--dry-run|--to event-id|--until event-id]",
         "Preview, inspect guarantees for, or apply rollback events.",
     ],
     "plan": [
@@ -215,7 +215,7 @@ def json_contracts():
             "preset": {"id": DEFAULT_PRESET, "valid": True},
             "theme": {"id": DEFAULT_THEME, "valid": True},
             "prompt": {"id": DEFAULT_PROMPT, "valid": True},
-            "catalogs": {"path": catalogs_path, "errors": [], "trust": read_catalog_trust()},
+            "catalogs": {"path": catalogs_path, "errors": [], "trust": read_catalog_trust(), "registry_loads": {}},
             "adapters": {"conflicted": False, "items": []},
             "updates": {"preflight": "passed", "manifest": {"status": "disabled"}},
         },
@@ -303,7 +303,7 @@ def json_contracts():
         "blueprint-registry": blueprint_registry_payload(),
         "module-graph": module_graph_payload(["base", "rcm"]),
         "tui": tui_payload(["--profile", "vps"]),
-        "drift-doctor": drift_payload("/path/to/blueprint"),
+        "drift-doctor": drift_example_payload("/path/to/blueprint"),
         "post-install": post_install_health_payload("vps"),
         "policy-check": policy_payload(["check", "--preset", "ci"]),
         "rollback-restore-test": rollback_restore_test_payload(),
@@ -411,28 +411,54 @@ def update_manifest_command(argv, json_output=False):
     return 0
 
 
-def state_prune_plan():
-    paths = [update_schedule_path, update_launchd_path]
+def state_prune_plan(events=None):
+    paths = [
+        update_schedule_path, update_launchd_path, module_index_path, compiled_catalog_path,
+        file_hash_cache_path, drift_scan_cache_path,
+    ]
     if os.path.isdir(update_systemd_dir):
         paths.extend(os.path.join(update_systemd_dir, name) for name in os.listdir(update_systemd_dir))
     if os.path.isdir(catalog_cache_path):
         paths.extend(os.path.join(catalog_cache_path, name) for name in os.listdir(catalog_cache_path))
-    return [{"path": path, "exists": os.path.exists(path), "kind": "dir" if os.path.isdir(path) else "file"} for path in paths]
+    if os.path.isdir(http_cache_dir):
+        paths.extend(os.path.join(http_cache_dir, name) for name in os.listdir(http_cache_dir))
+    if os.path.isdir(tree_index_dir):
+        paths.extend(os.path.join(tree_index_dir, name) for name in os.listdir(tree_index_dir))
+    plan = [{"path": path, "exists": os.path.exists(path), "kind": "dir" if os.path.isdir(path) else "file"} for path in paths]
+    # Snapshot blobs that no remaining ledger event references.
+    plan.extend({"path": path, "exists": True, "kind": "blob"} for path in snapshot_blob_gc_plan(events))
+    return plan
 
 
 def state_prune(argv):
     dry_run = "--dry-run" in argv
     json_output = "--json" in argv
-    plan = state_prune_plan()
+    keep_events = _option_value(argv, "--keep-events")
+    events = read_state_ledger()
+    dropped = []
+    if keep_events is not None:
+        if not keep_events.isdigit():
+            die("Usage: smu state prune [--keep-events N] [--dry-run] [--json]")
+        cut = max(0, len(events) - int(keep_events))
+        # Each module's latest provision or uninstall survives: fingerprints and
+        # package drift are read from it.
+        keep = latest_module_event_indexes(events)
+        dropped = [event for index, event in enumerate(events[:cut]) if index not in keep]
+        events = [event for index, event in enumerate(events) if index >= cut or index in keep]
+    plan = state_prune_plan(events)
     if not dry_run:
+        if dropped:
+            write_state_ledger(events)
         for item in plan:
             if not item["exists"]:
                 continue
             shutil.rmtree(item["path"]) if item["kind"] == "dir" else os.unlink(item["path"])
-    payload = {"dry_run": dry_run, "items": plan}
+    payload = {"dry_run": dry_run, "items": plan, "dropped_events": [event.get("id") for event in dropped]}
     if json_output:
         print(json.dumps(payload, indent=2, sort_keys=True))
     else:
+        for event in payload["dropped_events"]:
+            print(f"{'would-drop' if dry_run else 'dropped'}\tevent\t{event}")
         for item in plan:
             print(f"{'would-prune' if dry_run else 'pruned'}\t{item['path']}")
     return 0
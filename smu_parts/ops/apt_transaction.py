@@ -0,0 +1,103 @@
+from ..core import *
+
+
+APT_TRANSACTION_NODE = "apt-transaction"
+
+
+def apt_transaction_enabled():
+    """True when Debian `packages` modules should share one apt transaction."""
+    return bool(debian) and os.getenv("SMU_APT_TRANSACTION") == "1"
+
+
+def apt_transaction_plan(modules):
+    """Collect the `packages` entries of `modules` into one install plan.
+
+    Returns {"modules": {module: entries}, "ppa", "source", "apt", "deb",
+    "snap"}; every kind lists each distinct entry once, in first-seen order,
+    and entries that the package snapshot already reports as installed are
+    dropped so repositories are only added and packages only installed once.
+    """
+    plan = {"modules": {}, "ppa": [], "source": [], "apt": [], "deb": [], "snap": []}
+    for module in modules:
+        script_path = get_module_path(module)
+        if not script_path or os.path.basename(script_path) != "packages":
+            continue
+        entries = list(_packages_entries(script_path))
+        plan["modules"][module] = entries
+        for kind, groups in entries:
+            if groups in plan[kind] or package_snapshot_entry_installed(kind, groups):
+                continue
+            plan[kind].append(groups)
+    return plan
+
+
+def apt_transaction_steps(plan):
+    """Return the ordered (label, command) shell steps for an apt plan.
+
+    Steps run in a scratch directory, which is where `deb` entries are downloaded.
+    """
+    steps = []
+    for (ppa,) in plan["ppa"]:
+        steps.append((f"add ppa:{ppa}", f"sudo add-apt-repository -y -n {shlex.quote('ppa:' + ppa)}"))
+    for name, line in plan["source"]:
+        target = shlex.quote(f"/etc/apt/sources.list.d/{name}")
+        steps.append((f"add source {name}", f"echo {shlex.quote(line)} | sudo tee {target} > /dev/null"))
+    if plan["ppa"] or plan["source"] or plan["apt"] or plan["deb"]:
+        steps.append(("apt-get update", "sudo apt-get update"))
+    packages = [shlex.quote(name) for (name,) in plan["apt"]]
+    for name, url, filename in plan["deb"]:
+        path = shlex.quote(f"./{os.path.basename(filename)}")
+        steps.append((f"download {name}", f"curl -fsSL -o {path} {shlex.quote(url)}"))
+        packages.append(path)
+    if packages:
+        steps.append((
+            f"apt-get install ({len(packages)} packages)",
+            "sudo DEBIAN_FRONTEND=noninteractive apt-get install -y " + " ".join(packages),
+        ))
+    plain = [name for name, args in plan["snap"] if not args]
+    if plain:
+        steps.append((f"snap install ({len(plain)} snaps)", "sudo snap install " + " ".join(map(shlex.quote, plain))))
+    for name, args in plan["snap"]:
+        if args:
+            steps.append((f"snap install {name}", f"sudo snap install {shlex.quote(name)} {args}"))
+    return steps
+
+
+def run_apt_transaction(plan):
+    """Run an apt plan's steps in order; return (status, detail) for the batch.
+
+    Each step's telemetry is recorded for every member module of the plan.
+    """
+    steps = apt_transaction_steps(plan)
+    members = list(plan["modules"])
+    if steps:
+        action(f"Running one apt transaction for {len(members)} packages modules\n")
+    with tempfile.TemporaryDirectory(prefix="smu-apt-") as deb_dir:
+        for label, command in steps:
+            returncode, _ = run_module_step(APT_TRANSACTION_NODE, label, command, deb_dir,
+                                            lambda: run_bash_step(command, cwd=deb_dir), members=members)
+            if returncode != 0:
+                print(f"apt transaction step '{label}' failed with exit code {returncode}", file=sys.stderr)
+                return ("errored", f"apt transaction step '{label}' failed")
+    reset_package_snapshot()
+    return ("provisioned", f"shared apt transaction of {len(members)} modules")
+
+
+def apt_transaction_batches(modules):
+    """Return the shared apt transaction for `modules` as run_provisioning_schedule batches.
+
+    Empty unless apt_transaction_enabled(); `modules` should only list modules
+    that still have to run.
+    """
+    if not apt_transaction_enabled():
+        return []
+    plan = apt_transaction_plan(modules)
+    return [{
+        "name": APT_TRANSACTION_NODE,
+        "members": {module: f"{len(entries)} entries from this module" for module, entries in plan["modules"].items()},
+        "resources": {"apt"},
+        "run": lambda: run_apt_transaction(plan),
+    }]
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
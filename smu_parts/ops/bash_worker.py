@@ -0,0 +1,304 @@
+from ..core import *
+
+
+# The worker reads NUL-separated (cwd, output path, command) requests from the
+# request fd and answers each with the step's exit code on the response fd.
+# stdin/stdout/stderr stay attached to smu, so interactive module scripts keep
+# their terminal; every step runs in its own subshell.
+#
+# An output path of "-" asks for a measured step: the subshell first reports
+# its pid, and once the step is done it execs a short Python snippet that
+# reports the step's RUSAGE_CHILDREN (rusage survives exec) before the exit code.
+_BASH_WORKER_SCRIPT = r'''
+__smu_utilities=$1 __smu_req_fd=$2 __smu_resp_fd=$3 __smu_python=$4 __smu_usage=$5
+if [ -f "$__smu_utilities" ]; then
+    source "$__smu_utilities"
+fi
+set +e
+printf 'ready\n' >&"$__smu_resp_fd"
+while IFS= read -r -d '' -u "$__smu_req_fd" __smu_cwd &&
+        IFS= read -r -d '' -u "$__smu_req_fd" __smu_out &&
+        IFS= read -r -d '' -u "$__smu_req_fd" __smu_cmd; do
+    if [ "$__smu_out" = "-" ]; then
+        (
+            printf 'pid %s\n' "$BASHPID" >&"$__smu_resp_fd"
+            ( set --; cd "$__smu_cwd" && eval "$__smu_cmd" )
+            exec "$__smu_python" -I -S -c "$__smu_usage" "$__smu_resp_fd" "$?"
+        )
+    elif [ -n "$__smu_out" ]; then
+        ( set --; cd "$__smu_cwd" && eval "$__smu_cmd" ) </dev/null >"$__smu_out" 2>&1
+    else
+        ( set --; cd "$__smu_cwd" && eval "$__smu_cmd" )
+    fi
+    printf '%s\n' "$?" >&"$__smu_resp_fd"
+done
+'''
+
+_BASH_WORKER_USAGE = (
+    "import os, resource, sys\n"
+    "u = resource.getrusage(resource.RUSAGE_CHILDREN)\n"
+    "os.write(int(sys.argv[1]), f'usage {u.ru_utime} {u.ru_stime} {u.ru_maxrss}\\n'.encode())\n"
+    "sys.exit(int(sys.argv[2]))\n"
+)
+
+_bash_worker_state = {"idle": [], "started": 0}
+_bash_worker_lock = threading.Lock()
+
+
+def utilities_path():
+    return os.path.join(smu_home_dir, "dotfiles/utilities/utilities.sh")
+
+
+def _open_step_terminal():
+    """Return a (master, slave) pty that passes output through untranslated, or None."""
+    try:
+        master, slave = os.openpty()
+    except OSError:
+        return None
+    with contextlib.suppress(OSError, termios.error):
+        attrs = termios.tcgetattr(slave)
+        attrs[1] &= ~termios.ONLCR
+        termios.tcsetattr(slave, termios.TCSANOW, attrs)
+    with contextlib.suppress(OSError, ValueError, AttributeError):
+        size = fcntl.ioctl(sys.stdout.fileno(), termios.TIOCGWINSZ, b"\0" * 8)
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, size)
+    return master, slave
+
+
+def _start_bash_worker(tee=False):
+    """Start a worker; with tee=True its stdout/stderr are a pty that smu copies out."""
+    utilities = utilities_path()
+    terminal = _open_step_terminal() if tee else None
+    if tee and terminal is None:
+        return None
+    req_r, req_w = os.pipe()
+    resp_r, resp_w = os.pipe()
+    try:
+        proc = subprocess.Popen(
+            ["bash", "-c", _BASH_WORKER_SCRIPT, "smu-bash-worker", utilities, str(req_r), str(resp_w),
+             sys.executable, _BASH_WORKER_USAGE],
+            pass_fds=(req_r, resp_w),
+            stdout=terminal[1] if terminal else None,
+            stderr=terminal[1] if terminal else None,
+        )
+    except OSError:
+        proc = None
+    finally:
+        os.close(req_r)
+        os.close(resp_w)
+        if terminal:
+            os.close(terminal[1])
+    if proc is None:
+        os.close(req_w)
+        os.close(resp_r)
+        if terminal:
+            os.close(terminal[0])
+        return None
+    worker = {
+        "proc": proc,
+        "requests": os.fdopen(req_w, "wb"),
+        "responses": resp_r,
+        "pending": b"",
+        "output": terminal[0] if terminal else None,
+        "decoder": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+        "env": dict(os.environ),
+        "utilities": utilities,
+    }
+    if _read_worker_line(worker) != b"ready":
+        _stop_bash_worker(worker)
+        return None
+    with _bash_worker_lock:
+        _bash_worker_state["started"] += 1
+    return worker
+
+
+def _stop_bash_worker(worker):
+    with contextlib.suppress(OSError):
+        worker["requests"].close()
+    for fd in (worker["responses"], worker["output"]):
+        if fd is not None:
+            with contextlib.suppress(OSError):
+                os.close(fd)
+    try:
+        worker["proc"].wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        worker["proc"].kill()
+        worker["proc"].wait()
+
+
+def _copy_worker_output(worker, log):
+    """Copy what the worker's pty holds to smu's stdout and log; False at EOF."""
+    try:
+        chunk = os.read(worker["output"], 65536)
+    except OSError:
+        chunk = b""
+    if not chunk:
+        return False
+    if log:
+        log.write(chunk)
+    sys.stdout.write(worker["decoder"].decode(chunk))
+    sys.stdout.flush()
+    return True
+
+
+def _read_worker_line(worker, log=None):
+    """Return the worker's next reply line (b"" once it is gone), teeing its pty meanwhile."""
+    while b"\n" not in worker["pending"]:
+        fds = [worker["responses"]] + ([worker["output"]] if worker["output"] is not None else [])
+        ready, _, _ = select.select(fds, [], [])
+        if worker["output"] in ready:
+            _copy_worker_output(worker, log)
+        if worker["responses"] in ready:
+            try:
+                chunk = os.read(worker["responses"], 4096)
+            except OSError:
+                chunk = b""
+            if not chunk:
+                return b""
+            worker["pending"] += chunk
+    line, worker["pending"] = worker["pending"].split(b"\n", 1)
+    return line
+
+
+def _acquire_bash_worker(tee=False):
+    with _bash_worker_lock:
+        matching = [worker for worker in _bash_worker_state["idle"] if (worker["output"] is not None) == tee]
+        worker = matching[-1] if matching else None
+        if worker:
+            _bash_worker_state["idle"].remove(worker)
+    # A worker only sees the environment it was started with; replace stale ones.
+    if worker and (worker["env"] != dict(os.environ) or worker["utilities"] != utilities_path()):
+        _stop_bash_worker(worker)
+        worker = None
+    return worker or _start_bash_worker(tee)
+
+
+def _release_bash_worker(worker):
+    with _bash_worker_lock:
+        _bash_worker_state["idle"].append(worker)
+
+
+def shutdown_bash_workers():
+    with _bash_worker_lock:
+        workers, _bash_worker_state["idle"] = _bash_worker_state["idle"], []
+    for worker in workers:
+        _stop_bash_worker(worker)
+
+
+atexit.register(shutdown_bash_workers)
+
+
+def _run_bash_step_once(command, cwd, capture):
+    """Fallback when no worker can start: source utilities in a fresh bash."""
+    utilities = shlex.quote(utilities_path())
+    result = subprocess.run(
+        ["bash", "-c", f"if [ -f {utilities} ]; then source {utilities}; fi\n{command}"],
+        cwd=cwd,
+        stdin=subprocess.DEVNULL if capture else None,
+        capture_output=capture,
+        text=True,
+    )
+    return result.returncode, (result.stdout + result.stderr) if capture else ""
+
+
+def _send_bash_request(worker, cwd, output_path, command):
+    request = b"\0".join(os.fsencode(field) for field in (cwd, output_path, command)) + b"\0"
+    try:
+        worker["requests"].write(request)
+        worker["requests"].flush()
+    except (BrokenPipeError, OSError):
+        return False
+    return True
+
+
+def _finish_bash_request(worker, reply):
+    if not reply:
+        # The step took the worker down with it (e.g. `kill $$`).
+        _stop_bash_worker(worker)
+        return worker["proc"].returncode or 1
+    _release_bash_worker(worker)
+    return int(reply)
+
+
+def run_bash_step(command, cwd=None, capture=False):
+    """Run a shell step with utilities.sh loaded; return (returncode, output).
+
+    Steps share long-lived bash workers that source utilities.sh once, and each
+    step runs in a subshell so `cd`, variables and `exit` do not leak between
+    steps. With capture=True stdin is closed and stdout/stderr are returned.
+    """
+    cwd = cwd or os.getcwd()
+    worker = _acquire_bash_worker()
+    if worker is None:
+        return _run_bash_step_once(command, cwd, capture)
+
+    output_path = None
+    if capture:
+        fd, output_path = tempfile.mkstemp(prefix="smu-step-")
+        os.close(fd)
+    try:
+        sent = _send_bash_request(worker, cwd, output_path or "", command)
+        returncode = _finish_bash_request(worker, _read_worker_line(worker) if sent else b"")
+        output = ""
+        if output_path:
+            with open(output_path, errors="replace") as f:
+                output = f.read()
+        return returncode, output
+    finally:
+        if output_path:
+            os.unlink(output_path)
+
+
+def _measure_bash_step_once(command, cwd, log, on_start):
+    """Fallback for run_bash_step_measured: a fresh bash teed through a pipe and reaped with os.wait4."""
+    utilities = shlex.quote(utilities_path())
+    proc = subprocess.Popen(
+        ["bash", "-c", f"if [ -f {utilities} ]; then source {utilities}; fi\n{command}"],
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    on_start(proc.pid)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in iter(lambda: os.read(proc.stdout.fileno(), 65536), b""):
+        if log:
+            log.write(chunk)
+        sys.stdout.write(decoder.decode(chunk))
+        sys.stdout.flush()
+    sys.stdout.write(decoder.decode(b"", final=True))
+    proc.stdout.close()
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, (usage.ru_utime, usage.ru_stime, usage.ru_maxrss)
+
+
+def run_bash_step_measured(command, cwd, log, on_start=lambda pid: None):
+    """Run a step in a worker, teeing its output to stdout and the binary file `log`.
+
+    The step's stdout/stderr are a pty, so it still sees a terminal. `on_start`
+    gets the pid of the step's subshell (e.g. for a watchdog). Returns
+    (returncode, (user CPU s, system CPU s, ru_maxrss)) covering everything the
+    step started; the usage is zero if the step was killed.
+    """
+    worker = _acquire_bash_worker(tee=True)
+    if worker is None:
+        return _measure_bash_step_once(command, cwd, log, on_start)
+    usage = (0.0, 0.0, 0)
+    reply = _read_worker_line(worker, log) if _send_bash_request(worker, cwd, "-", command) else b""
+    while reply.startswith((b"pid ", b"usage ")):
+        kind, _, values = reply.decode().partition(" ")
+        if kind == "pid":
+            on_start(int(values))
+        else:
+            user, system, max_rss = values.split()
+            usage = (float(user), float(system), int(max_rss))
+        reply = _read_worker_line(worker, log)
+    # Output the step wrote just before exiting may still sit in the pty.
+    while worker["output"] is not None and select.select([worker["output"]], [], [], 0)[0]:
+        if not _copy_worker_output(worker, log):
+            break
+    sys.stdout.write(worker["decoder"].decode(b"", final=True))
+    return _finish_bash_request(worker, reply), usage
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
@@ -0,0 +1,205 @@
+from ..core import *
+
+
+dpkg_status_path = "/var/lib/dpkg/status"
+apt_sources_list_dir = "/etc/apt/sources.list.d"
+
+_package_snapshot_state = {}
+_package_snapshot_lock = threading.Lock()
+
+
+def reset_package_snapshot():
+    """Forget cached package state, e.g. after provisioning changed the system."""
+    _package_snapshot_state.clear()
+
+
+def _snapshot_value(key, loader):
+    with _package_snapshot_lock:
+        if key not in _package_snapshot_state:
+            _package_snapshot_state[key] = loader()
+        return _package_snapshot_state[key]
+
+
+# dpkg states in which a package's files are not on disk; every other state
+# (installed, unpacked, half-configured, triggers-pending, ...) is what
+# `dpkg -s` used to accept.
+DPKG_ABSENT_STATES = frozenset(("not-installed", "config-files"))
+
+
+def _parse_dpkg_status(path):
+    """Return the set of installed package names from a dpkg status database."""
+    installed = set()
+    fields = {}
+
+    def finish():
+        package = fields.get("package")
+        state = fields.get("status", "").split()[-1:]
+        if package and state and state[0] not in DPKG_ABSENT_STATES:
+            installed.add(package)
+            if fields.get("architecture"):
+                installed.add(f"{package}:{fields['architecture']}")
+        fields.clear()
+
+    try:
+        with open(path, errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    finish()
+                    continue
+                if line[0] in " \t" or ":" not in line:
+                    continue
+                key, value = line.split(":", 1)
+                key = key.lower()
+                if key in ("package", "status", "architecture"):
+                    fields[key] = value.strip()
+    except (IOError, OSError):
+        return installed
+    finish()
+    return installed
+
+
+def _command_lines(args):
+    """Run a listing command once; a missing or failing tool lists nothing."""
+    try:
+        result = subprocess.run(args, capture_output=True, text=True)
+    except OSError:
+        return []
+    if result.returncode != 0:
+        return []
+    return [line for line in result.stdout.splitlines() if line.strip()]
+
+
+def _list_installed_snaps():
+    return {line.split()[0] for line in _command_lines(["snap", "list"])[1:]}
+
+
+def _brew_names(*names):
+    """Lower-cased names plus their short form without the tap prefix."""
+    found = set()
+    for name in names:
+        if isinstance(name, str) and name:
+            name = name.lower()
+            found.update((name, name.rsplit("/", 1)[-1]))
+    return found
+
+
+def _list_brew_installed():
+    """Return {"formula": names, "cask": names} from one `brew info` call.
+
+    Every name brew resolves to an installed package counts: tap-qualified
+    names, aliases (`python` for `python@3.12`) and renamed formulae.
+    """
+    installed = {"formula": set(), "cask": set()}
+    try:
+        info = json.loads("\n".join(_command_lines(["brew", "info", "--json=v2", "--installed"])) or "{}")
+    except ValueError:
+        return installed
+    for formula in info.get("formulae", []):
+        oldnames = formula.get("oldnames") or [formula.get("oldname")]
+        installed["formula"] |= _brew_names(
+            formula.get("name"), formula.get("full_name"), *formula.get("aliases", []), *oldnames
+        )
+    for cask in info.get("casks", []):
+        installed["cask"] |= _brew_names(cask.get("token"), cask.get("full_token"), *cask.get("old_tokens", []))
+    return installed
+
+
+def _list_mas_ids():
+    return {line.split()[0] for line in _command_lines(["mas", "list"])}
+
+
+def _list_apt_sources():
+    try:
+        return set(os.listdir(apt_sources_list_dir))
+    except OSError:
+        return set()
+
+
+def installed_dpkg_packages():
+    return _snapshot_value(("dpkg", dpkg_status_path), lambda: _parse_dpkg_status(dpkg_status_path))
+
+
+def installed_snaps():
+    return _snapshot_value(("snap",), _list_installed_snaps)
+
+
+def apt_source_lists():
+    return _snapshot_value(("sources", apt_sources_list_dir), _list_apt_sources)
+
+
+def installed_brew_formulae():
+    return _snapshot_value(("brew",), _list_brew_installed)["formula"]
+
+
+def installed_brew_casks():
+    return _snapshot_value(("brew",), _list_brew_installed)["cask"]
+
+
+def installed_brew_taps():
+    return _snapshot_value(("brew", "tap"), lambda: {tap.strip().lower() for tap in _command_lines(["brew", "tap"])})
+
+
+def installed_mas_apps():
+    return _snapshot_value(("mas",), _list_mas_ids)
+
+
+def brew_bundle_check_enabled():
+    """`brew bundle check` replaces the snapshot when SMU_BREW_BUNDLE_CHECK=1."""
+    return os.getenv("SMU_BREW_BUNDLE_CHECK") == "1"
+
+
+def _brewfile_entries(brewfile):
+    """Parse a brewfile into (kind, groups) tuples for brew/cask/tap/mas lines.
+
+    Returns None when the file uses Ruby that is not a plain entry (conditionals,
+    helpers, vscode, ...) so callers can fall back to `brew bundle check`.
+    """
+    entry = re.compile(r"""^(brew|cask|tap|mas)\s+["']([^"']+)["']\s*(?:,(.*))?$""")
+    mas_id = re.compile(r'\bid:\s*(\d+)')
+    entries = []
+    try:
+        with open(brewfile) as f:
+            lines = f.readlines()
+    except (IOError, OSError):
+        return None
+    for raw in lines:
+        line = raw.split("#", 1)[0].strip()
+        if not line or line.startswith("cask_args"):
+            continue
+        m = entry.match(line)
+        if not m:
+            return None
+        kind, name, options = m.groups()
+        if kind == "mas":
+            found = mas_id.search(options or "")
+            if not found:
+                return None
+            entries.append((kind, (name, found.group(1))))
+        else:
+            entries.append((kind, (name,)))
+    return entries
+
+
+def package_snapshot_entry_installed(kind, groups):
+    """Answer a parsed `packages` or brewfile entry from the cached snapshot."""
+    if kind in ("apt", "deb"):
+        return groups[0] in installed_dpkg_packages()
+    if kind == "snap":
+        return groups[0] in installed_snaps()
+    if kind == "ppa":
+        slug = groups[0].replace("/", "-").lower()
+        return any(slug in name.lower() for name in apt_source_lists())
+    if kind == "source":
+        return groups[0] in apt_source_lists()
+    if kind == "brew":
+        return groups[0].lower() in installed_brew_formulae()
+    if kind == "cask":
+        return groups[0].lower() in installed_brew_casks()
+    if kind == "tap":
+        return groups[0].lower() in installed_brew_taps()
+    if kind == "mas":
+        return groups[1] in installed_mas_apps()
+    return False
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
@@ -11,8 +11,8 @@ PRODUCT_OPS_HELP_TOPICS = {
     "facts": ["smu facts collect [--json]", "Collect local OS, package-manager, shell, Nix, rcm, disk, user, and cloud facts."],
     "plan diff": ["smu plan diff [--from path] [--to path] [--json]", "Compare two plan JSON payloads or compare an empty baseline with the current plan."],
     "approval": ["smu approval [--preset id] [--dry-run] [--yes] [--approve-sudo] [--approve-network] [--json]", "Evaluate apply approval gates for CI, sudo, network, and destructive-write policy."],
-    "state timeline": ["smu state timeline [--limit count] [--json]", "Merge state-ledger, update-history, and drift-doctor events into a chronological timeline."],
-    "lock": ["smu lock [--root path] [--profile profile] [--output path] [--json]", "Generate a blueprint lockfile with source head, adapter, modules, registry, packages, and artifacts."],
+    "state timeline": ["smu state timeline [--since when] [--until when] [--operation name] [--limit count] [--cursor c] [--include-drift] [--json]", "Page through state-ledger and update-history events chronologically, optionally with a drift-doctor snapshot."],
+    "lock": ["smu lock [--root path] [--profile profile] [--output path] [--json] [--changed-since digest]", "Generate a blueprint lockfile with source head, adapter, modules, registry, packages, artifacts, and tree digest."],
     "bootstrap bundle": ["smu bootstrap bundle [--profile profile] [--output path] [--json]", "Create an offline bootstrap archive with install shim, registry, plan, and lockfile payloads."],
     "policy explain": ["smu policy explain [--preset id] [--provisioning-adapter adapter] [--json]", "Explain why policy allows or blocks adapters, network access, and sudo."],
     "golden-examples": ["smu golden-examples [--json]", "List tested setup examples for Ubuntu VPS, Arch workstation, macOS, Nix, rcm, and hybrid migration."],
@@ -26,7 +26,7 @@ def product_ops_contract_examples():
         "host-facts": {"schema_version": 1, "facts": {"os": {"system": "Linux", "release": "6.0", "id": "ubuntu"}, "package_managers": {"apt": True, "brew": False, "nix": True}, "shell": "/bin/bash", "sudo": True, "nix": True, "home_manager": True, "rcm": True, "disk": {"total": 1, "used": 0, "free": 1}, "memory": {"available": None}, "ssh_user": "user", "cloud": {"provider": None, "region": None}}},
         "plan-diff": plan_diff_payload([]),
         "approval": approval_payload(["--preset", "strict", "--dry-run"]),
-        "state-timeline": state_timeline_payload(),
+        "state-timeline": state_timeline_payload(include_drift=True, drift=drift_example_payload),
         "blueprint-lock": blueprint_lock_payload(["--profile", "vps"]),
         "bootstrap-bundle": {"output": "/tmp/smu-bootstrap-bundle.zip", "profile": "vps", "files": ["blueprint-registry.json", "install.sh", "plan.json", "smu.lock"], "sha256": "0" * 64},
         "policy-explain": policy_explain_payload(["--preset", "ci", "--provisioning-adapter", "home-manager"]),
@@ -144,25 +144,91 @@ def approval_command(argv):
     return 0 if payload["ok"] else 1
 
 
-def state_timeline_payload(limit=50):
-    events = []
-    for event in read_state_ledger()[-limit:]:
-        events.append({"source": "ledger", "operation": event.get("operation"), "timestamp": event.get("timestamp"), "event": event})
-    update_history = _read_json_file(update_history_path, [])
-    for event in update_history[-limit:]:
-        events.append({"source": "update", "operation": "update", "timestamp": event.get("timestamp"), "event": event})
-    events.append({"source": "drift", "operation": "drift-doctor", "timestamp": None, "event": drift_payload(smu_home_dir)})
-    events.sort(key=lambda item: item.get("timestamp") or "9999")
-    return {"schema_version": 1, "events": events[-limit:], "count": min(len(events), limit)}
+TIMELINE_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def _timeline_bound(value):
+    """Turn an ISO timestamp or a duration like 24h into a ledger timestamp."""
+    if value is None:
+        return None
+    match = re.fullmatch(r"(\d+)([smhd])", value)
+    if match:
+        seconds = int(match.group(1)) * TIMELINE_DURATION_UNITS[match.group(2)]
+        moment = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=seconds)
+    else:
+        try:
+            moment = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            die(f"Invalid timeline bound '{value}'. Use an ISO timestamp or a duration like 24h.")
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.astimezone(datetime.timezone.utc).replace(microsecond=0).isoformat()
+
+
+def _timeline_cursor(cursor):
+    bounds = {}
+    for part in (cursor or "").split(","):
+        source, _, seq = part.partition("=")
+        if source in ("ledger", "update") and seq.isdigit():
+            bounds[source] = int(seq)
+        elif part:
+            die(f"Invalid timeline cursor '{cursor}'.")
+    return bounds
+
+
+def state_timeline_payload(limit=50, since=None, until=None, operation=None, cursor=None, include_drift=False, drift=None):
+    """Return one page of ledger and update history events, oldest first.
+
+    Each source is queried newest first for at most limit + 1 rows, so a page
+    never reads more history than it returns. next_cursor pages further back.
+    With include_drift, `drift(root)` (default drift_payload) adds a drift-doctor event.
+    """
+    since, until = _timeline_bound(since), _timeline_bound(until)
+    bounds = _timeline_cursor(cursor)
+    sources = []
+    if operation != "update":
+        sources.append([
+            {"source": "ledger", "operation": event.get("operation"),
+             "timestamp": event.get("timestamp") or event.get("id"), "event": event, "seq": seq}
+            for seq, event in query_state_events(since, until, operation, bounds.get("ledger"), limit + 1)
+        ])
+    if operation in (None, "update"):
+        sources.append([
+            {"source": "update", "operation": "update", "timestamp": entry.get("updated_at"), "event": entry, "seq": seq}
+            for seq, entry in query_update_history(since, until, bounds.get("update"), limit + 1)
+        ])
+    merged = list(heapq.merge(*sources, key=lambda item: item["timestamp"] or "", reverse=True))
+    page = merged[:limit]
+    next_cursor = None
+    if len(merged) > limit:
+        for item in page:
+            bounds[item["source"]] = min(item["seq"], bounds.get(item["source"], item["seq"]))
+        next_cursor = ",".join(f"{source}={seq}" for source, seq in sorted(bounds.items()))
+    events = [{key: value for key, value in item.items() if key != "seq"} for item in reversed(page)]
+    if include_drift:
+        events.append({"source": "drift", "operation": "drift-doctor", "timestamp": None, "event": (drift or drift_payload)(smu_home_dir)})
+    return {"schema_version": 1, "events": events, "count": len(events), "next_cursor": next_cursor}
 
 
 def state_timeline_command(argv):
-    payload = state_timeline_payload(int(_option_value(argv, "--limit") or "50"))
+    limit = _option_value(argv, "--limit") or "50"
+    if not limit.isdigit() or int(limit) < 1:
+        die("Usage: smu state timeline [--since when] [--until when] [--operation name] [--limit N] [--cursor c] [--include-drift] [--json]")
+    payload = state_timeline_payload(
+        int(limit),
+        since=_option_value(argv, "--since"),
+        until=_option_value(argv, "--until"),
+        operation=_option_value(argv, "--operation"),
+        cursor=_option_value(argv, "--cursor"),
+        include_drift="--include-drift" in argv,
+    )
     if "--json" in argv:
         print(json.dumps(payload, indent=2, sort_keys=True))
     else:
         for event in payload["events"]:
             print(f"{event['source']}\t{event['operation']}")
+        if payload["next_cursor"]:
+            print(f"next-cursor\t{payload['next_cursor']}")
     return 0
 
 
@@ -177,11 +243,25 @@ def blueprint_lock_payload(argv=None):
         "registry": blueprint_registry_payload(),
         "packages": _package_manager_state(),
         "artifacts": config_drift_report().get("items", []),
+        "tree": {"digest": tree_digest(root)},
     }
     return payload
 
 
+def tree_changes_payload(argv):
+    root = os.path.abspath(os.path.expanduser(_option_value(argv, "--root") or smu_home_dir))
+    since = _option_value(argv, "--changed-since")
+    index = refresh_tree_index(root)
+    changes = tree_changes_since(since, root, index)
+    if changes is None:
+        die(f"Tree digest {since} is not among the last {TREE_INDEX_HISTORY} digests of {root}.")
+    return {"root": root, "since": since, "digest": index["digest"], "changes": changes}
+
+
 def lock_command(argv):
+    if _option_value(argv, "--changed-since"):
+        print(json.dumps(tree_changes_payload(argv), indent=2, sort_keys=True))
+        return 0
     payload = blueprint_lock_payload(argv)
     output = _option_value(argv, "--output")
     if output:
@@ -48,7 +48,9 @@ def _json_file(path, default):
 
 def _fetch_json(url):
     parsed = urllib.parse.urlparse(url)
-    if parsed.scheme in ("http", "https", "file"):
+    if parsed.scheme in ("http", "https"):
+        return json.loads(http_fetch_bytes(url, timeout=10).decode("utf-8"))
+    if parsed.scheme == "file":
         with urllib.request.urlopen(url, timeout=10) as response:
             return json.loads(response.read().decode("utf-8"))
     return _json_file(os.path.abspath(os.path.expanduser(url)), {})
@@ -322,7 +324,19 @@ def _nix_profile_state():
     }
 
 
-def drift_payload(root=None):
+def drift_example_payload(root):
+    """drift_payload() for contract examples: no home scan, lsrc or package queries."""
+    scan = {"home": "/home/user", "dirs": 0, "reused_dirs": 0, "seconds": 0.0, "rcm": False}
+    return drift_payload(
+        root,
+        file_report=lambda: {"unmanaged_files": [], "stale_config": [], "scan": scan},
+        package_report=lambda: {"missing": [], "unexpected": []},
+    )
+
+
+def drift_payload(root=None, file_report=None, package_report=None):
+    """Build the drift-doctor payload; the report callables default to drift_file_report
+    and drift_package_report, which scan $HOME, run lsrc and query package managers."""
     root = os.path.abspath(os.path.expanduser(root or smu_home_dir))
     links = adapter_conflict_report()
     config = config_drift_report()
@@ -332,17 +346,19 @@ def drift_payload(root=None):
         {"path": path, "exists": os.path.exists(path)}
         for path in (adapter_manifest_json_path, adapter_manifest_env_path, resolved_profile_path)
     ]
-    ok = not links["conflicted"] and not config.get("drifted")
+    files = (file_report or drift_file_report)()
+    ok = not links["conflicted"] and not config.get("drifted") and not files["stale_config"]
     return {
         "root": root,
-        "packages": {"managers": _package_manager_state(), "missing": [], "unexpected": []},
+        "packages": {"managers": _package_manager_state(), **(package_report or drift_package_report)()},
         "links": links,
         "generated_files": generated_files,
         "nix_profile": nix_profile,
         "state_ledger": rollback,
         "config_drift": config,
-        "unmanaged_files": [],
-        "stale_config": [],
+        "unmanaged_files": files["unmanaged_files"],
+        "stale_config": files["stale_config"],
+        "scan": files["scan"],
         "ok": ok,
     }
 
@@ -354,6 +370,13 @@ def drift_command(argv):
     else:
         print(f"ok\t{payload['ok']}")
         print(f"link_conflicts\t{len(payload['links']['items'])}")
+        for item in payload["stale_config"]:
+            print(f"stale\t{item['reason']}\t{item['path']}")
+        for item in payload["unmanaged_files"]:
+            print(f"unmanaged\t{item['reason']}\t{item['path']}")
+        for key in ("missing", "unexpected"):
+            for item in payload["packages"][key]:
+                print(f"package-{key}\t{item['module']}\t{item['kind']}:{item['name']}")
     return 0 if payload["ok"] or "--strict" not in argv else 1
 
 
@@ -0,0 +1,208 @@
+from ..core import *
+
+
+# Limits and cancellation state of the running provisioning batch, shared by
+# the scheduler threads, step watchdogs and the SIGINT/SIGTERM handler.
+# `running` holds the pids of live steps, `stopped` why a module was cut short.
+_provision_control = {
+    "cancelled": None,
+    "deadline": None,
+    "module_timeout": None,
+    "module_deadlines": {},
+    "running": set(),
+    "stopped": {},
+}
+_provision_control_lock = threading.Lock()
+
+# Modules a resumed batch does not run again.
+CHECKPOINT_DONE_STATUSES = ("provisioned", "skipped")
+
+
+def provision_checkpoint_path():
+    return os.path.join(state_dir, "provision-checkpoint.json")
+
+
+def read_provision_checkpoint():
+    return _read_json_file(provision_checkpoint_path(), None)
+
+
+def _timeout_setting(name):
+    value = os.getenv(name)
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = 0
+    if seconds <= 0:
+        die(f"{name} must be a positive number of seconds, got '{value}'.")
+    return seconds
+
+
+def provision_timeouts():
+    """Return (per-module, whole-batch) timeouts in seconds, or None when unset."""
+    return _timeout_setting("SMU_MODULE_TIMEOUT"), _timeout_setting("SMU_PROVISION_TIMEOUT")
+
+
+def _process_tree(pid):
+    """Return pid followed by every process it started that is still alive."""
+    try:
+        output = subprocess.run(["ps", "-A", "-o", "pid=,ppid="], capture_output=True, text=True).stdout
+    except OSError:
+        output = ""
+    children = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) == 2 and all(field.isdigit() for field in fields):
+            children.setdefault(int(fields[1]), []).append(int(fields[0]))
+    tree, queue = [], [pid]
+    while queue:
+        current = queue.pop()
+        tree.append(current)
+        queue.extend(children.get(current, []))
+    return tree
+
+
+def kill_process_tree(pid, grace=5):
+    """SIGTERM a step and its descendants, then SIGKILL whatever is left after `grace` seconds."""
+    tree = _process_tree(pid)
+
+    def send(signum):
+        for member in tree:
+            try:
+                os.kill(member, signum)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    send(signal.SIGTERM)
+    timer = threading.Timer(grace, send, (signal.SIGKILL,))
+    timer.daemon = True
+    timer.start()
+
+
+def register_provision_step(pid, running=True):
+    with _provision_control_lock:
+        (_provision_control["running"].add if running else _provision_control["running"].discard)(pid)
+
+
+def provision_step_deadline(module):
+    """Return the monotonic time by which a step of `module` has to finish, or None."""
+    deadlines = [_provision_control["deadline"], _provision_control["module_deadlines"].get(module)]
+    deadlines = [deadline for deadline in deadlines if deadline]
+    return min(deadlines) if deadlines else None
+
+
+def provision_stop_reason(module=None):
+    """Return (status, reason) when no further step of `module` may run, else None."""
+    if _provision_control["cancelled"]:
+        return ("cancelled", _provision_control["cancelled"])
+    now = time.monotonic()
+    if _provision_control["deadline"] and now >= _provision_control["deadline"]:
+        return ("cancelled", "total timeout reached")
+    module_deadline = _provision_control["module_deadlines"].get(module)
+    if module_deadline and now >= module_deadline:
+        return ("errored", f"timed out after {_provision_control['module_timeout']:g}s")
+    return None
+
+
+def stop_provision_module(module, stop):
+    with _provision_control_lock:
+        _provision_control["stopped"].setdefault(module, stop)
+
+
+def _cancel_provision_batch(signum, frame):
+    if _provision_control["cancelled"]:
+        raise KeyboardInterrupt
+    _provision_control["cancelled"] = f"interrupted by {signal.Signals(signum).name}"
+    warn(f"Stopping provisioning ({signal.Signals(signum).name}); press Ctrl-C again to abort immediately.")
+    with _provision_control_lock:
+        running = list(_provision_control["running"])
+    for pid in running:
+        kill_process_tree(pid)
+
+
+def _provision_scheduled_module(module):
+    try:
+        result = provision_module(module)
+    except subprocess.CalledProcessError as e:
+        print(f"Failed to provision '{module}': {e}", file=sys.stderr)
+        return ("errored", str(e))
+    if result == "errored":
+        return ("errored", "a module step exited non-zero")
+    return ("provisioned", None) if result else ("skipped", None)
+
+
+@contextlib.contextmanager
+def provision_checkpoint(modules, fingerprints, resume=False):
+    """Checkpoint a provisioning batch and enforce its timeouts and signals.
+
+    Yields {"completed": {module: (status, detail)}, "fingerprints": {...},
+    "run": runner, "run_batch": runner}. With `resume`, modules that the
+    previous batch's checkpoint lists as provisioned or skipped are in
+    `completed` and need not run again. `run(module)` provisions one module and
+    then updates the checkpoint; `run_batch(name, members, runnable)` does the
+    same for a node that provisions several members at once (e.g. the shared
+    apt transaction) and records its result for every member.
+    The checkpoint file is removed once the batch ends without being interrupted.
+    """
+    previous = (read_provision_checkpoint() or {}) if resume else {}
+    checkpoint = {"modules": list(modules), "started_at": _utc_timestamp(), "completed": {
+        module: entry for module, entry in previous.get("completed", {}).items()
+        if module in modules and entry["result"][0] in CHECKPOINT_DONE_STATUSES
+    }}
+    module_timeout, total_timeout = provision_timeouts()
+    _provision_control.update(
+        cancelled=None,
+        deadline=time.monotonic() + total_timeout if total_timeout else None,
+        module_timeout=module_timeout,
+        module_deadlines={},
+        running=set(),
+        stopped={},
+    )
+    write_json_file(provision_checkpoint_path(), checkpoint)
+    lock = threading.Lock()
+    unfinished = []
+
+    def run_batch(name, members, runnable):
+        stop = provision_stop_reason()
+        if stop:
+            unfinished.extend(members)
+            return stop
+        if module_timeout:
+            _provision_control["module_deadlines"][name] = time.monotonic() + module_timeout
+        result = runnable()
+        result = _provision_control["stopped"].pop(name, result)
+        if result[0] == "cancelled":
+            unfinished.extend(members)
+        with lock:
+            for module in members:
+                checkpoint["completed"][module] = {"result": list(result), "fingerprint": fingerprints.get(module)}
+            write_json_file(provision_checkpoint_path(), checkpoint)
+        return result
+
+    def run(module):
+        return run_batch(module, [module], lambda: _provision_scheduled_module(module))
+
+    handlers = {}
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            handlers[signum] = signal.signal(signum, _cancel_provision_batch)
+    interrupted = True
+    try:
+        yield {
+            "completed": {module: tuple(entry["result"]) for module, entry in checkpoint["completed"].items()},
+            "fingerprints": {module: entry["fingerprint"] for module, entry in checkpoint["completed"].items()},
+            "run": run,
+            "run_batch": run_batch,
+        }
+        interrupted = bool(unfinished)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+        if interrupted:
+            warn("Provisioning stopped early; run 'smu -p --resume' to continue where it left off.")
+        elif os.path.exists(provision_checkpoint_path()):
+            os.remove(provision_checkpoint_path())
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
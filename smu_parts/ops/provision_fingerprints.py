@@ -0,0 +1,92 @@
+from ..core import *
+
+
+MODULE_FINGERPRINT_VERSION = 1
+
+
+def _is_nested_module_dir(path):
+    name = os.path.basename(path)
+    return any(
+        os.path.exists(os.path.join(path, marker))
+        for marker in (f"{name}.sh", "brewfile", "packages", "module.toml")
+    )
+
+
+def _update_tree_digest(digest, root_dir):
+    """Feed every file below root_dir into digest, skipping nested modules."""
+    if not os.path.isdir(root_dir):
+        digest.update(b"missing\0")
+        return
+    for root, dirs, files in os.walk(root_dir):
+        dirs[:] = sorted(d for d in dirs if not _is_nested_module_dir(os.path.join(root, d)))
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, root_dir)
+            digest.update(os.fsencode(rel_path) + b"\0")
+            if os.path.islink(path):
+                digest.update(b"link:" + os.fsencode(os.readlink(path)) + b"\0")
+                continue
+            mode = os.stat(path).st_mode if os.path.exists(path) else 0
+            digest.update(f"{mode & 0o111:o}:{tree_file_sha256(path)}\0".encode())
+
+
+def module_input_fingerprint(module_name, script_path=None):
+    """Hash what a module run depends on: its directory, the resolved profile and utilities."""
+    script_path = script_path or get_module_path(module_name)
+    if not script_path:
+        return None
+    digest = hashlib.sha256(f"smu-module-fingerprint:{MODULE_FINGERPRINT_VERSION}\0".encode())
+    digest.update(os.fsencode(os.path.basename(script_path)) + b"\0")
+    _update_tree_digest(digest, os.path.dirname(script_path))
+    digest.update(json.dumps(resolved_profile(), sort_keys=True, default=str).encode() + b"\0")
+    _update_tree_digest(digest, os.path.dirname(utilities_path()))
+    return digest.hexdigest()
+
+
+def recorded_module_fingerprints():
+    """Return {module: fingerprint} from the ledger's latest provision of each module.
+
+    A later uninstall event, or a provision without a fingerprint, clears the entry.
+    """
+    fingerprints = {}
+    for event in read_state_ledger():
+        operation = event.get("operation")
+        if operation not in ("provision_modules", "uninstall_modules"):
+            continue
+        for item in event.get("items", []):
+            module = item.get("module")
+            if operation == "provision_modules" and item.get("fingerprint"):
+                fingerprints[module] = item["fingerprint"]
+            else:
+                fingerprints.pop(module, None)
+    return fingerprints
+
+
+def latest_module_event_indexes(events):
+    """Return the indexes of events holding some module's latest provision or uninstall.
+
+    recorded_module_fingerprints and the package drift report read those
+    events, so ledger pruning keeps them.
+    """
+    latest = {}
+    for index, event in enumerate(events):
+        if event.get("operation") in ("provision_modules", "uninstall_modules"):
+            for item in event.get("items", []):
+                if item.get("module"):
+                    latest[item["module"]] = index
+    return set(latest.values())
+
+
+def module_provision_unchanged(module, fingerprint, recorded):
+    """True when a module's inputs match its last run and nothing says it is gone.
+
+    Modules without a status probe report 'unknown'; the ledger is then the only
+    evidence, so they are skipped as well. 'missing' and 'partial' always rerun.
+    """
+    if not fingerprint or recorded.get(module) != fingerprint:
+        return False
+    state, _ = module_status(module)
+    return state in ("installed", "unknown")
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
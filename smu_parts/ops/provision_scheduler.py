@@ -0,0 +1,196 @@
+from ..core import *
+
+
+# Package managers hold a system-wide lock; modules that touch the same one
+# never run at the same time.
+PACKAGE_MANAGER_RESOURCES = {"packages": "apt", "brewfile": "brew"}
+# A script module that installs through whichever package manager the OS
+# uses declares this resource instead of naming apt, brew or pacman.
+OS_PACKAGE_MANAGER_RESOURCE = "package-manager"
+# A dependency has to end in one of these before its dependents may run.
+DEPENDENCY_OK_STATUSES = ("provisioned", "unchanged")
+
+
+def _os_package_manager_resource():
+    if debian:
+        return "apt"
+    if macOS:
+        return "brew"
+    if arch:
+        return "pacman"
+    return "system"
+
+
+def _module_schedule_manifest(script_path):
+    manifest_path = os.path.join(os.path.dirname(script_path), MODULE_MANIFEST) if script_path else None
+    if not manifest_path or not os.path.exists(manifest_path):
+        return {}
+    return _read_simple_toml(manifest_path)
+
+
+def module_schedule_nodes(modules):
+    """Return scheduling nodes for a provisioning batch, keyed by module.
+
+    Dependencies and conflicts come from each module's module.toml (the same
+    keys module_graph_payload reads) and only count within the batch; every
+    module also waits for `base` when it is part of the batch. `resources`
+    lists exclusive locks; packages/brewfile modules hold their package
+    manager, and script modules, which usually install through utilities.sh,
+    hold the OS package manager's lock unless they declare `resources`
+    ("package-manager" stands for that lock; `resources = []` opts out).
+    """
+    nodes = {}
+    for index, module in enumerate(modules):
+        script_path = get_module_path(module)
+        manifest = _module_schedule_manifest(script_path)
+        kind = os.path.basename(script_path) if script_path else None
+        if "resources" in manifest:
+            resources = [
+                _os_package_manager_resource() if resource == OS_PACKAGE_MANAGER_RESOURCE else resource
+                for resource in manifest["resources"]
+            ]
+        elif kind in PACKAGE_MANAGER_RESOURCES:
+            resources = [PACKAGE_MANAGER_RESOURCES[kind]]
+        else:
+            resources = [_os_package_manager_resource()]
+        dependencies = manifest.get("dependencies", manifest.get("depends_on", []))
+        if module != "base" and "base" in modules:
+            dependencies = ["base", *dependencies]
+        nodes[module] = {
+            "module": module,
+            "index": index,
+            "order": int(manifest.get("order", 100)),
+            "dependencies": [dep for dep in dict.fromkeys(dependencies) if dep in modules and dep != module],
+            "conflicts": list(manifest.get("conflicts", manifest.get("conflicts_with", []))),
+            "resources": set(resources),
+        }
+    return nodes
+
+
+def merge_schedule_nodes(nodes, members, name, resources):
+    """Replace `members` with one node `name` that runs once for all of them.
+
+    The merged node waits for every outside dependency of its members, and
+    anything that depended on a member waits for the merged node instead.
+    """
+    members = [module for module in members if module in nodes]
+    merged = {
+        "module": name,
+        "index": min(nodes[module]["index"] for module in members),
+        "order": min(nodes[module]["order"] for module in members),
+        "dependencies": list(dict.fromkeys(
+            dep for module in members for dep in nodes[module]["dependencies"] if dep not in members
+        )),
+        "conflicts": [conflict for module in members for conflict in nodes[module]["conflicts"]],
+        "resources": set(resources),
+    }
+    result = {}
+    for module, node in nodes.items():
+        if module in members:
+            continue
+        dependencies = [name if dep in members else dep for dep in node["dependencies"]]
+        result[module] = {**node, "dependencies": list(dict.fromkeys(dependencies))}
+    result[name] = merged
+    return result
+
+
+def _conflict_results(nodes):
+    results = {}
+    for module, node in nodes.items():
+        for other, other_node in nodes.items():
+            if other_node["index"] >= node["index"]:
+                continue
+            if other in node["conflicts"] or module in other_node["conflicts"]:
+                results[module] = ("blocked", f"conflicts with {other}")
+                break
+    return results
+
+
+def run_module_schedule(nodes, run, jobs=1, results=None):
+    """Run `run(module)` for every node in dependency order on up to `jobs` threads.
+
+    `run` returns (status, detail) where status is 'provisioned', 'skipped' or
+    'errored'. `results` pre-seeds modules that must not run (e.g. unchanged).
+    Dependents of modules that did not end up provisioned or unchanged
+    (errored, skipped, cancelled or blocked) are reported as 'blocked'.
+    Returns {module: (status, detail)}.
+    """
+    results = dict(results or {})
+    for module, result in _conflict_results(nodes).items():
+        results.setdefault(module, result)
+    pending = [module for module in nodes if module not in results]
+    held = set()
+    running = {}
+
+    def block_failed_dependents():
+        changed = True
+        while changed:
+            changed = False
+            for module in list(pending):
+                failed = [dep for dep in nodes[module]["dependencies"]
+                          if dep in results and results[dep][0] not in DEPENDENCY_OK_STATUSES]
+                if failed:
+                    pending.remove(module)
+                    results[module] = ("blocked", f"dependency {failed[0]} did not provision")
+                    changed = True
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            block_failed_dependents()
+            for module in sorted(pending, key=lambda name: (nodes[name]["order"], nodes[name]["index"])):
+                if len(running) >= max(1, jobs):
+                    break
+                node = nodes[module]
+                if any(dep not in results for dep in node["dependencies"]) or node["resources"] & held:
+                    continue
+                pending.remove(module)
+                held |= node["resources"]
+                running[pool.submit(run, module)] = module
+            if not running:
+                break
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                module = running.pop(future)
+                held -= nodes[module]["resources"]
+                results[module] = future.result()
+    for module in pending:
+        results[module] = ("blocked", "dependency cycle")
+    return results
+
+
+def run_provisioning_schedule(modules, run, jobs=1, results=None, batches=(), run_batch=None):
+    """Schedule a provisioning batch, running each of `batches` as one node.
+
+    A batch is {"name", "members": {module: detail suffix}, "resources",
+    "run"}: its members that still have to run are merged into a single
+    scheduling node that calls `run()` once, and the node's result is then
+    reported for each member so the summary keeps per-module attribution.
+    Batches with fewer than two such members are left to run module by module.
+    `run_batch(name, members, runnable)`, when given, wraps that call the way
+    `run` wraps a module (see provision_checkpoint).
+    """
+    results = dict(results or {})
+    nodes = module_schedule_nodes(modules)
+    merged = {}
+    for batch in batches:
+        members = [module for module in batch["members"] if module in nodes and module not in results]
+        if len(members) < 2:
+            continue
+        nodes = merge_schedule_nodes(nodes, members, batch["name"], batch["resources"])
+        merged[batch["name"]] = (batch, members)
+
+    def run_node(module):
+        if module not in merged:
+            return run(module)
+        batch, members = merged[module]
+        return run_batch(module, members, batch["run"]) if run_batch else batch["run"]()
+
+    results = run_module_schedule(nodes, run_node, jobs, results)
+    for name, (batch, members) in merged.items():
+        status, detail = results.pop(name)
+        for module in members:
+            results[module] = (status, f"{detail}; {batch['members'][module]}")
+    return results
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
@@ -36,7 +36,13 @@ def rollback_doctor_payload(limit=20):
             coverage = "partial"
         else:
             coverage = "manual"
-    return {"path": state_ledger_path, "events": rows, "coverage": coverage, "total_events": len(events)}
+    return {
+        "backend": state_backend(),
+        "path": state_record_path(state_ledger_path),
+        "events": rows,
+        "coverage": coverage,
+        "total_events": len(events),
+    }
 
 
 def print_rollback_doctor(json_output=False):
@@ -79,4 +85,69 @@ def rollback_last_state_event(dry_run=False):
     return rollback_state_event(dry_run=dry_run)
 
 
+def rollback_until_plan(event_id):
+    """Collapse event_id and every later event into one net rollback.
+
+    Events are walked newest first, so the snapshot kept for each path is the
+    earliest `before`: the state the path had just before event_id ran.
+    """
+    events = state_events_since(event_id)
+    restores = {}
+    uninstall = []
+    manual = []
+    for event in reversed(events):
+        operation = event.get("operation")
+        items = event.get("items", [])
+        if operation == "provision_modules":
+            for item in reversed(items):
+                if item["module"] not in uninstall:
+                    uninstall.append(item["module"])
+        elif operation in ("materialize_adapters", "client_update"):
+            for item in reversed(items):
+                restores[item["before"]["path"]] = item["before"]
+        else:
+            manual.append({"id": event.get("id"), "operation": operation})
+    return {
+        "until": event_id,
+        "events": [event.get("id") for event in events],
+        "uninstall": uninstall,
+        "restore": sorted(restores.values(), key=lambda snapshot: snapshot["path"]),
+        "manual": manual,
+    }
+
+
+def print_rollback_until_plan(plan, json_output=False):
+    if json_output:
+        print(json.dumps(plan, indent=2, sort_keys=True))
+        return
+    for event_id in plan["events"]:
+        print(f"event\t{event_id}")
+    for module in plan["uninstall"]:
+        print(f"uninstall\t{module}")
+    for snapshot in plan["restore"]:
+        print(f"restore\t{snapshot.get('exists', False)}\t{snapshot['path']}")
+    for event in plan["manual"]:
+        print(f"manual\t{event['id']}\t{event['operation']}")
+
+
+def rollback_until_event(event_id, dry_run=False, json_output=False):
+    """Roll back event_id and everything after it, restoring each path once."""
+    plan = rollback_until_plan(event_id)
+    if not plan["events"]:
+        warn(f"No state event '{event_id}' to rollback to.")
+        return False
+    if dry_run or json_output:
+        print_rollback_until_plan(plan, json_output=json_output)
+        return True
+    if plan["manual"]:
+        die(f"Rollback for {plan['manual'][0]['operation']} event {plan['manual'][0]['id']} is not automatic.")
+    for module in plan["uninstall"]:
+        uninstall_module(module, dry_run=False)
+    for snapshot in plan["restore"]:
+        restore_file_snapshot(snapshot)
+    pop_state_events_since(event_id)
+    success(f"Rolled back {len(plan['events'])} event(s) to before {event_id}")
+    return True
+
+
 __all__ = [name for name in globals() if not name.startswith("__")]
@@ -13,28 +13,67 @@ def _secret_candidate(path):
     return any(pattern in name for pattern in SECRET_NAME_PATTERNS)
 
 
+def _secret_finding(root, rel, max_bytes):
+    path = os.path.join(root, rel)
+    if os.path.isdir(path):
+        return None
+    if _secret_candidate(path):
+        return {"path": rel, "risk": "secret-like-name"}
+    try:
+        if os.path.getsize(path) > max_bytes:
+            return None
+        with open(path, errors="ignore") as f:
+            sample = f.read(max_bytes)
+    except (IOError, OSError):
+        return None
+    if SECRET_VALUE_PATTERN.search(sample):
+        return {"path": rel, "risk": "secret-like-content"}
+    return None
+
+
+def _walk_secret_findings(root, max_bytes):
+    findings = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [item for item in dirnames if item not in SECRET_SKIP_DIRS]
+        for filename in filenames:
+            finding = _secret_finding(root, os.path.relpath(os.path.join(dirpath, filename), root), max_bytes)
+            if finding:
+                findings.append(finding)
+    return sorted(findings, key=lambda finding: finding["path"])
+
+
 def secrets_scan(root=None, max_bytes=65536):
+    """Scan root for secret-like files, re-reading only what changed since the last scan.
+
+    For SMU_HOME_DIR, findings are stored against its tree index digest and
+    later scans only inspect the paths tree_changes_since() reports. Any other
+    `--root` is walked directly, so no index is hashed or written for it.
+    """
     root = root or smu_home_dir
     findings = []
     if not os.path.exists(root):
         return {"root": root, "findings": findings, "ok": True}
-    for dirpath, dirnames, filenames in os.walk(root):
-        dirnames[:] = [item for item in dirnames if item not in SECRET_SKIP_DIRS]
-        for filename in filenames:
-            path = os.path.join(dirpath, filename)
-            rel = os.path.relpath(path, root)
-            if _secret_candidate(path):
-                findings.append({"path": rel, "risk": "secret-like-name"})
-                continue
-            try:
-                if os.path.getsize(path) > max_bytes:
-                    continue
-                with open(path, errors="ignore") as f:
-                    sample = f.read(max_bytes)
-            except (IOError, OSError):
-                continue
-            if SECRET_VALUE_PATTERN.search(sample):
-                findings.append({"path": rel, "risk": "secret-like-content"})
+    if os.path.realpath(root) != os.path.realpath(smu_home_dir):
+        findings = _walk_secret_findings(root, max_bytes)
+        return {"root": root, "findings": findings, "ok": not findings}
+    index = refresh_tree_index(root)
+    result_name = f"secrets:{max_bytes}"
+    previous = tree_index_result(result_name, root)
+    changes = tree_changes_since(previous["digest"], root, index) if previous else None
+    if changes is None:
+        paths = tree_files(root, index)
+    else:
+        changed = {change["path"] for change in changes}
+        findings = [finding for finding in previous["value"] if finding["path"] not in changed]
+        paths = [change["path"] for change in changes if change["change"] != "removed"]
+    for rel in paths:
+        if any(part in SECRET_SKIP_DIRS for part in rel.split("/")[:-1]):
+            continue
+        finding = _secret_finding(root, rel, max_bytes)
+        if finding:
+            findings.append(finding)
+    findings.sort(key=lambda finding: finding["path"])
+    store_tree_index_result(result_name, index["digest"], findings, root)
     return {"root": root, "findings": findings, "ok": not findings}
 
 
@@ -0,0 +1,166 @@
+from ..core import *
+
+
+# File snapshots keep their content in state/blobs/<aa>/<sha256>, zlib
+# compressed, and the ledger only stores the digest. Identical content from
+# repeated materializations or updates is stored once. Adapter
+# materialization instead hardlinks the previous targets into a per-event
+# directory under state/backups, which costs no read or write of the content.
+SNAPSHOT_BLOB_CHUNK = 1024 * 1024
+
+
+def snapshot_blobs_dir():
+    return os.path.join(state_dir, "blobs")
+
+
+def snapshot_blob_path(digest):
+    return os.path.join(snapshot_blobs_dir(), digest[:2], digest)
+
+
+def store_file_blob(path):
+    """Compress path into the blob store and return its sha256 digest."""
+    os.makedirs(snapshot_blobs_dir(), exist_ok=True)
+    digest = hashlib.sha256()
+    compressor = zlib.compressobj(6)
+    fd, tmp_path = tempfile.mkstemp(prefix=".blob-", dir=snapshot_blobs_dir())
+    try:
+        with os.fdopen(fd, "wb") as out, open(path, "rb") as source:
+            for chunk in iter(lambda: source.read(SNAPSHOT_BLOB_CHUNK), b""):
+                digest.update(chunk)
+                out.write(compressor.compress(chunk))
+            out.write(compressor.flush())
+        blob_path = snapshot_blob_path(digest.hexdigest())
+        if os.path.exists(blob_path):
+            os.unlink(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(tmp_path, blob_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return digest.hexdigest()
+
+
+def _default_file_mode():
+    """The mode open() would give a new file under the current umask."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def restore_file_blob(digest, path, mode=None):
+    """Decompress a stored blob to path, replacing it atomically.
+
+    The file gets `mode`, or the umask default for snapshots that did not
+    record one, rather than mkstemp's 0600.
+    """
+    blob_path = snapshot_blob_path(digest)
+    if not os.path.exists(blob_path):
+        die(f"Snapshot blob {digest} for '{path}' is missing from {snapshot_blobs_dir()}.")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    decompressor = zlib.decompressobj()
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as out, open(blob_path, "rb") as source:
+            for chunk in iter(lambda: source.read(SNAPSHOT_BLOB_CHUNK), b""):
+                out.write(decompressor.decompress(chunk))
+            out.write(decompressor.flush())
+        os.chmod(tmp_path, _default_file_mode() if mode is None else mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def snapshot_backups_dir():
+    return os.path.join(state_dir, "backups")
+
+
+def new_snapshot_backup_dir():
+    """Create a per-event backup directory and return its path."""
+    os.makedirs(snapshot_backups_dir(), exist_ok=True)
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return tempfile.mkdtemp(prefix=f"{stamp}-", dir=snapshot_backups_dir())
+
+
+def backup_file(path, backup_dir):
+    """Hardlink path into backup_dir and return the backup's relative name.
+
+    Writers replace targets through os.replace, so the link keeps the previous
+    content without reading it. Across filesystems, or where hardlinks are not
+    supported, the file is copied instead.
+    """
+    name = f"{len(os.listdir(backup_dir))}-{os.path.basename(path)}"
+    backup_path = os.path.join(backup_dir, name)
+    try:
+        os.link(path, backup_path)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+        shutil.copy2(path, backup_path)
+    return os.path.relpath(backup_path, snapshot_backups_dir())
+
+
+def restore_file_backup(backup, path):
+    """Put a backed-up file back at path, replacing it atomically."""
+    backup_path = os.path.join(snapshot_backups_dir(), backup)
+    if not os.path.exists(backup_path):
+        die(f"Snapshot backup '{backup}' for '{path}' is missing from {snapshot_backups_dir()}.")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.restore")
+    if os.path.lexists(tmp_path):
+        os.unlink(tmp_path)
+    try:
+        os.link(backup_path, tmp_path)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+        shutil.copy2(backup_path, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _referenced_snapshot_values(value, key):
+    found = set()
+    stack = [value]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            if isinstance(current.get(key), str):
+                found.add(current[key])
+            stack.extend(current.values())
+        elif isinstance(current, list):
+            stack.extend(current)
+    return found
+
+
+def referenced_blob_digests(value):
+    """Return every snapshot blob digest referenced anywhere in a ledger value."""
+    return _referenced_snapshot_values(value, "blob")
+
+
+def referenced_backup_dirs(value):
+    """Return the per-event backup directories referenced anywhere in a ledger value."""
+    return {backup.split("/", 1)[0] for backup in _referenced_snapshot_values(value, "backup")}
+
+
+def snapshot_blob_gc_plan(events=None):
+    """Return the blob files and backup directories no ledger event references any more."""
+    events = read_state_ledger() if events is None else events
+    referenced = referenced_blob_digests(events)
+    unused = []
+    if os.path.isdir(snapshot_blobs_dir()):
+        for root, _, files in os.walk(snapshot_blobs_dir()):
+            unused.extend(os.path.join(root, name) for name in files if name not in referenced)
+    if os.path.isdir(snapshot_backups_dir()):
+        referenced = referenced_backup_dirs(events)
+        unused.extend(
+            os.path.join(snapshot_backups_dir(), name)
+            for name in os.listdir(snapshot_backups_dir())
+            if name not in referenced
+        )
+    return sorted(unused)
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
@@ -0,0 +1,442 @@
+from ..core import *
+
+
+# The ledger, update history and update lock live either in their JSON files
+# (state/ledger.json, update-history.json, update.lock) or in one SQLite
+# database, state/state.sqlite3. The database is used once it exists or when
+# SMU_STATE_BACKEND=sqlite; SMU_STATE_BACKEND=json forces the JSON files.
+STATE_DB_SCHEMA_VERSION = 1
+_STATE_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT,
+    operation TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_id ON events (id);
+CREATE INDEX IF NOT EXISTS events_operation ON events (operation);
+CREATE INDEX IF NOT EXISTS events_timestamp ON events (timestamp);
+CREATE TABLE IF NOT EXISTS event_items (
+    event_seq INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    module TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (event_seq, position)
+);
+CREATE INDEX IF NOT EXISTS event_items_module ON event_items (module);
+CREATE TABLE IF NOT EXISTS update_history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS update_history_updated_at ON update_history (updated_at);
+CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, updated_at TEXT, data TEXT NOT NULL);
+"""
+
+
+def state_db_path():
+    return os.path.join(state_dir, "state.sqlite3")
+
+
+def state_backend():
+    backend = os.getenv("SMU_STATE_BACKEND")
+    if backend in ("json", "sqlite"):
+        return backend
+    return "sqlite" if os.path.exists(state_db_path()) else "json"
+
+
+def state_record_path(json_path):
+    """Where the ledger, update history or lock kept at json_path is read from now."""
+    return state_db_path() if state_backend() == "sqlite" else json_path
+
+
+@contextlib.contextmanager
+def state_db():
+    """Open the state database in WAL mode, creating and migrating it on first use.
+
+    The block runs in one transaction that commits when it exits cleanly.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    db = sqlite3.connect(state_db_path(), timeout=30)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        if db.execute("PRAGMA user_version").fetchone()[0] < STATE_DB_SCHEMA_VERSION:
+            with db:
+                db.executescript(_STATE_DB_SCHEMA)
+                _import_json_state(db)
+                db.execute(f"PRAGMA user_version = {STATE_DB_SCHEMA_VERSION}")
+        with db:
+            yield db
+    finally:
+        db.close()
+
+
+def _import_json_state(db):
+    """One-time migration: copy the JSON ledger, update history and lock into db."""
+    if db.execute("SELECT 1 FROM meta WHERE key = 'migrated_at'").fetchone():
+        return
+    ledger = _read_json_file(state_ledger_path, [])
+    for event in ledger if isinstance(ledger, list) else []:
+        _insert_state_event(db, event)
+    history = _read_json_file(update_history_path, [])
+    for entry in history if isinstance(history, list) else []:
+        _insert_update_history(db, entry)
+    lock = _read_json_file(update_lock_path, {})
+    if isinstance(lock, dict) and lock:
+        _write_state_lock(db, "update", lock)
+    db.execute("INSERT INTO meta (key, value) VALUES ('migrated_at', ?)", (_utc_timestamp(),))
+
+
+def _insert_state_event(db, event):
+    event = dict(event)
+    items = event.pop("items", [])
+    cursor = db.execute(
+        "INSERT INTO events (id, operation, timestamp, data) VALUES (?, ?, ?, ?)",
+        (event.get("id"), event.get("operation"), event.get("timestamp") or event.get("id"),
+         json.dumps(event, sort_keys=True)),
+    )
+    db.executemany(
+        "INSERT INTO event_items (event_seq, position, module, data) VALUES (?, ?, ?, ?)",
+        [
+            (cursor.lastrowid, position, item.get("module") if isinstance(item, dict) else None,
+             json.dumps(item, sort_keys=True))
+            for position, item in enumerate(items)
+        ],
+    )
+
+
+def _select_state_events(db, where="", params=(), order="ASC", limit=None):
+    """Return [(seq, event)] with items attached, in `order` of insertion."""
+    query = f"SELECT seq FROM events {where} ORDER BY seq {order}"
+    if limit is not None:
+        query += f" LIMIT {int(limit)}"
+    rows = db.execute(f"SELECT seq, data FROM events WHERE seq IN ({query}) ORDER BY seq {order}", params)
+    events = {seq: {**json.loads(data), "items": []} for seq, data in rows}
+    for seq, data in db.execute(
+        f"SELECT event_seq, data FROM event_items WHERE event_seq IN ({query}) ORDER BY event_seq, position",
+        params,
+    ):
+        events[seq]["items"].append(json.loads(data))
+    return list(events.items())
+
+
+def _delete_state_events(db, seqs):
+    for seq in seqs:
+        db.execute("DELETE FROM event_items WHERE event_seq = ?", (seq,))
+        db.execute("DELETE FROM events WHERE seq = ?", (seq,))
+
+
+def _insert_update_history(db, entry):
+    db.execute(
+        "INSERT INTO update_history (updated_at, data) VALUES (?, ?)",
+        (entry.get("updated_at"), json.dumps(entry, sort_keys=True)),
+    )
+
+
+def _write_state_lock(db, name, data):
+    db.execute(
+        "INSERT OR REPLACE INTO locks (name, updated_at, data) VALUES (?, ?, ?)",
+        (name, data.get("updated_at"), json.dumps(data, sort_keys=True)),
+    )
+
+
+def read_update_lock():
+    if state_backend() == "sqlite":
+        with state_db() as db:
+            row = db.execute("SELECT data FROM locks WHERE name = 'update'").fetchone()
+        return json.loads(row[0]) if row else {}
+    data = _read_json_file(update_lock_path, {})
+    return data if isinstance(data, dict) else {}
+
+
+def read_update_history():
+    if state_backend() == "sqlite":
+        with state_db() as db:
+            return [json.loads(data) for (data,) in db.execute("SELECT data FROM update_history ORDER BY seq")]
+    data = _read_json_file(update_history_path, [])
+    return data if isinstance(data, list) else []
+
+
+def append_update_history(report):
+    entry = {
+        "updated_at": report.get("updated_at") or _utc_timestamp(),
+        "theme": report.get("theme"),
+        "prompt": report.get("prompt"),
+        "preset": report.get("preset"),
+        "ref": report.get("ref"),
+        "self_update": report.get("self_update", False),
+        "validate": report.get("validate", False),
+        "exit_code": report.get("exit_code", 0),
+        "actions": report.get("actions", []),
+        "repositories": report.get("repositories", []),
+        "report_delivery": report.get("report_delivery"),
+    }
+    limit = read_update_policy().get("history_limit", 20)
+    if state_backend() == "sqlite":
+        with state_db() as db:
+            _insert_update_history(db, entry)
+            db.execute(
+                "DELETE FROM update_history WHERE seq NOT IN "
+                "(SELECT seq FROM update_history ORDER BY seq DESC LIMIT ?)",
+                (limit,),
+            )
+        return entry
+    history = read_update_history()
+    history.append(entry)
+    write_json_file(update_history_path, history[-limit:])
+    return entry
+
+
+def write_update_lock(report):
+    updated_at = _utc_timestamp()
+    lock = {
+        "updated_at": updated_at,
+        "smu_home": smu_home_dir,
+        "installer_root": installer_root,
+        "theme": report.get("theme"),
+        "prompt": report.get("prompt"),
+        "preset": report.get("preset"),
+        "ref": report.get("ref"),
+        "self_update": report.get("self_update", False),
+        "validate": report.get("validate", False),
+        "exit_code": report.get("exit_code", 0),
+        "repositories": report.get("repositories", []),
+        "actions": report.get("actions", []),
+        "generated_config": report.get("generated_config", []),
+    }
+    if state_backend() == "sqlite":
+        with state_db() as db:
+            _write_state_lock(db, "update", lock)
+    else:
+        write_json_file(update_lock_path, lock)
+    append_update_history({**report, **lock})
+    return lock
+
+
+def read_state_ledger():
+    if state_backend() == "sqlite":
+        with state_db() as db:
+            return [event for _, event in _select_state_events(db)]
+    data = _read_json_file(state_ledger_path, [])
+    return data if isinstance(data, list) else []
+
+
+def write_state_ledger(entries):
+    if state_backend() == "sqlite":
+        with state_db() as db:
+            db.execute("DELETE FROM event_items")
+            db.execute("DELETE FROM events")
+            for entry in entries:
+                _insert_state_event(db, entry)
+        return
+    os.makedirs(state_dir, exist_ok=True)
+    tmp_path = f"{state_ledger_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entries, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, state_ledger_path)
+
+
+def record_state_event(operation, items):
+    entry = {
+        "id": _utc_timestamp(),
+        "operation": operation,
+        "items": items,
+    }
+    if state_backend() == "sqlite":
+        with state_db() as db:
+            _insert_state_event(db, entry)
+        return entry
+    entries = read_state_ledger()
+    entries.append(entry)
+    write_state_ledger(entries)
+    return entry
+
+
+def last_state_event():
+    return state_event()
+
+
+def state_event(event_id=None):
+    if state_backend() == "sqlite":
+        with state_db() as db:
+            if event_id is None:
+                events = _select_state_events(db, order="DESC", limit=1)
+            else:
+                events = _select_state_events(db, "WHERE id = ?", (event_id,), limit=1)
+        return events[0][1] if events else None
+    entries = read_state_ledger()
+    if not entries:
+        return None
+    if event_id is None:
+        return entries[-1]
+    for entry in entries:
+        if entry.get("id") == event_id:
+            return entry
+    return None
+
+
+def pop_state_event(event_id=None):
+    if state_backend() == "sqlite":
+        with state_db() as db:
+            if event_id is None:
+                events = _select_state_events(db, order="DESC", limit=1)
+            else:
+                events = _select_state_events(db, "WHERE id = ?", (event_id,))
+            _delete_state_events(db, [seq for seq, _ in events])
+        return events[-1][1] if events else None
+    entries = read_state_ledger()
+    if not entries:
+        return None
+    if event_id is None:
+        event = entries.pop()
+    else:
+        event = None
+        remaining = []
+        for entry in entries:
+            if entry.get("id") == event_id:
+                event = entry
+            else:
+                remaining.append(entry)
+        entries = remaining
+    write_state_ledger(entries)
+    return event
+
+
+def pop_last_state_event():
+    return pop_state_event()
+
+
+def state_events_since(event_id):
+    """Return event_id and every later event, oldest first, or [] if it is unknown."""
+    if state_backend() == "sqlite":
+        with state_db() as db:
+            return [event for _, event in _select_state_events(
+                db, "WHERE seq >= (SELECT MIN(seq) FROM events WHERE id = ?)", (event_id,))]
+    entries = read_state_ledger()
+    for index, entry in enumerate(entries):
+        if entry.get("id") == event_id:
+            return entries[index:]
+    return []
+
+
+def pop_state_events_since(event_id):
+    """Remove event_id and every later event in one write and return them, oldest first."""
+    if state_backend() == "sqlite":
+        with state_db() as db:
+            events = _select_state_events(
+                db, "WHERE seq >= (SELECT MIN(seq) FROM events WHERE id = ?)", (event_id,))
+            _delete_state_events(db, [seq for seq, _ in events])
+        return [event for _, event in events]
+    entries = read_state_ledger()
+    for index, entry in enumerate(entries):
+        if entry.get("id") == event_id:
+            write_state_ledger(entries[:index])
+            return entries[index:]
+    return []
+
+
+def _state_query_filters(column, since=None, until=None, before_seq=None, **equals):
+    clauses, params = [], []
+    for clause, value in ((f"{column} >= ?", since), (f"{column} <= ?", until), ("seq < ?", before_seq)):
+        if value is not None:
+            clauses.append(clause)
+            params.append(value)
+    for name, value in equals.items():
+        if value is not None:
+            clauses.append(f"{name} = ?")
+            params.append(value)
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", tuple(params)
+
+
+def _filter_json_rows(rows, stamp, since=None, until=None, before_seq=None, limit=None, **equals):
+    matches = []
+    for seq, row in reversed(list(enumerate(rows, start=1))):
+        timestamp = stamp(row)
+        if (before_seq is not None and seq >= before_seq) or (since and (timestamp or "") < since) \
+                or (until and (timestamp or "") > until) \
+                or any(value is not None and row.get(name) != value for name, value in equals.items()):
+            continue
+        matches.append((seq, row))
+        if limit is not None and len(matches) >= limit:
+            break
+    return matches
+
+
+def query_state_events(since=None, until=None, operation=None, before_seq=None, limit=None):
+    """Return [(seq, event)] newest first, filtered on the indexed timestamp and operation.
+
+    seq is the event's position in the ledger and stays stable while events are
+    only appended, so callers can page with before_seq.
+    """
+    if state_backend() == "sqlite":
+        where, params = _state_query_filters("timestamp", since, until, before_seq, operation=operation)
+        with state_db() as db:
+            return _select_state_events(db, where, params, order="DESC", limit=limit)
+    return _filter_json_rows(
+        read_state_ledger(), lambda event: event.get("timestamp") or event.get("id"),
+        since, until, before_seq, limit, operation=operation,
+    )
+
+
+def query_update_history(since=None, until=None, before_seq=None, limit=None):
+    """Return [(seq, entry)] of update history newest first; see query_state_events."""
+    if state_backend() == "sqlite":
+        where, params = _state_query_filters("updated_at", since, until, before_seq)
+        query = f"SELECT seq, data FROM update_history {where} ORDER BY seq DESC"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        with state_db() as db:
+            return [(seq, json.loads(data)) for seq, data in db.execute(query, params)]
+    return _filter_json_rows(read_update_history(), lambda entry: entry.get("updated_at"), since, until, before_seq, limit)
+
+
+def migrate_state_to_sqlite():
+    """Create the state database from the JSON files (once) and return its path."""
+    with state_db():
+        pass
+    return state_db_path()
+
+
+def export_state_json(target_dir=None):
+    """Write the ledger, update history and lock in their JSON file formats.
+
+    Without target_dir the files go to their usual paths, which lets tools that
+    read the JSON files directly keep working after the move to SQLite.
+    """
+    paths = {
+        "ledger": state_ledger_path,
+        "update_history": update_history_path,
+        "update_lock": update_lock_path,
+    }
+    if target_dir:
+        paths = {key: os.path.join(target_dir, os.path.basename(path)) for key, path in paths.items()}
+    write_json_file(paths["ledger"], read_state_ledger())
+    write_json_file(paths["update_history"], read_update_history())
+    write_json_file(paths["update_lock"], read_update_lock())
+    return paths
+
+
+def state_migrate_command(argv):
+    path = migrate_state_to_sqlite()
+    if "--json" in argv:
+        print(json.dumps({"backend": "sqlite", "path": path}, indent=2, sort_keys=True))
+    else:
+        print(f"migrated\t{path}")
+    return 0
+
+
+def state_export_command(argv):
+    paths = export_state_json(_option_value(argv, "--dir"))
+    if "--json" in argv:
+        print(json.dumps(paths, indent=2, sort_keys=True))
+    else:
+        for name, path in paths.items():
+            print(f"exported\t{name}\t{path}")
+    return 0
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
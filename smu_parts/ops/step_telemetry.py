@@ -0,0 +1,151 @@
+from ..core import *
+
+
+# The provisioning run currently collecting step telemetry, if any. Steps from
+# several scheduler threads append to it under the lock.
+_provision_run_state = {"run": None}
+_provision_run_lock = threading.Lock()
+
+
+def provision_runs_dir():
+    return os.path.join(state_dir, "runs")
+
+
+def _module_log_name(module):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "__", module) + ".log"
+
+
+def start_provision_run(modules, jobs=1):
+    """Start collecting per-step telemetry and logs for a provisioning batch."""
+    started_at = _utc_timestamp()
+    run_id = f"{started_at.replace(':', '').replace('+0000', 'Z')}-{os.getpid()}"
+    run = {
+        "id": run_id,
+        "dir": os.path.join(provision_runs_dir(), run_id),
+        "host": platform.node(),
+        "started_at": started_at,
+        "started": time.monotonic(),
+        "jobs": jobs,
+        "modules": {module: [] for module in modules},
+    }
+    os.makedirs(run["dir"], exist_ok=True)
+    _provision_run_state["run"] = run
+    return run
+
+
+def _rusage_max_rss_kb(max_rss):
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+
+def run_measured_step(command, cwd, log_path, deadline=None):
+    """Run a shell step in a bash worker and return its telemetry.
+
+    Output still reaches the terminal (the step writes to a pty) and is
+    appended to log_path. CPU time and peak RSS cover everything the step
+    started. At the monotonic `deadline` the step and its descendants are
+    terminated.
+    """
+    started = time.monotonic()
+    pids, watchdogs = [], []
+
+    def on_start(pid):
+        register_provision_step(pid)
+        pids.append(pid)
+        if deadline:
+            watchdog = threading.Timer(max(0, deadline - time.monotonic()), kill_process_tree, (pid,))
+            watchdog.daemon = True
+            watchdog.start()
+            watchdogs.append(watchdog)
+
+    with open(log_path, "ab") as log:
+        returncode, (user, system, max_rss) = run_bash_step_measured(command, cwd, log, on_start)
+    for pid in pids:
+        register_provision_step(pid, running=False)
+    for watchdog in watchdogs:
+        watchdog.cancel()
+    return {
+        "exit_code": returncode,
+        "wall_seconds": round(time.monotonic() - started, 3),
+        "user_cpu_seconds": round(user, 3),
+        "system_cpu_seconds": round(system, 3),
+        "max_rss_kb": _rusage_max_rss_kb(max_rss),
+    }
+
+
+def run_module_step(module, label, command, cwd, runnable, members=None):
+    """Run one provisioning step of `module`, measuring it during a provisioning run.
+
+    Outside start_provision_run()/finish_provision_run(), `runnable` is called
+    unchanged; otherwise `command` runs through run_measured_step and its
+    telemetry lands in the run report. A step that `module` runs on behalf of
+    several `members` (e.g. a shared apt transaction) is recorded with that
+    list under each member instead. Returns (returncode, output).
+    """
+    run = _provision_run_state["run"]
+    if run is None:
+        return runnable()
+    # A timed out or cancelled module runs no further steps.
+    stop = provision_stop_reason(module)
+    if stop:
+        stop_provision_module(module, stop)
+        return 1, ""
+    log_path = os.path.join(run["dir"], _module_log_name(module))
+    step = {"step": label, **run_measured_step(command, cwd, log_path, provision_step_deadline(module))}
+    if members:
+        step.update(members=list(members), log=log_path)
+    with _provision_run_lock:
+        for owner in members or [module]:
+            run["modules"].setdefault(owner, []).append(step)
+    stop = provision_stop_reason(module) if step["exit_code"] != 0 else None
+    if stop:
+        stop_provision_module(module, stop)
+    return step["exit_code"], ""
+
+
+def _module_telemetry(steps):
+    return {
+        "wall_seconds": round(sum(step["wall_seconds"] for step in steps), 3),
+        "user_cpu_seconds": round(sum(step["user_cpu_seconds"] for step in steps), 3),
+        "system_cpu_seconds": round(sum(step["system_cpu_seconds"] for step in steps), 3),
+        "max_rss_kb": max((step["max_rss_kb"] for step in steps), default=0),
+    }
+
+
+def finish_provision_run(results):
+    """Write the run report for the active provisioning run; return its path.
+
+    The report holds each module's status, per-step telemetry, totals and log
+    path, plus `slowest`, the modules ranked by wall time.
+    """
+    run, _provision_run_state["run"] = _provision_run_state["run"], None
+    if run is None:
+        return None
+    modules = {}
+    for module in dict.fromkeys([*run["modules"], *results]):
+        steps = run["modules"].get(module, [])
+        status, detail = results.get(module, ("provisioned", None))
+        log_path = os.path.join(run["dir"], _module_log_name(module))
+        modules[module] = {
+            "status": status,
+            "detail": detail,
+            "log": log_path if os.path.exists(log_path) else None,
+            "steps": steps,
+            **_module_telemetry(steps),
+        }
+    report = {
+        "id": run["id"],
+        "host": run["host"],
+        "started_at": run["started_at"],
+        "finished_at": _utc_timestamp(),
+        "wall_seconds": round(time.monotonic() - run["started"], 3),
+        "jobs": run["jobs"],
+        "modules": modules,
+        "slowest": sorted(modules, key=lambda module: modules[module]["wall_seconds"], reverse=True),
+    }
+    report_path = os.path.join(run["dir"], "report.json")
+    write_json_file(report_path, report)
+    return report_path
+
+
+__all__ = [name for name in globals() if not name.startswith("__")]
@@ -7,16 +7,16 @@ def adapter_conflict_report(theme=None, prompt=None):
         target = entry["target"]
         if not os.path.lexists(target):
             continue
-        snapshot = file_snapshot(target)
-        source_hash = file_sha256(entry["source"])
-        target_hash = file_sha256(target)
-        if snapshot.get("type") == "symlink" and snapshot.get("link_target") == entry["source"]:
+        source_hash = cached_file_sha256(entry["source"])
+        target_hash = cached_file_sha256(target)
+        if os.path.islink(target) and os.readlink(target) == entry["source"]:
             status = "managed"
         elif source_hash and target_hash and source_hash == target_hash:
             status = "same-content"
         else:
             status = "conflict"
         conflicts.append({**entry, "status": status, "target_sha256": target_hash, "source_sha256": source_hash})
+    save_file_hash_cache()
     return {"conflicted": any(item["status"] == "conflict" for item in conflicts), "items": conflicts}
 
 
@@ -46,7 +46,7 @@ def health_report():
     preset = current_preset()
     theme = current_theme()
     prompt = current_prompt()
-    return {
+    report = {
         "preset": {"id": preset, "valid": preset in supported_presets()},
         "theme": {"id": theme, "valid": theme in supported_themes()},
         "prompt": {"id": prompt, "valid": prompt in supported_prompts()},
@@ -59,6 +59,8 @@ def health_report():
         "status": status_report(),
         "updates": client_update_preflight(),
     }
+    report["catalogs"]["registry_loads"] = copy.deepcopy(registry_load_counts)
+    return report
 
 
 def print_doctor_json():
@@ -1,49 +1,45 @@
 from .core import *
 
 
+def _prompt_catalog():
+    return compiled_catalog("prompts", prompt_profiles_path, prompt_catalog_path, _load_prompt_registry())
+
 def prompt_profiles():
-    registry = _load_prompt_registry()
-    profiles = _merge_catalog_manifests(
-        _read_manifest_dir(prompt_profiles_path, registry),
-        _read_manifest_dir(prompt_catalog_path, registry),
-    )
+    profiles = _prompt_catalog()["manifests"]
 
     if profiles:
-        return profiles
+        return copy.deepcopy(profiles)
 
     return [{"id": prompt} for prompt in SUPPORTED_PROMPTS]
 
 def supported_prompts():
-    return tuple(profile["id"] for profile in prompt_profiles())
+    return _prompt_catalog()["ids"] or SUPPORTED_PROMPTS
+
+def _preset_catalog():
+    return compiled_catalog("presets", preset_profiles_path, preset_catalog_path, _load_preset_registry())
 
 def preset_profiles():
-    registry = _load_preset_registry()
-    presets = _merge_catalog_manifests(
-        _read_manifest_dir(preset_profiles_path, registry),
-        _read_manifest_dir(preset_catalog_path, registry),
-    )
+    presets = _preset_catalog()["manifests"]
 
     if presets:
-        return presets
+        return copy.deepcopy(presets)
 
     return [{"id": DEFAULT_PRESET, "theme": DEFAULT_THEME, "prompt": DEFAULT_PROMPT}]
 
 def supported_presets():
-    return tuple(preset["id"] for preset in preset_profiles())
+    return _preset_catalog()["ids"] or (DEFAULT_PRESET,)
 
 def preset_by_id(preset):
-    return {
-        entry["id"]: entry
-        for entry in preset_profiles()
-        if entry.get("id")
-    }.get(preset)
+    catalog = _preset_catalog()
+    if not catalog["manifests"]:
+        return {entry["id"]: entry for entry in preset_profiles()}.get(preset)
+    return copy.deepcopy(catalog["by_id"].get(preset))
 
 def prompt_profile_by_id(prompt):
-    return {
-        entry["id"]: entry
-        for entry in prompt_profiles()
-        if entry.get("id")
-    }.get(prompt)
+    catalog = _prompt_catalog()
+    if not catalog["manifests"]:
+        return {entry["id"]: entry for entry in prompt_profiles()}.get(prompt)
+    return copy.deepcopy(catalog["by_id"].get(prompt))
 
 def colorscheme_module_dir():
     direct = os.path.join(module_path, "colorschemes")
@@ -59,25 +55,17 @@ def colorscheme_module_dir():
 def theme_manifests_dir():
     return os.path.join(colorscheme_module_dir(), "themes")
 
+def _theme_catalog():
+    return compiled_catalog("themes", theme_manifests_dir(), theme_catalog_path, _load_theme_registry())
+
 def theme_manifests():
-    registry = _load_theme_registry()
-    return _merge_catalog_manifests(
-        _read_manifest_dir(theme_manifests_dir(), registry),
-        _read_manifest_dir(theme_catalog_path, registry),
-    )
+    return copy.deepcopy(_theme_catalog()["manifests"])
 
 def supported_themes():
-    manifests = theme_manifests()
-    if manifests:
-        return tuple(theme["id"] for theme in manifests)
-    return SUPPORTED_THEMES
+    return _theme_catalog()["ids"] or SUPPORTED_THEMES
 
 def theme_manifest_by_id(theme):
-    return {
-        entry["id"]: entry
-        for entry in theme_manifests()
-        if entry.get("id")
-    }.get(theme)
+    return copy.deepcopy(_theme_catalog()["by_id"].get(theme))
 
 def read_profile():
     profile = {}
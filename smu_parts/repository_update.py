@@ -156,9 +156,12 @@ def update_modules_command(json_output=False, dry_run=False):
     return 0
 
 
-def update_all_command(json_output=False, force_reset=False, dry_run=False, validate=False):
+def update_all_command(json_output=False, force_reset=False, dry_run=False, validate=False, force=False):
     if dry_run:
-        actions = ["update-blueprint", "update-installer", "update-modules", "resolve-profile", "materialize-adapters"]
+        actions = [
+            "update-blueprint", "update-installer", "update-modules", "resolve-profile", "materialize-adapters",
+            "provision-changed-modules",
+        ]
         if validate:
             actions.append("doctor")
         if json_output:
@@ -176,9 +179,15 @@ def update_all_command(json_output=False, force_reset=False, dry_run=False, vali
     update_submodules()
     write_resolved_profile()
     materialize_adapters(current_theme(), current_prompt(), dry_run=False)
+    # Re-run previously provisioned modules; unchanged ones are skipped unless forced.
+    # With --json the batch summary goes to stderr so stdout stays one document.
+    with contextlib.redirect_stdout(sys.stderr) if json_output else contextlib.nullcontext():
+        failed_modules = provision_modules_batch(list(recorded_module_fingerprints()), force=force)
     exit_code = doctor() if validate else 0
+    exit_code = exit_code or (1 if failed_modules else 0)
     if json_output:
-        print(json.dumps({"repositories": results, "exit_code": exit_code}, indent=2, sort_keys=True))
+        print(json.dumps({"repositories": results, "failed_modules": failed_modules, "exit_code": exit_code},
+                         indent=2, sort_keys=True))
     else:
         print_repository_update_results(results, json_output=False)
     return exit_code
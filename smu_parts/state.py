@@ -116,14 +116,16 @@ def generated_config_paths():
 
 
 def generated_config_fingerprints():
-    return [
+    fingerprints = [
         {
             "path": path,
             "exists": os.path.lexists(path),
-            "sha256": file_sha256(path),
+            "sha256": cached_file_sha256(path),
         }
         for path in generated_config_paths()
     ]
+    save_file_hash_cache()
+    return fingerprints
 
 
 def config_drift_report():
@@ -148,11 +150,6 @@ def config_drift_report():
     return {"drifted": bool(drift), "items": drift}
 
 
-def read_update_lock():
-    data = _read_json_file(update_lock_path, {})
-    return data if isinstance(data, dict) else {}
-
-
 def default_update_policy():
     return {
         "ref": None,
@@ -247,32 +244,6 @@ def write_update_policy(policy):
     return merged
 
 
-def read_update_history():
-    data = _read_json_file(update_history_path, [])
-    return data if isinstance(data, list) else []
-
-
-def append_update_history(report):
-    entry = {
-        "updated_at": report.get("updated_at") or _utc_timestamp(),
-        "theme": report.get("theme"),
-        "prompt": report.get("prompt"),
-        "preset": report.get("preset"),
-        "ref": report.get("ref"),
-        "self_update": report.get("self_update", False),
-        "validate": report.get("validate", False),
-        "exit_code": report.get("exit_code", 0),
-        "actions": report.get("actions", []),
-        "repositories": report.get("repositories", []),
-        "report_delivery": report.get("report_delivery"),
-    }
-    history = read_update_history()
-    history.append(entry)
-    limit = read_update_policy().get("history_limit", 20)
-    write_json_file(update_history_path, history[-limit:])
-    return entry
-
-
 def update_rate_limit_status(policy=None):
     policy = policy or read_update_policy()
     interval = policy.get("min_interval_seconds", 0)
@@ -296,95 +267,12 @@ def update_rate_limit_status(policy=None):
     return {"status": "waiting" if wait_seconds else "ready", "wait_seconds": wait_seconds}
 
 
-def write_update_lock(report):
-    updated_at = _utc_timestamp()
-    lock = {
-        "updated_at": updated_at,
-        "smu_home": smu_home_dir,
-        "installer_root": installer_root,
-        "theme": report.get("theme"),
-        "prompt": report.get("prompt"),
-        "preset": report.get("preset"),
-        "ref": report.get("ref"),
-        "self_update": report.get("self_update", False),
-        "validate": report.get("validate", False),
-        "exit_code": report.get("exit_code", 0),
-        "repositories": report.get("repositories", []),
-        "actions": report.get("actions", []),
-        "generated_config": report.get("generated_config", []),
-    }
-    write_json_file(update_lock_path, lock)
-    append_update_history({**report, **lock})
-    return lock
-
-
-def read_state_ledger():
-    data = _read_json_file(state_ledger_path, [])
-    return data if isinstance(data, list) else []
-
-
-def write_state_ledger(entries):
-    os.makedirs(state_dir, exist_ok=True)
-    tmp_path = f"{state_ledger_path}.tmp"
-    with open(tmp_path, "w") as f:
-        json.dump(entries, f, indent=2, sort_keys=True)
-        f.write("\n")
-    os.replace(tmp_path, state_ledger_path)
-
-
-def record_state_event(operation, items):
-    entry = {
-        "id": _utc_timestamp(),
-        "operation": operation,
-        "items": items,
-    }
-    entries = read_state_ledger()
-    entries.append(entry)
-    write_state_ledger(entries)
-    return entry
+def file_snapshot(path, backup_dir=None):
+    """Record path so restore_file_snapshot can put it back.
 
-
-def last_state_event():
-    entries = read_state_ledger()
-    return entries[-1] if entries else None
-
-
-def state_event(event_id=None):
-    entries = read_state_ledger()
-    if not entries:
-        return None
-    if event_id is None:
-        return entries[-1]
-    for entry in entries:
-        if entry.get("id") == event_id:
-            return entry
-    return None
-
-
-def pop_state_event(event_id=None):
-    entries = read_state_ledger()
-    if not entries:
-        return None
-    if event_id is None:
-        event = entries.pop()
-    else:
-        event = None
-        remaining = []
-        for entry in entries:
-            if entry.get("id") == event_id:
-                event = entry
-            else:
-                remaining.append(entry)
-        entries = remaining
-    write_state_ledger(entries)
-    return event
-
-
-def pop_last_state_event():
-    return pop_state_event()
-
-
-def file_snapshot(path):
+    Regular files go to the blob store, or are hardlinked into backup_dir
+    when the caller replaces the path rather than writing it in place.
+    """
     if not os.path.lexists(path):
         return {"exists": False, "path": path}
     snapshot = {"exists": True, "path": path}
@@ -394,8 +282,11 @@ def file_snapshot(path):
         return snapshot
     if os.path.isfile(path):
         snapshot["type"] = "file"
-        with open(path, "rb") as f:
-            snapshot["content_hex"] = f.read().hex()
+        if backup_dir:
+            snapshot["backup"] = backup_file(path, backup_dir)
+        else:
+            snapshot["blob"] = store_file_blob(path)
+            snapshot["mode"] = stat.S_IMODE(os.stat(path).st_mode)
         return snapshot
     snapshot["type"] = "other"
     return snapshot
@@ -413,7 +304,14 @@ def restore_file_snapshot(snapshot):
         os.makedirs(os.path.dirname(path), exist_ok=True)
         os.symlink(snapshot["link_target"], path)
         return
+    if snapshot.get("type") == "file" and snapshot.get("backup"):
+        restore_file_backup(snapshot["backup"], path)
+        return
+    if snapshot.get("type") == "file" and snapshot.get("blob"):
+        restore_file_blob(snapshot["blob"], path, snapshot.get("mode"))
+        return
     if snapshot.get("type") == "file":
+        # Snapshots recorded before the blob store embed the content as hex.
         os.makedirs(os.path.dirname(path), exist_ok=True)
         with open(path, "wb") as f:
             f.write(bytes.fromhex(snapshot.get("content_hex", "")))
@@ -466,8 +364,8 @@ def print_diff_plan(plan):
             print(f"{item['change']}\tadapter\t{item['mode']}\t{item['source']}\t{item['target']}")
 
 
-def status_report(search=None, show_all=False, verbose=False):
-    modules = module_status_report(search=search, show_all=show_all, verbose=verbose)
+def status_report(search=None, show_all=False, verbose=False, jobs=None):
+    modules = module_status_report(search=search, show_all=show_all, verbose=verbose, jobs=jobs)
     adapters = []
     for entry in _read_adapter_manifest():
         item = dict(entry)
@@ -477,24 +375,26 @@ def status_report(search=None, show_all=False, verbose=False):
         "modules": modules,
         "adapters": adapters,
         "ledger": {
-            "path": state_ledger_path,
+            "backend": state_backend(),
+            "path": state_record_path(state_ledger_path),
             "entries": len(read_state_ledger()),
             "last": last_state_event(),
         },
         "updates": {
-            "path": update_lock_path,
+            "backend": state_backend(),
+            "path": state_record_path(update_lock_path),
             "last": read_update_lock(),
             "policy_path": update_policy_path,
             "policy": read_update_policy(),
             "policy_errors": validate_update_policy(),
-            "history_path": update_history_path,
+            "history_path": state_record_path(update_history_path),
             "history_entries": len(read_update_history()),
             "config_drift": config_drift_report(),
         },
     }
 
 
-def print_status_json(search=None, show_all=False, verbose=False):
-    print(json.dumps(status_report(search, show_all, verbose), indent=2, sort_keys=True))
+def print_status_json(search=None, show_all=False, verbose=False, jobs=None):
+    print(json.dumps(status_report(search, show_all, verbose, jobs), indent=2, sort_keys=True))
 
 __all__ = [name for name in globals() if not name.startswith("__")]
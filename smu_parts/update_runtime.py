@@ -32,8 +32,7 @@ def fetch_update_manifest(policy=None):
     if not url:
         return {"status": "disabled"}
     try:
-        with urllib.request.urlopen(url, timeout=10) as response:
-            data = response.read()
+        data = http_fetch_bytes(url, timeout=10)
     except (OSError, urllib.error.URLError, urllib.error.HTTPError) as e:
         return {"status": "failed", "error": str(e)}
     digest = hashlib.sha256(data).hexdigest()
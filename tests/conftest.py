@@ -1,4 +1,40 @@
 import os
 import sys
+import tempfile
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import smu  # noqa: E402
+
+
+def temporary_dir(test):
+    """Return a temporary directory that is removed when ``test`` finishes."""
+    tempdir = tempfile.TemporaryDirectory()
+    test.addCleanup(tempdir.cleanup)
+    return tempdir.name
+
+
+def start_patches(test, *patchers):
+    """Start ``patchers`` until ``test`` finishes and return what each one installed."""
+    started = []
+    for patcher in patchers:
+        started.append(patcher.start())
+        test.addCleanup(patcher.stop)
+    return started
+
+
+def patch_module_sandbox(test, root, profile=None):
+    """Point modules, the module index and state at ``root`` on a plain Linux host."""
+    return start_patches(
+        test,
+        patch.object(smu, "module_path", os.path.join(root, "modules")),
+        patch.object(smu, "module_index_path", os.path.join(root, "module-index.json")),
+        patch.object(smu, "state_dir", os.path.join(root, "state")),
+        patch.object(smu, "state_ledger_path", os.path.join(root, "state", "ledger.json")),
+        patch.object(smu, "smu_home_dir", root),
+        patch.object(smu, "macOS", False),
+        patch.object(smu, "debian", False),
+        patch.object(smu, "arch", False),
+        patch.object(smu, "resolved_profile", return_value=profile or {}),
+    )
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import smu
+from tests.conftest import start_patches, temporary_dir
+
+
+PACKAGES = {
+    "base": 'apt "git"\napt "curl"\n',
+    "server/docker": 'ppa "docker/stable"\napt "docker-ce"\napt "git"\n',
+    "server/tools": 'apt "jq"\ndeb "slack" [args: "https://example.com/slack.deb", "slack.deb"]\n'
+                    'snap "htop" [args: ""]\nsnap "code" [args: "--classic"]\n',
+}
+
+
+class TestAptTransaction(unittest.TestCase):
+    def setUp(self):
+        tempdir = temporary_dir(self)
+        self.paths = {}
+        for module, content in PACKAGES.items():
+            module_dir = os.path.join(tempdir, module)
+            os.makedirs(module_dir)
+            self.paths[module] = os.path.join(module_dir, "packages")
+            with open(self.paths[module], "w") as f:
+                f.write(content)
+        self.paths["dotfiles"] = os.path.join(tempdir, "dotfiles", "dotfiles.sh")
+
+        self.steps = []
+        start_patches(
+            self,
+            patch.object(smu, "debian", True),
+            patch.object(smu, "get_module_path", side_effect=self.paths.get),
+            patch.object(smu, "package_snapshot_entry_installed",
+                         side_effect=lambda kind, groups: groups == ("curl",)),
+            patch.dict(os.environ, {"SMU_APT_TRANSACTION": "1"}),
+            patch.object(smu, "run_bash_step",
+                         side_effect=lambda command, cwd=None: self.steps.append(command) or (0, "")),
+        )
+
+    def test_plan_unions_missing_entries_once(self):
+        plan = smu.apt_transaction_plan(["base", "server/docker", "server/tools", "dotfiles"])
+
+        self.assertEqual(list(plan["modules"]), ["base", "server/docker", "server/tools"])
+        self.assertEqual(plan["apt"], [("git",), ("docker-ce",), ("jq",)])
+        self.assertEqual(plan["ppa"], [("docker/stable",)])
+
+        labels = [label for label, _ in smu.apt_transaction_steps(plan)]
+        self.assertEqual(labels, [
+            "add ppa:docker/stable", "apt-get update", "download slack",
+            "apt-get install (4 packages)", "snap install (1 snaps)", "snap install code",
+        ])
+
+    def test_packages_modules_share_one_transaction_with_attribution(self):
+        run = []
+        modules = ["base", "server/docker", "dotfiles", "server/tools"]
+        results = smu.run_provisioning_schedule(
+            modules, lambda module: run.append(module) or ("provisioned", None),
+            batches=smu.apt_transaction_batches(modules),
+        )
+
+        self.assertEqual(run, ["dotfiles"])
+        self.assertEqual(sum("apt-get update" in step for step in self.steps), 1)
+        self.assertEqual(sum("apt-get install" in step for step in self.steps), 1)
+        self.assertEqual(results["server/docker"],
+                         ("provisioned", "shared apt transaction of 3 modules; 3 entries from this module"))
+        self.assertEqual(results["dotfiles"], ("provisioned", None))
+
+    def test_failed_step_errors_every_member_and_blocks_dependents(self):
+        with patch.object(smu, "run_bash_step", return_value=(100, "")):
+            with redirect_stdout(io.StringIO()), patch("sys.stderr", io.StringIO()):
+                modules = ["base", "server/docker", "dotfiles"]
+                results = smu.run_provisioning_schedule(
+                    modules, lambda module: ("provisioned", None), batches=smu.apt_transaction_batches(modules),
+                )
+
+        self.assertEqual(results["base"], ("errored",
+                                           "apt transaction step 'add ppa:docker/stable' failed; 2 entries from this module"))
+        self.assertEqual(results["server/docker"][0], "errored")
+        self.assertEqual(results["dotfiles"], ("blocked", "dependency apt-transaction did not provision"))
+
+    def test_disabled_mode_runs_modules_one_by_one(self):
+        run = []
+        with patch.dict(os.environ, {"SMU_APT_TRANSACTION": "0"}):
+            modules = ["base", "server/docker"]
+            smu.run_provisioning_schedule(modules, lambda module: run.append(module) or ("provisioned", None),
+                                          batches=smu.apt_transaction_batches(modules))
+
+        self.assertEqual(run, ["base", "server/docker"])
+        self.assertEqual(self.steps, [])
+
+    def test_run_report_attributes_transaction_steps_to_each_member(self):
+        modules = ["base", "server/docker"]
+        with tempfile.TemporaryDirectory() as tempdir, \
+                patch.object(smu, "state_dir", tempdir), \
+                patch.object(smu, "run_measured_step", return_value={
+                    "exit_code": 0, "wall_seconds": 2.0, "user_cpu_seconds": 1.0,
+                    "system_cpu_seconds": 0.5, "max_rss_kb": 100,
+                }), redirect_stdout(io.StringIO()):
+            smu.start_provision_run(modules)
+            results = smu.run_provisioning_schedule(modules, lambda module: ("provisioned", None),
+                                                    batches=smu.apt_transaction_batches(modules))
+            with open(smu.finish_provision_run(results)) as f:
+                report = json.load(f)
+
+        self.assertNotIn("apt-transaction", report["modules"])
+        for module in modules:
+            steps = report["modules"][module]["steps"]
+            self.assertEqual([step["step"] for step in steps],
+                             ["add ppa:docker/stable", "apt-get update", "apt-get install (2 packages)"])
+            self.assertEqual(steps[0]["members"], modules)
+            self.assertEqual(report["modules"][module]["wall_seconds"], 6.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import smu
+
+
+class TestBashWorker(unittest.TestCase):
+    def setUp(self):
+        smu.shutdown_bash_workers()
+        self.addCleanup(smu.shutdown_bash_workers)
+
+    def _home(self, tempdir, counter):
+        utilities = os.path.join(tempdir, "dotfiles", "utilities", "utilities.sh")
+        os.makedirs(os.path.dirname(utilities))
+        with open(utilities, "w") as f:
+            f.write(f"echo sourced >> {counter}\ngreet() {{ echo \"hello $1\"; }}\n")
+        return tempdir
+
+    def test_utilities_sourced_once_across_steps(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            counter = os.path.join(tempdir, "sourced")
+            with patch.object(smu, "smu_home_dir", self._home(tempdir, counter)):
+                started = smu._bash_worker_state["started"]
+                first = smu.run_bash_step("greet one", cwd=tempdir, capture=True)
+                second = smu.run_bash_step("greet two; exit 3", cwd=tempdir, capture=True)
+
+            with open(counter) as f:
+                sourced = f.read().split()
+
+        self.assertEqual(first, (0, "hello one\n"))
+        self.assertEqual(second, (3, "hello two\n"))
+        self.assertEqual(sourced, ["sourced"])
+        self.assertEqual(smu._bash_worker_state["started"], started + 1)
+
+    def test_steps_run_in_isolated_subshells(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            counter = os.path.join(tempdir, "sourced")
+            step_dir = os.path.join(tempdir, "module")
+            os.makedirs(step_dir)
+            with patch.object(smu, "smu_home_dir", self._home(tempdir, counter)):
+                smu.run_bash_step("STEP_VAR=leaked; cd /", cwd=step_dir, capture=True)
+                code, output = smu.run_bash_step('echo "${STEP_VAR:-unset} $PWD $#"', cwd=step_dir, capture=True)
+
+        self.assertEqual(code, 0)
+        self.assertEqual(output.split(), ["unset", step_dir, "0"])
+
+    def test_worker_restarts_when_environment_changes(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            counter = os.path.join(tempdir, "sourced")
+            with patch.object(smu, "smu_home_dir", self._home(tempdir, counter)):
+                smu.run_bash_step("true", capture=True)
+                with patch.dict(os.environ, {"SMU_WORKER_TEST": "1"}):
+                    code, output = smu.run_bash_step('echo "$SMU_WORKER_TEST"', capture=True)
+
+        self.assertEqual((code, output), (0, "1\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import os
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest.mock import patch
+
+import smu
+from tests.conftest import patch_module_sandbox, start_patches, temporary_dir
+
+
+class TestIncrementalProvisioning(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = temporary_dir(self)
+        self.module_dir = os.path.join(self.tempdir, "modules", "universal", "tool")
+        os.makedirs(self.module_dir)
+        self._write("tool.sh", "echo tool\n")
+
+        patch_module_sandbox(self, self.tempdir, profile={"SMU_THEME": "dark"})
+        self.real_provision_module = smu.provision_module
+        self.provision, = start_patches(self, patch.object(smu, "provision_module", return_value=True))
+
+    def _write(self, name, content):
+        with open(os.path.join(self.module_dir, name), "w") as f:
+            f.write(content)
+
+    def _run(self, force=False):
+        self.provision.reset_mock()
+        with redirect_stdout(io.StringIO()):
+            smu.provision_modules_batch(["tool"], force=force)
+        return self.provision.call_count
+
+    def test_unchanged_module_is_skipped_until_inputs_change(self):
+        self.assertEqual(self._run(), 1)
+        recorded = smu.recorded_module_fingerprints()
+        self.assertEqual(recorded["tool"], smu.module_input_fingerprint("tool"))
+
+        self.assertEqual(self._run(), 0)
+
+        self._write("tool.sh", "echo tool v2\n")
+        self.assertEqual(self._run(), 1)
+
+    def test_profile_change_and_force_rerun_module(self):
+        self._run()
+        self.assertEqual(self._run(force=True), 1)
+
+        with patch.object(smu, "resolved_profile", return_value={"SMU_THEME": "light"}):
+            self.assertEqual(self._run(), 1)
+
+    def test_missing_status_or_uninstall_reruns_module(self):
+        self._run()
+        with patch.object(smu, "module_status", return_value=("missing", None)):
+            self.assertEqual(self._run(), 1)
+
+        smu.record_state_event("uninstall_modules", [{"module": "tool"}])
+        self.assertNotIn("tool", smu.recorded_module_fingerprints())
+        self.assertEqual(self._run(), 1)
+
+    def test_failed_module_is_not_fingerprinted_and_reruns(self):
+        self._write("tool.sh", "echo tool; exit 3\n")
+        self.provision.side_effect = self.real_provision_module
+
+        self.assertEqual(self._run(), 1)
+        self.assertNotIn("tool", smu.recorded_module_fingerprints())
+        self.assertIsNone(smu.last_state_event())
+        self.assertEqual(self._run(), 1)
+
+    def test_update_all_exit_code_counts_failed_modules(self):
+        self._run()
+        self._write("tool.sh", "echo tool; exit 3\n")
+        self.provision.side_effect = self.real_provision_module
+        updated = {"status": "updated"}
+
+        with patch.object(smu, "update_blueprint", return_value=updated), \
+                patch.object(smu, "update_installer_repository", return_value=updated), \
+                patch.object(smu, "update_submodules"), \
+                patch.object(smu, "write_resolved_profile"), \
+                patch.object(smu, "materialize_adapters"), \
+                patch.object(smu, "current_theme"), \
+                patch.object(smu, "current_prompt"), \
+                redirect_stdout(io.StringIO()) as stdout, redirect_stderr(io.StringIO()):
+            exit_code = smu.update_all_command(json_output=True)
+
+        self.assertEqual(exit_code, 1)
+        self.assertEqual(json.loads(stdout.getvalue())["failed_modules"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import signal
+import time
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest.mock import patch
+
+import smu
+from tests.conftest import patch_module_sandbox, start_patches, temporary_dir
+
+
+class TestProvisionCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = temporary_dir(self)
+        for module, script in (("first", "echo first\n"), ("second", "echo second\n"), ("slow", "sleep 30\n")):
+            module_dir = os.path.join(self.tempdir, "modules", "universal", module)
+            os.makedirs(module_dir)
+            with open(os.path.join(module_dir, f"{module}.sh"), "w") as f:
+                f.write(script)
+
+        patch_module_sandbox(self, self.tempdir)
+        start_patches(self, patch.dict(os.environ, {"SMU_MODULE_TIMEOUT": "", "SMU_PROVISION_TIMEOUT": ""}))
+
+    def _batch(self, modules, resume=False):
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            smu.provision_modules_batch(modules, resume=resume)
+        return smu.last_state_event()
+
+    def test_interrupted_batch_resumes_with_unfinished_modules(self):
+        provisioned = []
+
+        def provision(module):
+            provisioned.append(module)
+            if module == "first":
+                smu._cancel_provision_batch(signal.SIGINT, None)
+            return True
+
+        with patch.object(smu, "provision_module", side_effect=provision):
+            self._batch(["first", "second"])
+
+        checkpoint = smu.read_provision_checkpoint()
+        self.assertEqual(checkpoint["modules"], ["first", "second"])
+        self.assertEqual(list(checkpoint["completed"]), ["first"])
+        self.assertEqual(provisioned, ["first"])
+
+        with patch.object(smu, "provision_module", side_effect=provision) as resumed:
+            event = self._batch(checkpoint["modules"], resume=True)
+
+        resumed.assert_called_once_with("second")
+        self.assertEqual([item["module"] for item in event["items"]], ["first", "second"])
+        self.assertIsNone(smu.read_provision_checkpoint())
+
+    def _packages_modules(self):
+        for module, content in (("tools/git", 'apt "git"\n'), ("server/docker", 'apt "docker-ce"\n')):
+            module_dir = os.path.join(self.tempdir, "modules", "debian", module)
+            os.makedirs(module_dir)
+            with open(os.path.join(module_dir, "packages"), "w") as f:
+                f.write(content)
+        steps = []
+
+        def measured_step(command, cwd, log_path, deadline=None):
+            steps.append((command, deadline))
+            return {"exit_code": 0, "wall_seconds": 0.0, "user_cpu_seconds": 0.0,
+                    "system_cpu_seconds": 0.0, "max_rss_kb": 0}
+
+        start_patches(
+            self,
+            patch.object(smu, "debian", True),
+            patch.object(smu, "package_snapshot_entry_installed", return_value=False),
+            patch.object(smu, "run_measured_step", side_effect=measured_step),
+            patch.dict(os.environ, {"SMU_APT_TRANSACTION": "1", "SMU_MODULE_TIMEOUT": "600"}),
+        )
+        return steps
+
+    def test_resume_does_not_repeat_a_finished_apt_transaction(self):
+        steps = self._packages_modules()
+        modules = ["tools/git", "server/docker", "first", "second"]
+
+        def provision(module):
+            smu._cancel_provision_batch(signal.SIGINT, None)
+            return True
+
+        with patch.object(smu, "provision_module", side_effect=provision):
+            self._batch(modules)
+
+        checkpoint = smu.read_provision_checkpoint()
+        self.assertEqual({module: entry["result"][0] for module, entry in checkpoint["completed"].items()},
+                         {"tools/git": "provisioned", "server/docker": "provisioned", "first": "provisioned"})
+        self.assertTrue(steps)
+        self.assertTrue(all(deadline for _, deadline in steps))
+
+        del steps[:]
+        with patch.object(smu, "provision_module", return_value=True) as resumed:
+            self._batch(modules, resume=True)
+
+        resumed.assert_called_once_with("second")
+        self.assertEqual(steps, [])
+        self.assertIsNone(smu.read_provision_checkpoint())
+
+    def test_interrupted_apt_transaction_keeps_the_checkpoint(self):
+        steps = self._packages_modules()
+
+        def cancel(command, cwd, log_path, deadline=None):
+            steps.append(command)
+            smu._cancel_provision_batch(signal.SIGINT, None)
+            return {"exit_code": 130, "wall_seconds": 0.0, "user_cpu_seconds": 0.0,
+                    "system_cpu_seconds": 0.0, "max_rss_kb": 0}
+
+        with patch.object(smu, "run_measured_step", side_effect=cancel), \
+                redirect_stdout(io.StringIO()) as stdout, redirect_stderr(io.StringIO()):
+            smu.provision_modules_batch(["tools/git", "server/docker"])
+
+        checkpoint = smu.read_provision_checkpoint()
+        self.assertEqual(len(steps), 1)
+        self.assertEqual({module: entry["result"][0] for module, entry in checkpoint["completed"].items()},
+                         {"tools/git": "cancelled", "server/docker": "cancelled"})
+        self.assertIn("--resume", stdout.getvalue())
+
+    def test_module_timeout_stops_the_step_and_the_batch_continues(self):
+        with patch.dict(os.environ, {"SMU_MODULE_TIMEOUT": "0.5"}):
+            started = time.monotonic()
+            event = self._batch(["slow", "first"])
+
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertEqual([item["module"] for item in event["items"]], ["first"])
+        self.assertIsNone(smu.read_provision_checkpoint())
+
+    def test_invalid_timeout_is_rejected(self):
+        with patch.dict(os.environ, {"SMU_PROVISION_TIMEOUT": "soon"}), redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit):
+                smu.provision_timeouts()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import smu
+
+
+def _node(module, index, dependencies=(), resources=(), conflicts=()):
+    return {
+        "module": module,
+        "index": index,
+        "order": 100,
+        "dependencies": list(dependencies),
+        "conflicts": list(conflicts),
+        "resources": set(resources),
+    }
+
+
+class TestProvisionScheduler(unittest.TestCase):
+    def test_independent_modules_run_concurrently_after_dependencies(self):
+        barrier = threading.Barrier(2, timeout=5)
+        finished = []
+        nodes = {
+            "base": _node("base", 0),
+            "fonts": _node("fonts", 1, ["base"]),
+            "node": _node("node", 2, ["base"]),
+        }
+
+        def run(module):
+            if module != "base":
+                self.assertIn("base", finished)
+                barrier.wait()
+            finished.append(module)
+            return ("provisioned", None)
+
+        results = smu.run_module_schedule(nodes, run, jobs=4)
+
+        self.assertEqual(finished[0], "base")
+        self.assertEqual({status for status, _ in results.values()}, {"provisioned"})
+
+    def test_shared_resource_never_overlaps(self):
+        active = []
+        overlaps = []
+        lock = threading.Lock()
+        nodes = {name: _node(name, index, resources=["apt"]) for index, name in enumerate(("a", "b", "c"))}
+
+        def run(module):
+            with lock:
+                active.append(module)
+                if len(active) > 1:
+                    overlaps.append(tuple(active))
+            time.sleep(0.01)
+            with lock:
+                active.remove(module)
+            return ("provisioned", None)
+
+        smu.run_module_schedule(nodes, run, jobs=3)
+
+        self.assertEqual(overlaps, [])
+
+    def test_failure_blocks_only_dependent_subtree(self):
+        nodes = {
+            "a": _node("a", 0),
+            "b": _node("b", 1, ["a"]),
+            "c": _node("c", 2, ["b"]),
+            "d": _node("d", 3),
+        }
+
+        def run(module):
+            return ("errored", "boom") if module == "a" else ("provisioned", None)
+
+        results = smu.run_module_schedule(nodes, run, jobs=2)
+
+        self.assertEqual(results["a"], ("errored", "boom"))
+        self.assertEqual(results["b"], ("blocked", "dependency a did not provision"))
+        self.assertEqual(results["c"], ("blocked", "dependency b did not provision"))
+        self.assertEqual(results["d"], ("provisioned", None))
+
+    def test_skipped_or_cancelled_dependencies_block_dependents(self):
+        nodes = {
+            "a": _node("a", 0),
+            "b": _node("b", 1),
+            "c": _node("c", 2),
+            "after-a": _node("after-a", 3, ["a"]),
+            "after-b": _node("after-b", 4, ["b"]),
+            "after-c": _node("after-c", 5, ["c"]),
+        }
+        outcomes = {"a": ("skipped", None), "b": ("cancelled", "total timeout reached")}
+
+        results = smu.run_module_schedule(
+            nodes, lambda module: outcomes.get(module, ("provisioned", None)), results={"c": ("unchanged", None)},
+        )
+
+        self.assertEqual(results["after-a"], ("blocked", "dependency a did not provision"))
+        self.assertEqual(results["after-b"], ("blocked", "dependency b did not provision"))
+        self.assertEqual(results["after-c"], ("provisioned", None))
+
+    def test_conflicts_and_cycles_are_not_run(self):
+        nodes = {
+            "zsh": _node("zsh", 0),
+            "fish": _node("fish", 1, conflicts=["zsh"]),
+            "x": _node("x", 2, ["y"]),
+            "y": _node("y", 3, ["x"]),
+        }
+        ran = []
+
+        results = smu.run_module_schedule(nodes, lambda module: ran.append(module) or ("provisioned", None))
+
+        self.assertEqual(ran, ["zsh"])
+        self.assertEqual(results["fish"], ("blocked", "conflicts with zsh"))
+        self.assertEqual(results["x"], ("blocked", "dependency cycle"))
+
+    def test_nodes_read_module_toml_and_default_resources(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            modules_root = os.path.join(tempdir, "modules")
+            for rel_path, content in (
+                ("debian/browsers/chrome/packages", 'apt "chromium"\n'),
+                ("universal/node/node.sh", ""),
+                ("universal/node/module.toml", 'dependencies = ["git", "absent"]\nresources = []\n'),
+                ("universal/git/git.sh", ""),
+                ("universal/git/module.toml", 'resources = ["package-manager"]\n'),
+                ("universal/fonts/fonts.sh", ""),
+            ):
+                path = os.path.join(modules_root, rel_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write(content)
+
+            with patch.object(smu, "module_path", modules_root), \
+                    patch.object(smu, "module_index_path", os.path.join(tempdir, "module-index.json")), \
+                    patch.object(smu, "debian", True), \
+                    patch.object(smu, "macOS", False), \
+                    patch.object(smu, "arch", False):
+                nodes = smu.module_schedule_nodes(["browsers/chrome", "node", "git", "fonts"])
+
+        self.assertEqual(nodes["browsers/chrome"]["resources"], {"apt"})
+        self.assertEqual(nodes["node"]["resources"], set())
+        self.assertEqual(nodes["node"]["dependencies"], ["git"])
+        self.assertEqual(nodes["git"]["resources"], {"apt"})
+        self.assertEqual(nodes["fonts"]["resources"], {"apt"})
+
+    def test_script_modules_without_resources_never_overlap(self):
+        active = []
+        overlaps = []
+        lock = threading.Lock()
+
+        def run(module):
+            with lock:
+                active.append(module)
+                if len(active) > 1:
+                    overlaps.append(tuple(active))
+            time.sleep(0.01)
+            with lock:
+                active.remove(module)
+            return ("provisioned", None)
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            modules_root = os.path.join(tempdir, "modules")
+            for name in ("node", "rust"):
+                path = os.path.join(modules_root, "universal", name, f"{name}.sh")
+                os.makedirs(os.path.dirname(path))
+                open(path, "w").close()
+
+            with patch.object(smu, "module_path", modules_root), \
+                    patch.object(smu, "module_index_path", os.path.join(tempdir, "module-index.json")), \
+                    patch.object(smu, "debian", False), \
+                    patch.object(smu, "macOS", True), \
+                    patch.object(smu, "arch", False):
+                nodes = smu.module_schedule_nodes(["node", "rust"])
+                results = smu.run_module_schedule(nodes, run, jobs=2)
+
+        self.assertEqual(nodes["node"]["resources"], {"brew"})
+        self.assertEqual(overlaps, [])
+        self.assertEqual({status for status, _ in results.values()}, {"provisioned"})
+
+
+if __name__ == "__main__":
+    unittest.main()
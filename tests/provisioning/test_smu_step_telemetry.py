@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import os
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import smu
+from tests.conftest import patch_module_sandbox, temporary_dir
+
+
+class TestStepTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = temporary_dir(self)
+        self.module_dir = os.path.join(self.tempdir, "modules", "universal", "tool")
+        os.makedirs(self.module_dir)
+        for name, content in (("before.sh", "echo before\n"), ("tool.sh", "echo main\n")):
+            with open(os.path.join(self.module_dir, name), "w") as f:
+                f.write(content)
+
+        patch_module_sandbox(self, self.tempdir)
+
+    def test_measured_step_reports_usage_and_tees_output(self):
+        log_path = os.path.join(self.tempdir, "step.log")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            step = smu.run_measured_step("echo hello; exit 3", self.tempdir, log_path)
+
+        self.assertEqual(step["exit_code"], 3)
+        self.assertGreater(step["max_rss_kb"], 0)
+        self.assertGreaterEqual(step["wall_seconds"], 0)
+        self.assertIn("user_cpu_seconds", step)
+        self.assertEqual(output.getvalue(), "hello\n")
+        with open(log_path) as f:
+            self.assertEqual(f.read(), "hello\n")
+
+    def test_measured_steps_share_a_worker_and_keep_a_terminal(self):
+        utilities = os.path.join(self.tempdir, "dotfiles", "utilities", "utilities.sh")
+        os.makedirs(os.path.dirname(utilities))
+        with open(utilities, "w") as f:
+            f.write(f"echo sourced >> {self.tempdir}/sourced\n")
+        smu.shutdown_bash_workers()
+        self.addCleanup(smu.shutdown_bash_workers)
+        log_path = os.path.join(self.tempdir, "step.log")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            for _ in range(2):
+                step = smu.run_measured_step("[ -t 1 ] && printf 'tty \\303\\251\\n'", self.tempdir, log_path)
+                self.assertEqual(step["exit_code"], 0)
+
+        self.assertEqual(output.getvalue(), "tty \u00e9\n" * 2)
+        with open(os.path.join(self.tempdir, "sourced")) as f:
+            self.assertEqual(f.read().split(), ["sourced"])
+
+    def test_fallback_without_a_worker_still_tees_into_the_log(self):
+        log_path = os.path.join(self.tempdir, "step.log")
+        output = io.StringIO()
+        with patch.object(smu, "_acquire_bash_worker", return_value=None), redirect_stdout(output):
+            step = smu.run_measured_step("echo hello; echo oops >&2; exit 3", self.tempdir, log_path)
+
+        self.assertEqual(step["exit_code"], 3)
+        self.assertEqual(output.getvalue(), "hello\noops\n")
+        with open(log_path) as f:
+            self.assertEqual(f.read(), "hello\noops\n")
+
+    def test_outside_a_run_steps_use_the_given_runnable(self):
+        self.assertEqual(smu.run_module_step("tool", "main", "false", self.tempdir, lambda: (0, "ran")), (0, "ran"))
+
+    def test_provision_batch_writes_report_linked_from_ledger(self):
+        with redirect_stdout(io.StringIO()):
+            smu.provision_modules_batch(["tool"])
+
+        event = smu.last_state_event()
+        report_path = event["items"][0]["report"]
+        with open(report_path) as f:
+            report = json.load(f)
+
+        module = report["modules"]["tool"]
+        self.assertEqual(report["slowest"], ["tool"])
+        self.assertEqual(module["status"], "provisioned")
+        self.assertEqual([(step["step"], step["exit_code"]) for step in module["steps"]],
+                         [("before.sh", 0), ("tool.sh", 0)])
+        with open(module["log"]) as f:
+            self.assertEqual(f.read(), "before\nmain\n")
+        self.assertIsNone(smu._provision_run_state["run"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
+import io
 import os
+import subprocess
 import tempfile
 import unittest
+from contextlib import redirect_stderr
 from unittest.mock import patch
 
 import smu
@@ -50,12 +53,21 @@ class TestBrewfileModuleProvisioning(unittest.TestCase):
     def test_provision_module_runs_brew_bundle_for_brewfile(self):
         with patch("smu.get_module_path", return_value="/tmp/module/brewfile"), \
                 patch("smu.subprocess.call", return_value=0), \
-                patch("smu.subprocess.run") as mock_run, \
+                patch("smu.subprocess.run", return_value=subprocess.CompletedProcess([], 0)) as mock_run, \
                 patch("smu.os.chdir"):
             was_provisioned = smu.provision_module("homebrew")
 
-        self.assertTrue(was_provisioned)
-        mock_run.assert_called_once_with("brew bundle install --file brewfile", shell=True)
+        self.assertIs(was_provisioned, True)
+        mock_run.assert_called_once_with("brew bundle install --file brewfile", shell=True, cwd="/tmp/module")
+
+    def test_provision_module_reports_failed_brew_bundle_as_errored(self):
+        with patch("smu.get_module_path", return_value="/tmp/module/brewfile"), \
+                patch("smu.subprocess.call", return_value=0), \
+                patch("smu.subprocess.run", return_value=subprocess.CompletedProcess([], 1)), \
+                redirect_stderr(io.StringIO()):
+            was_provisioned = smu.provision_module("homebrew")
+
+        self.assertEqual(was_provisioned, "errored")
 
     def test_provision_module_returns_false_when_module_path_missing(self):
         with patch("smu.get_module_path", return_value=None):
@@ -99,13 +111,13 @@ class TestPackagesModuleProvisioning(unittest.TestCase):
         with patch("smu.get_module_path", return_value="/tmp/module/packages"), \
                 patch.object(smu, "debian", True), \
                 patch("smu.subprocess.call", return_value=0), \
-                patch("smu.subprocess.run") as mock_run, \
+                patch("smu.run_bash_step", return_value=(0, "")) as mock_step, \
                 patch("smu.os.chdir"):
             was_provisioned = smu.provision_module("browsers/chrome")
 
         self.assertTrue(was_provisioned)
-        mock_run.assert_called_once()
-        cmd = mock_run.call_args[0][0]
+        mock_step.assert_called_once()
+        cmd = mock_step.call_args[0][0]
         self.assertIn("apt_install_from_file packages", cmd)
 
     def test_provision_module_skips_packages_on_non_debian(self):
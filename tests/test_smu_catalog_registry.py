@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 
+import hashlib
+import io
 import json
 import os
 import pathlib
 import tempfile
+import threading
 import unittest
+import urllib.error
 import zipfile
 from unittest.mock import patch
 
@@ -20,6 +24,8 @@ def _touch(path):
 class _FakeResponse:
     def __init__(self, data):
         self.data = data
+        self.headers = {}
+        self.status = 200
 
     def __enter__(self):
         return self
@@ -256,13 +262,14 @@ class TestCatalogRegistry(unittest.TestCase):
             ).encode(),
         }
 
-        def fake_urlopen(url, timeout=30):
-            return _FakeResponse(responses[url])
+        def fake_urlopen(request, timeout=30):
+            return _FakeResponse(responses[request.full_url])
 
         with tempfile.TemporaryDirectory() as tempdir:
             with (
                 patch.object(smu, "catalog_registries_path", os.path.join(tempdir, "registries.toml")),
                 patch.object(smu, "catalog_cache_path", os.path.join(tempdir, "cache")),
+                patch.object(smu, "http_cache_dir", os.path.join(tempdir, "http")),
                 patch("smu.urllib.request.urlopen", side_effect=fake_urlopen),
             ):
                 self.assertEqual(smu._catalog_registry_add("remote", index_url), 0)
@@ -271,6 +278,44 @@ class TestCatalogRegistry(unittest.TestCase):
                 self.assertEqual(entries[0]["id"], "work")
                 self.assertEqual(entries[0]["source"], pack_url)
 
+    def test_registry_indexes_are_fetched_once_concurrently_and_fail_independently(self):
+        responses = {
+            f"https://{name}.example.com/index.toml": (
+                "schema_version = 1\n"
+                f"[packs.{name}-pack]\n"
+                f'name = "{name}"\n'
+                f'source = "https://{name}.example.com/pack.zip"\n'
+            ).encode()
+            for name in ("alpha", "beta")
+        }
+        barrier = threading.Barrier(len(responses), timeout=5)
+        fetched = []
+
+        def fake_urlopen(request, timeout=30):
+            fetched.append(request.full_url)
+            if request.full_url not in responses:
+                raise urllib.error.URLError("connection refused")
+            barrier.wait()
+            return _FakeResponse(responses[request.full_url])
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            with (
+                patch.object(smu, "catalog_registries_path", os.path.join(tempdir, "registries.toml")),
+                patch.object(smu, "catalog_cache_path", os.path.join(tempdir, "cache")),
+                patch.object(smu, "http_cache_dir", os.path.join(tempdir, "http")),
+                patch.object(smu, "default_jobs", return_value=4),
+                patch("smu.urllib.request.urlopen", side_effect=fake_urlopen),
+            ):
+                for name in ("alpha", "beta", "gamma"):
+                    smu._catalog_registry_add(name, f"https://{name}.example.com/index.toml")
+                errors = smu._catalog_registry_errors()
+                entries = smu._catalog_registry_entries()
+
+        self.assertEqual(len(errors), 1)
+        self.assertIn("registry gamma could not be loaded", errors[0])
+        self.assertEqual([entry["id"] for entry in entries], ["alpha-pack", "beta-pack"])
+        self.assertEqual(sorted(fetched), sorted([*responses, "https://gamma.example.com/index.toml"]))
+
     def test_catalog_install_resolves_https_pack_zip_from_registry(self):
         index_url = "https://example.com/index.toml"
         pack_url = "https://example.com/work.smu-pack.zip"
@@ -293,8 +338,8 @@ class TestCatalogRegistry(unittest.TestCase):
                 pack_url: archive_bytes,
             }
 
-            def fake_urlopen(url, timeout=30):
-                return _FakeResponse(responses[url])
+            def fake_urlopen(request, timeout=30):
+                return _FakeResponse(responses[request.full_url])
 
             prompt_target = os.path.join(tempdir, "catalogs", "prompt-profiles")
             with (
@@ -329,12 +374,13 @@ class TestCatalogRegistry(unittest.TestCase):
                 pack_url: archive_bytes,
             }
 
-            def fake_urlopen(url, timeout=30):
-                return _FakeResponse(responses[url])
+            def fake_urlopen(request, timeout=30):
+                return _FakeResponse(responses[request.full_url])
 
             with (
                 patch.object(smu, "catalog_registries_path", os.path.join(tempdir, "registries.toml")),
                 patch.object(smu, "catalog_cache_path", os.path.join(tempdir, "cache")),
+                patch.object(smu, "http_cache_dir", os.path.join(tempdir, "http")),
                 patch("smu.urllib.request.urlopen", side_effect=fake_urlopen),
             ):
                 self.assertEqual(smu._catalog_registry_add("remote", index_url), 0)
@@ -377,13 +423,74 @@ class TestCatalogRegistry(unittest.TestCase):
             with open(archive_path, "rb") as f:
                 archive_bytes = f.read()
 
-            def fake_urlopen(url, timeout=30):
+            def fake_urlopen(request, timeout=30):
                 return _FakeResponse(archive_bytes)
 
             with (
                 patch.object(smu, "catalog_cache_path", os.path.join(tempdir, "cache")),
+                patch.object(smu, "http_cache_dir", os.path.join(tempdir, "http")),
                 patch("smu.urllib.request.urlopen", side_effect=fake_urlopen),
             ):
                 self.assertEqual(smu.catalog_install(pack_url, dry_run=True), 1)
+            self.assertEqual(os.listdir(os.path.join(tempdir, "cache", "extracted")), [])
 
+    def test_identical_pack_archives_are_extracted_once_and_shared(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            for name in ("team", "mirror"):
+                registry = os.path.join(tempdir, name)
+                os.makedirs(os.path.join(registry, "packs"))
+                with zipfile.ZipFile(os.path.join(registry, "packs", "work.smu-pack.zip"), "w") as archive:
+                    info = zipfile.ZipInfo("pack.toml", date_time=(2025, 1, 1, 0, 0, 0))
+                    archive.writestr(info, 'schema_version = 1\nid = "work"\nname = "Work"\n')
+                with open(os.path.join(registry, "index.toml"), "w") as f:
+                    f.write('schema_version = 1\n[packs.work]\nname = "Work"\nsource = "packs/work.smu-pack.zip"\n')
+
+            with (
+                patch.object(smu, "catalog_registries_path", os.path.join(tempdir, "registries.toml")),
+                patch.object(smu, "catalog_cache_path", os.path.join(tempdir, "cache")),
+                patch.object(smu.zipfile.ZipFile, "extractall", autospec=True, side_effect=zipfile.ZipFile.extractall) as extract,
+            ):
+                self.assertEqual(smu._catalog_registry_add("team", os.path.join(tempdir, "team")), 0)
+                self.assertEqual(smu.catalog_install("work", dry_run=True), 0)
+                self.assertEqual(smu.catalog_install("work", dry_run=True), 0)
+                first = smu._resolve_pack_source(os.path.join(tempdir, "team", "packs", "work.smu-pack.zip"))
+                second = smu._resolve_pack_source(os.path.join(tempdir, "mirror", "packs", "work.smu-pack.zip"))
+
+            self.assertEqual(extract.call_count, 1)
+            self.assertEqual(first, second)
+            self.assertEqual(os.listdir(os.path.join(tempdir, "cache", "extracted")), [os.path.basename(first)])
+
+    def test_remote_pack_is_extracted_under_the_digest_of_the_fetched_body(self):
+        pack_url = "https://example.com/work.smu-pack.zip"
+        with tempfile.TemporaryDirectory() as tempdir:
+            archives = []
+            for name in ("Work", "Replaced"):
+                buffer = io.BytesIO()
+                with zipfile.ZipFile(buffer, "w") as archive:
+                    archive.writestr("pack.toml", f'schema_version = 1\nid = "work"\nname = "{name}"\n')
+                archives.append(buffer.getvalue())
+            fetch_to = smu.http_fetch_to
+
+            def fetch_then_replace(url, target, **kwargs):
+                # Another process refreshes the cached body once the lock is released.
+                digest = fetch_to(url, target, **kwargs)
+                base = smu._http_cache_base(url)
+                with open(f"{base}.body.new", "wb") as f:
+                    f.write(archives[1])
+                os.replace(f"{base}.body.new", f"{base}.body")
+                meta = smu.http_cache_entry(url)
+                meta["sha256"] = hashlib.sha256(archives[1]).hexdigest()
+                smu._write_http_cache_meta(f"{base}.json", meta)
+                return digest
+
+            with (
+                patch.object(smu, "catalog_cache_path", os.path.join(tempdir, "cache")),
+                patch.object(smu, "http_cache_dir", os.path.join(tempdir, "http")),
+                patch("smu.urllib.request.urlopen", return_value=_FakeResponse(archives[0])),
+                patch.object(smu, "http_fetch_to", side_effect=fetch_then_replace),
+            ):
+                root = smu._resolve_pack_source(pack_url)
 
+            self.assertEqual(os.path.basename(root), hashlib.sha256(archives[0]).hexdigest())
+            with open(os.path.join(root, "pack.toml")) as f:
+                self.assertIn('name = "Work"', f.read())
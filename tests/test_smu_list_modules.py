@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
+import concurrent.futures
 import io
+import json
 import os
 import tempfile
+import time
 import unittest
 from contextlib import redirect_stdout
 from unittest.mock import patch
@@ -73,6 +76,113 @@ class TestDiscoverModules(unittest.TestCase):
                 self.assertEqual(smu.discover_modules(), {})
 
 
+def _age_tree(root, seconds=60):
+    """Backdate every mtime under `root` so the module index trusts it."""
+    stamp = time.time() - seconds
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            os.utime(os.path.join(dirpath, name), (stamp, stamp))
+    os.utime(root, (stamp, stamp))
+
+
+class TestModuleIndex(unittest.TestCase):
+    def _patches(self, tempdir, modules_dir):
+        return (
+            patch.object(smu, "module_path", modules_dir),
+            patch.object(smu, "module_index_path", os.path.join(tempdir, "cache", "module-index.json")),
+        )
+
+    def test_index_is_persisted_and_unchanged_directories_are_not_rescanned(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            modules_dir = os.path.join(tempdir, "modules")
+            _build_fixture(modules_dir)
+            _age_tree(modules_dir)
+            module_path_patch, index_path_patch = self._patches(tempdir, modules_dir)
+
+            with module_path_patch, index_path_patch:
+                first = smu.discover_modules()
+                smu._module_index_state.clear()
+                with patch.object(smu, "_scan_module_dir", wraps=smu._scan_module_dir) as scan:
+                    second = smu.discover_modules()
+
+            self.assertEqual(first, second)
+            self.assertTrue(os.path.exists(os.path.join(tempdir, "cache", "module-index.json")))
+            scan.assert_not_called()
+
+    def test_new_module_directory_invalidates_only_its_parent(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            modules_dir = os.path.join(tempdir, "modules")
+            _build_fixture(modules_dir)
+            _age_tree(modules_dir)
+            module_path_patch, index_path_patch = self._patches(tempdir, modules_dir)
+
+            with module_path_patch, index_path_patch:
+                smu.discover_modules()
+                _touch(os.path.join(modules_dir, "debian", "editors", "helix", "helix.sh"))
+                with patch.object(smu, "_scan_module_dir", wraps=smu._scan_module_dir) as scan:
+                    buckets = smu.discover_modules()
+
+            self.assertIn(("editors/helix", "script"), buckets["debian"])
+            scanned = {call.args[0] for call in scan.call_args_list}
+            self.assertEqual(scanned, {"debian", "debian/editors", "debian/editors/helix"})
+
+    def test_module_toml_edits_refresh_adapter_ids(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            modules_dir = os.path.join(tempdir, "modules")
+            _build_fixture(modules_dir)
+            _age_tree(modules_dir)
+            module_dir = os.path.join(modules_dir, "universal", "editor", "nvim")
+            module_path_patch, index_path_patch = self._patches(tempdir, modules_dir)
+
+            with module_path_patch, index_path_patch:
+                self.assertEqual(smu.module_adapter_ids(module_dir), ("home-manager", "rcm"))
+                _touch(os.path.join(module_dir, "module.toml"), '[adapters.nixos]\npath = "nixos.nix"\n')
+                self.assertEqual(smu.module_adapter_ids(module_dir), ("nixos",))
+
+    def test_get_module_path_resolves_through_index(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            modules_dir = os.path.join(tempdir, "modules")
+            _build_fixture(modules_dir)
+            module_path_patch, index_path_patch = self._patches(tempdir, modules_dir)
+
+            with module_path_patch, index_path_patch, \
+                    patch.object(smu, "macOS", False), \
+                    patch.object(smu, "debian", True), \
+                    patch.object(smu, "arch", False):
+                self.assertEqual(
+                    smu.get_module_path("browsers/chrome"),
+                    os.path.join(modules_dir, "debian", "browsers", "chrome", "packages"),
+                )
+                self.assertEqual(
+                    smu.get_module_path("python/pip"),
+                    os.path.join(modules_dir, "universal", "python", "pip", "pip.sh"),
+                )
+                self.assertIsNone(smu.get_module_path("productivity-tools/hyperkey"))
+
+    def test_concurrent_lookups_share_one_consistent_index(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            modules_dir = os.path.join(tempdir, "modules")
+            _build_fixture(modules_dir)
+            _age_tree(modules_dir)
+            module_path_patch, index_path_patch = self._patches(tempdir, modules_dir)
+
+            with module_path_patch, index_path_patch, \
+                    patch.object(smu, "macOS", False), \
+                    patch.object(smu, "debian", True), \
+                    patch.object(smu, "arch", False):
+                smu._module_index_state.clear()
+                with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+                    paths = list(pool.map(smu.get_module_path, ["browsers/chrome", "python/pip"] * 16))
+
+            self.assertEqual(set(paths), {
+                os.path.join(modules_dir, "debian", "browsers", "chrome", "packages"),
+                os.path.join(modules_dir, "universal", "python", "pip", "pip.sh"),
+            })
+            with open(os.path.join(tempdir, "cache", "module-index.json")) as f:
+                self.assertIn("debian/browsers/chrome", json.load(f)["dirs"])
+            self.assertEqual(os.listdir(os.path.join(tempdir, "cache")), ["module-index.json"])
+
+
 class TestListModulesOutput(unittest.TestCase):
     def _run(self, **kwargs):
         buf = io.StringIO()
@@ -1,11 +1,100 @@
 #!/usr/bin/env python3
 
+import ast
+import functools
+import os
+import subprocess
+import sys
 import unittest
 
 import smu
 import smu_parts
 
 
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def _dispatched_commands():
+    """Map each top-level command `cli.main` dispatches to the names its branches use."""
+    with open(os.path.join(REPO_ROOT, "smu_parts", "cli.py")) as f:
+        tree = ast.parse(f.read())
+    main = next(node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == "main")
+    handlers = {}
+    for node in ast.walk(main):
+        if not isinstance(node, ast.If):
+            continue
+        commands = []
+        for compare in ast.walk(node.test):
+            if (isinstance(compare, ast.Compare) and isinstance(compare.left, ast.Name)
+                    and compare.left.id == "command"):
+                commands.extend(const.value for const in ast.walk(compare.comparators[0])
+                                if isinstance(const, ast.Constant))
+        names = {name.id for stmt in node.body for name in ast.walk(stmt) if isinstance(name, ast.Name)}
+        for command in commands:
+            handlers.setdefault(command, set()).update(names)
+    return handlers
+
+
+def _global_names(definition):
+    """Names a definition reads that it does not bind itself (arguments, assignments, imports)."""
+    loaded, bound, declared = set(), set(), set()
+    for node in ast.walk(definition):
+        if isinstance(node, ast.Name):
+            (loaded if isinstance(node.ctx, ast.Load) else bound).add(node.id)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, ast.alias):
+            bound.add((node.asname or node.name).split(".")[0])
+        elif isinstance(node, ast.Global):
+            declared.update(node.names)
+    return loaded - (bound - declared)
+
+
+@functools.lru_cache(maxsize=None)
+def _part_definitions():
+    """Return ({name: defining part}, {part: module-level names}, {name: names its definition uses}).
+
+    Only plain names count; attribute access such as `payload.update(...)` does
+    not make a part depend on a global function of the same name.
+    """
+    owners = {}
+    module_names = {}
+    uses = {}
+    for module in smu_parts.PARTS:
+        part = module.__name__[len("smu_parts."):]
+        with open(module.__file__) as f:
+            tree = ast.parse(f.read())
+        referenced = set()
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+                owners[node.name] = part
+                uses[node.name] = _global_names(node)
+            elif isinstance(node, ast.Assign):
+                for target in node.targets:
+                    for name in ast.walk(target):
+                        if isinstance(name, ast.Name):
+                            owners[name.id] = part
+                referenced |= {name.id for name in ast.walk(node.value) if isinstance(name, ast.Name)}
+        module_names[part] = referenced
+    return owners, module_names, uses
+
+
+def _required_parts(entries):
+    owners, module_names, uses = _part_definitions()
+    required = set()
+    seen = set()
+    pending = list(entries)
+    while pending:
+        name = pending.pop()
+        if name in seen or name not in owners:
+            continue
+        seen.add(name)
+        if owners[name] not in required:
+            required.add(owners[name])
+            pending.extend(module_names[owners[name]])
+        pending.extend(uses.get(name, ()))
+    return required
+
+
 class TestSmuPartsPackage(unittest.TestCase):
     def test_package_declares_ordered_parts(self):
         self.assertEqual(smu_parts.PARTS[0].__name__, "smu_parts.core")
@@ -18,6 +107,40 @@ class TestSmuPartsPackage(unittest.TestCase):
         self.assertEqual(smu.__smu_parts__[0], "smu_parts.core")
         self.assertEqual(smu.__smu_parts__[-1], "smu_parts.cli")
 
+    def test_command_parts_cover_handler_call_graph(self):
+        dispatched = _dispatched_commands()
+        self.assertEqual(set(smu_parts.COMMAND_PARTS) - set(dispatched), set())
+        for command, handlers in dispatched.items():
+            if smu_parts.command_parts(command) is None:
+                continue
+            with self.subTest(command=command):
+                declared = set(smu_parts.command_parts(command)) | {"core"}
+                self.assertEqual(_required_parts(handlers) - declared, set())
+
+    def test_unknown_command_loads_every_part(self):
+        self.assertIsNone(smu_parts.command_parts("--provision"))
+
+    def test_theme_command_imports_only_required_parts(self):
+        script = (
+            "import sys, smu_parts\n"
+            "sys.argv = ['smu', 'theme', 'current']\n"
+            "smu_parts.run_cli()\n"
+            "print(' '.join(m.__name__ for m in smu_parts.loaded_parts()))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        loaded = result.stdout.splitlines()[-1].split()
+        self.assertIn("smu_parts.profile_commands", loaded)
+        self.assertNotIn("smu_parts.ops.productization_runtime", loaded)
+        self.assertNotIn("smu_parts.provisioning_tools", loaded)
+        self.assertLess(len(loaded), len(smu_parts.PART_NAMES))
+
 
 if __name__ == "__main__":
     unittest.main()
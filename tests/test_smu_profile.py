@@ -149,6 +149,59 @@ class TestProfile(unittest.TestCase):
                 self.assertEqual(presets["work"]["theme"], "gruvbox")
                 self.assertEqual(presets["work"]["prompt"], "classic")
 
+    def test_compiled_catalog_is_reused_until_a_manifest_changes(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            presets_dir = os.path.join(tempdir, "presets")
+            os.makedirs(presets_dir)
+            preset_path = os.path.join(presets_dir, "lean.toml")
+
+            def write_preset(theme, age_seconds):
+                with open(preset_path, "w") as f:
+                    f.write(f'id = "lean"\ntheme = "{theme}"\nprompt = "classic"\n')
+                mtime = os.stat(preset_path).st_mtime - age_seconds
+                os.utime(preset_path, (mtime, mtime))
+                os.utime(presets_dir, (mtime, mtime))
+
+            write_preset("nord", 60)
+            with (
+                patch.object(smu, "preset_profiles_path", presets_dir),
+                patch.object(smu, "preset_catalog_path", os.path.join(tempdir, "missing-presets")),
+                patch.object(smu, "compiled_catalog_path", os.path.join(tempdir, "cache", "compiled-catalogs.json")),
+                patch.object(smu, "_load_preset_registry", return_value=None),
+                patch.dict(smu._compiled_catalog_state, clear=True),
+            ):
+                self.assertEqual(smu.preset_by_id("lean")["theme"], "nord")
+                smu.preset_by_id("lean")["theme"] = "changed"
+                smu._compiled_catalog_state.clear()
+
+                with patch.object(smu, "_read_manifest_dir", side_effect=AssertionError("catalog parsed again")):
+                    self.assertEqual(smu.supported_presets(), ("lean",))
+                    self.assertEqual(smu.preset_by_id("lean")["theme"], "nord")
+
+                write_preset("gruvbox-dark", 30)
+                self.assertEqual(smu.preset_by_id("lean")["theme"], "gruvbox-dark")
+
+    def test_registry_modules_are_loaded_once_per_mtime(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            registry_path = os.path.join(tempdir, "scripts", "prompt_registry.py")
+            os.makedirs(os.path.dirname(registry_path))
+            with open(registry_path, "w") as f:
+                f.write("VERSION = 1\n")
+
+            with (
+                patch.object(smu, "installer_root", tempdir),
+                patch.dict(smu._registry_module_state, clear=True),
+                patch.dict(smu.registry_load_counts, clear=True),
+            ):
+                first = smu._load_prompt_registry()
+                self.assertIs(smu._load_prompt_registry(), first)
+                self.assertEqual(smu.registry_load_counts["smu_prompt_registry"], {"loads": 1, "hits": 1})
+
+                with open(registry_path, "w") as f:
+                    f.write("VERSION = 22\n")
+                self.assertEqual(smu._load_prompt_registry().VERSION, 22)
+                self.assertEqual(smu.registry_load_counts["smu_prompt_registry"]["loads"], 2)
+
     def test_set_preset_writes_theme_and_prompt(self):
         with tempfile.TemporaryDirectory() as tempdir:
             profile = os.path.join(tempdir, "profile.env")
@@ -242,6 +242,47 @@ class TestProfileAdapters(unittest.TestCase):
                 self.assertTrue(os.path.exists(os.path.join(state_dir, "manifest.json")))
                 self.assertTrue(os.path.exists(os.path.join(state_dir, "manifest.env")))
 
+    def test_materialize_adapters_hardlinks_previous_targets_for_rollback(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            prompts_dir = os.path.join(tempdir, "prompt-profiles")
+            target = os.path.join(tempdir, "target", "work.bash")
+            state_dir = os.path.join(tempdir, "state")
+            os.makedirs(os.path.join(prompts_dir, "files"))
+            os.makedirs(os.path.dirname(target))
+            with open(os.path.join(prompts_dir, "files", "work.bash"), "w") as f:
+                f.write("export PS1='work'\n")
+            with open(target, "w") as f:
+                f.write("export PS1='mine'\n")
+            original_inode = os.stat(target).st_ino
+            with open(os.path.join(prompts_dir, "work.toml"), "w") as f:
+                f.write('id = "work"\n')
+                f.write("[adapter_sources]\n")
+                f.write('bash = "files/work.bash"\n')
+                f.write("[adapter_targets]\n")
+                f.write(f'bash = "{target}"\n')
+
+            with (
+                patch.object(smu, "prompt_profiles_path", prompts_dir),
+                patch.object(smu, "prompt_catalog_path", os.path.join(tempdir, "missing-prompts")),
+                patch.object(smu, "theme_catalog_path", os.path.join(tempdir, "missing-themes")),
+                patch.object(smu, "adapter_state_path", state_dir),
+                patch.object(smu, "adapter_manifest_json_path", os.path.join(state_dir, "manifest.json")),
+                patch.object(smu, "adapter_manifest_env_path", os.path.join(state_dir, "manifest.env")),
+                patch.object(smu, "state_dir", os.path.join(tempdir, "ledger")),
+                patch.object(smu, "state_ledger_path", os.path.join(tempdir, "ledger", "ledger.json")),
+                patch.object(smu, "theme_manifest_by_id", return_value={}),
+                patch.object(smu, "_load_theme_registry", return_value=None),
+            ):
+                smu.materialize_adapters("missing-theme", "work", force=True)
+                before = smu.last_state_event()["items"][0]["before"]
+                backup = os.path.join(smu.snapshot_backups_dir(), before["backup"])
+                self.assertNotIn("blob", before)
+                self.assertEqual(os.stat(backup).st_ino, original_inode)
+
+                self.assertTrue(smu.rollback_last_state_event())
+                with open(target) as f:
+                    self.assertEqual(f.read(), "export PS1='mine'\n")
+
     def test_materialize_adapters_dry_run_does_not_write_targets(self):
         with tempfile.TemporaryDirectory() as tempdir:
             prompts_dir = os.path.join(tempdir, "prompt-profiles")
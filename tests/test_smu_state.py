@@ -9,9 +9,13 @@ import io
 from unittest.mock import patch
 
 import smu
+from tests.conftest import start_patches, temporary_dir
 
 
 class TestSmuState(unittest.TestCase):
+    def setUp(self):
+        start_patches(self, patch.object(smu, "snapshot_blobs_dir", return_value=temporary_dir(self)))
+
     def test_state_ledger_round_trips_events(self):
         with tempfile.TemporaryDirectory() as tempdir:
             ledger = os.path.join(tempdir, "state", "ledger.json")
@@ -37,6 +41,20 @@ class TestSmuState(unittest.TestCase):
             with open(target) as f:
                 self.assertEqual(f.read(), "before")
 
+    def test_file_snapshot_restores_file_mode(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            for mode in (0o644, 0o755):
+                target = os.path.join(tempdir, f"target-{mode:o}")
+                with open(target, "w") as f:
+                    f.write("before")
+                os.chmod(target, mode)
+                snapshot = smu.file_snapshot(target)
+                os.unlink(target)
+
+                smu.restore_file_snapshot(snapshot)
+
+                self.assertEqual(os.stat(target).st_mode & 0o777, mode)
+
     def test_rollback_materialized_adapters_restores_prior_file(self):
         with tempfile.TemporaryDirectory() as tempdir:
             ledger = os.path.join(tempdir, "state", "ledger.json")
@@ -167,7 +185,7 @@ class TestSmuState(unittest.TestCase):
 
             smu.main()
 
-        print_json.assert_called_once_with(search="font", show_all=False, verbose=False)
+        print_json.assert_called_once_with(search="font", show_all=False, verbose=False, jobs=smu.default_jobs())
 
     def test_diff_subcommand_prints_module_and_adapter_plan(self):
         with patch.object(smu, "module_change_plan", return_value=[{"module": "base", "state": "missing", "change": "install"}]), \
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
+import json
 import os
 import tempfile
+import threading
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import smu
 
@@ -51,7 +53,69 @@ class TestPackagesEntryParsing(unittest.TestCase):
         self.assertEqual(list(smu._packages_entries("/nonexistent")), [])
 
 
+def _dpkg_status(*packages, status="install ok installed"):
+    return "".join(
+        f"Package: {package}\nStatus: {status}\nArchitecture: amd64\nVersion: 1.0\n\n"
+        for package in packages
+    )
+
+
+class TestPackageSnapshot(unittest.TestCase):
+    def setUp(self):
+        smu.reset_package_snapshot()
+        self.addCleanup(smu.reset_package_snapshot)
+
+    def test_dpkg_status_parsed_once_per_invocation(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            dpkg_status = os.path.join(tempdir, "status")
+            _touch(dpkg_status, _dpkg_status("curl") + _dpkg_status("vim", status="deinstall ok config-files"))
+
+            with patch.object(smu, "dpkg_status_path", dpkg_status), \
+                    patch("smu._parse_dpkg_status", wraps=smu._parse_dpkg_status) as parse:
+                self.assertTrue(smu._packages_entry_installed("apt", ("curl",)))
+                self.assertTrue(smu._packages_entry_installed("apt", ("curl:amd64",)))
+                self.assertFalse(smu._packages_entry_installed("apt", ("vim",)))
+
+            self.assertEqual(parse.call_count, 1)
+
+    def test_dpkg_counts_unfinished_installs_like_dpkg_s(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            dpkg_status = os.path.join(tempdir, "status")
+            _touch(dpkg_status, _dpkg_status("tzdata", status="install ok half-configured")
+                   + _dpkg_status("libc-bin", status="install ok triggers-pending")
+                   + _dpkg_status("gone", status="purge ok not-installed"))
+
+            with patch.object(smu, "dpkg_status_path", dpkg_status):
+                self.assertTrue(smu._packages_entry_installed("apt", ("tzdata",)))
+                self.assertTrue(smu._packages_entry_installed("apt", ("libc-bin",)))
+                self.assertFalse(smu._packages_entry_installed("apt", ("gone",)))
+
+    def test_snap_list_runs_once(self):
+        listing = "Name  Version  Rev  Tracking  Publisher  Notes\ncode  1.90  160  latest  vscode  classic\n"
+        with patch("smu.subprocess.run") as mock_run:
+            mock_run.return_value.returncode = 0
+            mock_run.return_value.stdout = listing
+            self.assertTrue(smu._packages_entry_installed("snap", ("code",)))
+            self.assertFalse(smu._packages_entry_installed("snap", ("Name",)))
+
+        mock_run.assert_called_once()
+
+    def test_ppa_and_source_entries_use_sources_listing(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            _touch(os.path.join(tempdir, "git-core-ppa-jammy.list"))
+            _touch(os.path.join(tempdir, "google-chrome.list"))
+
+            with patch.object(smu, "apt_sources_list_dir", tempdir):
+                self.assertTrue(smu._packages_entry_installed("ppa", ("Git-Core/ppa",)))
+                self.assertTrue(smu._packages_entry_installed("source", ("google-chrome.list",)))
+                self.assertFalse(smu._packages_entry_installed("source", ("docker.list",)))
+
+
 class TestModuleStatus(unittest.TestCase):
+    def setUp(self):
+        smu.reset_package_snapshot()
+        self.addCleanup(smu.reset_package_snapshot)
+
     def _modules_root(self, tempdir):
         return os.path.join(tempdir, "modules")
 
@@ -61,7 +125,8 @@ class TestModuleStatus(unittest.TestCase):
             os.makedirs(module_dir)
             _touch(os.path.join(module_dir, "brewfile"), 'cask "chatgpt"\n')
 
-            with patch.object(smu, "module_path", self._modules_root(tempdir)), \
+            with patch.dict(os.environ, {"SMU_BREW_BUNDLE_CHECK": "1"}), \
+                    patch.object(smu, "module_path", self._modules_root(tempdir)), \
                     patch.object(smu, "macOS", True), \
                     patch.object(smu, "debian", False), \
                     patch.object(smu, "arch", False), \
@@ -77,7 +142,7 @@ class TestModuleStatus(unittest.TestCase):
         with tempfile.TemporaryDirectory() as tempdir:
             module_dir = os.path.join(self._modules_root(tempdir), "macos", "ai", "chatgpt")
             os.makedirs(module_dir)
-            _touch(os.path.join(module_dir, "brewfile"))
+            _touch(os.path.join(module_dir, "brewfile"), 'if OS.mac?\n  cask "chatgpt"\nend\n')
 
             with patch.object(smu, "module_path", self._modules_root(tempdir)), \
                     patch.object(smu, "macOS", True), \
@@ -88,6 +153,76 @@ class TestModuleStatus(unittest.TestCase):
                 state, _ = smu.module_status("ai/chatgpt")
 
             self.assertEqual(state, "missing")
+            self.assertIn("brew bundle check --file brewfile", mock_run.call_args[0][0])
+
+    def _brew_listings(self):
+        return {
+            ("brew", "info"): json.dumps({
+                "formulae": [
+                    {"name": "git", "full_name": "git", "aliases": [], "oldnames": []},
+                    {"name": "jq", "full_name": "homebrew/core/jq", "aliases": [], "oldnames": []},
+                    {"name": "python@3.12", "full_name": "python@3.12", "aliases": ["python3", "python"],
+                     "oldnames": []},
+                ],
+                "casks": [{"token": "chatgpt", "full_token": "chatgpt", "old_tokens": []}],
+            }),
+            ("brew", "tap"): "homebrew/bundle\n",
+            ("mas", "list"): "497799835  Xcode  (15.0)\n",
+        }
+
+    def _fake_brew(self, bundle_returncode):
+        listings = self._brew_listings()
+
+        def fake_run(args, **_):
+            if isinstance(args, str):
+                return Mock(returncode=bundle_returncode, stdout="")
+            result = Mock(returncode=0)
+            result.stdout = listings.get(tuple(args[:2]), "")
+            return result
+
+        return fake_run
+
+    def test_brewfile_entries_answered_from_brew_snapshot(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            module_dir = os.path.join(self._modules_root(tempdir), "macos", "tools")
+            os.makedirs(module_dir)
+            _touch(os.path.join(module_dir, "brewfile"), "\n".join([
+                '# developer tools',
+                'tap "Homebrew/bundle"',
+                'brew "git"',
+                'brew "homebrew/core/jq", args: ["HEAD"]',
+                'brew "python"',
+                'cask "chatgpt"',
+                'mas "Xcode", id: 497799835',
+            ]) + "\n")
+
+            with patch.object(smu, "module_path", self._modules_root(tempdir)), \
+                    patch.object(smu, "macOS", True), \
+                    patch.object(smu, "debian", False), \
+                    patch.object(smu, "arch", False), \
+                    patch("smu.subprocess.run", side_effect=self._fake_brew(1)) as mock_run:
+                state, detail = smu.module_status("tools")
+                smu.module_status("tools")
+
+            self.assertEqual((state, detail), ("installed", "6/6 entries present"))
+            self.assertEqual(mock_run.call_count, 3)
+
+    def test_brewfile_miss_is_confirmed_with_brew_bundle_check(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            module_dir = os.path.join(self._modules_root(tempdir), "macos", "tools")
+            os.makedirs(module_dir)
+            _touch(os.path.join(module_dir, "brewfile"), 'brew "git"\ncask "slack"\n')
+
+            for bundle_returncode, expected in ((1, ("partial", "1/2 entries present")), (0, ("installed", None))):
+                smu.reset_package_snapshot()
+                with self.subTest(bundle_returncode=bundle_returncode), \
+                        patch.object(smu, "module_path", self._modules_root(tempdir)), \
+                        patch.object(smu, "macOS", True), \
+                        patch.object(smu, "debian", False), \
+                        patch.object(smu, "arch", False), \
+                        patch("smu.subprocess.run", side_effect=self._fake_brew(bundle_returncode)) as mock_run:
+                    self.assertEqual(smu.module_status("tools"), expected)
+                    self.assertIn("brew bundle check --file brewfile", mock_run.call_args[0][0])
 
     def test_packages_partial_when_some_entries_missing(self):
         with tempfile.TemporaryDirectory() as tempdir:
@@ -96,35 +231,36 @@ class TestModuleStatus(unittest.TestCase):
             _touch(os.path.join(module_dir, "packages"),
                    'apt "curl"\napt "wget"\napt "missing-pkg"\n')
 
-            call_results = {"curl": 0, "wget": 0, "missing-pkg": 1}
-
-            def fake_call(cmd, **_):
-                for pkg, rc in call_results.items():
-                    if pkg in cmd:
-                        return rc
-                return 1
+            dpkg_status = os.path.join(tempdir, "status")
+            _touch(dpkg_status, _dpkg_status("curl", "wget") + _dpkg_status(
+                "missing-pkg", status="deinstall ok config-files"
+            ))
 
             with patch.object(smu, "module_path", self._modules_root(tempdir)), \
                     patch.object(smu, "macOS", False), \
                     patch.object(smu, "debian", True), \
                     patch.object(smu, "arch", False), \
-                    patch("smu.subprocess.call", side_effect=fake_call):
+                    patch.object(smu, "dpkg_status_path", dpkg_status), \
+                    patch("smu.subprocess.call") as mock_call:
                 state, detail = smu.module_status("browsers/chrome")
 
             self.assertEqual(state, "partial")
             self.assertEqual(detail, "2/3 entries present")
+            mock_call.assert_not_called()
 
     def test_packages_installed_when_all_entries_present(self):
         with tempfile.TemporaryDirectory() as tempdir:
             module_dir = os.path.join(self._modules_root(tempdir), "debian", "browsers", "chrome")
             os.makedirs(module_dir)
             _touch(os.path.join(module_dir, "packages"), 'apt "curl"\n')
+            dpkg_status = os.path.join(tempdir, "status")
+            _touch(dpkg_status, _dpkg_status("curl"))
 
             with patch.object(smu, "module_path", self._modules_root(tempdir)), \
                     patch.object(smu, "macOS", False), \
                     patch.object(smu, "debian", True), \
                     patch.object(smu, "arch", False), \
-                    patch("smu.subprocess.call", return_value=0):
+                    patch.object(smu, "dpkg_status_path", dpkg_status):
                 state, _ = smu.module_status("browsers/chrome")
 
             self.assertEqual(state, "installed")
@@ -155,13 +291,40 @@ class TestModuleStatus(unittest.TestCase):
                     patch.object(smu, "macOS", True), \
                     patch.object(smu, "debian", False), \
                     patch.object(smu, "arch", False), \
-                    patch("smu.subprocess.run") as mock_run:
-                mock_run.return_value.returncode = 0
+                    patch("smu.run_bash_step", return_value=(0, "")) as mock_step:
                 state, _ = smu.module_status("development-tools/xcode")
 
             self.assertEqual(state, "installed")
-            self.assertIn("source", mock_run.call_args[0][0])
-            self.assertIn("xcode.installed", mock_run.call_args[0][0])
+            self.assertIn("source", mock_step.call_args[0][0])
+            self.assertIn("xcode.installed", mock_step.call_args[0][0])
+
+
+
+class TestModuleStatusReport(unittest.TestCase):
+    def test_parallel_probes_keep_discovery_order(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def fake_status(script_path):
+            barrier.wait()
+            return ("installed", None)
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            modules_root = os.path.join(tempdir, "modules")
+            for name in ("zsh", "git"):
+                _touch(os.path.join(modules_root, "universal", name, f"{name}.sh"))
+
+            with patch.object(smu, "module_path", modules_root), \
+                    patch.object(smu, "module_index_path", os.path.join(tempdir, "module-index.json")), \
+                    patch.object(smu, "module_path_status", side_effect=fake_status):
+                rows = smu.module_status_report(show_all=True, jobs=2)
+
+        self.assertEqual([row["name"] for row in rows], ["git", "zsh"])
+        self.assertEqual({row["state"] for row in rows}, {"installed"})
+
+    def test_parse_jobs_rejects_non_positive_values(self):
+        self.assertEqual(smu.parse_jobs("3"), 3)
+        with self.assertRaises(SystemExit):
+            smu.parse_jobs("0")
 
 
 if __name__ == "__main__":
@@ -46,12 +46,12 @@ class TestUninstallModule(unittest.TestCase):
         with patch("smu.get_module_path", return_value="/tmp/m/packages"), \
                 patch.object(smu, "debian", True), \
                 patch("smu.subprocess.call", return_value=0), \
-                patch("smu.subprocess.run") as mock_run, \
+                patch("smu.run_bash_step", return_value=(0, "")) as mock_step, \
                 patch("smu.os.chdir"):
             ok = smu.uninstall_module("browsers/chrome", dry_run=False)
 
         self.assertTrue(ok)
-        cmd = mock_run.call_args[0][0]
+        cmd = mock_step.call_args[0][0]
         self.assertIn("apt_remove_from_file packages", cmd)
 
     def test_packages_skips_on_non_debian(self):
@@ -75,12 +75,12 @@ class TestUninstallModule(unittest.TestCase):
 
             with patch("smu.get_module_path", return_value=os.path.join(module_dir, "cursor.sh")), \
                     patch("smu.subprocess.call", return_value=0), \
-                    patch("smu.subprocess.run") as mock_run, \
+                    patch("smu.run_bash_step", return_value=(0, "")) as mock_step, \
                     patch("smu.os.chdir"):
                 ok = smu.uninstall_module("development-tools/cursor", dry_run=False)
 
             self.assertTrue(ok)
-            cmd = mock_run.call_args[0][0]
+            cmd = mock_step.call_args[0][0]
             self.assertIn("cursor.uninstall.sh", cmd)
 
     def test_script_without_sibling_skipped(self):
@@ -116,13 +116,13 @@ class TestUninstallModule(unittest.TestCase):
                     patch.object(smu, "debian", True), \
                     patch.object(smu, "macOS", False), \
                     patch("smu.subprocess.call", return_value=0), \
-                    patch("smu.subprocess.run") as mock_run, \
+                    patch("smu.run_bash_step", return_value=(0, "")) as mock_step, \
                     patch("smu.os.chdir"):
                 ok = smu.uninstall_module("development-tools/cursor", dry_run=False)
 
             self.assertTrue(ok)
-            self.assertEqual(mock_run.call_count, 2)
-            commands = [call.args[0] for call in mock_run.call_args_list]
+            self.assertEqual(mock_step.call_count, 2)
+            commands = [call.args[0] for call in mock_step.call_args_list]
             # Order: per-module uninstaller first, declarative inverse second.
             self.assertIn("cursor.uninstall.sh", commands[0])
             self.assertIn("apt_remove_from_file packages", commands[1])
@@ -137,17 +137,18 @@ class TestUninstallModule(unittest.TestCase):
             _touch(os.path.join(module_dir, "xcode.uninstall.sh"))
             _touch(os.path.join(module_dir, "brewfile"), 'cask "xcode"\n')
 
+            commands = []
             with patch("smu.get_module_path", return_value=os.path.join(module_dir, "xcode.sh")), \
                     patch.object(smu, "macOS", True), \
                     patch.object(smu, "debian", False), \
                     patch("smu.subprocess.call", return_value=0), \
-                    patch("smu.subprocess.run") as mock_run, \
+                    patch("smu.run_bash_step", side_effect=lambda cmd: commands.append(cmd) or (0, "")), \
+                    patch("smu.subprocess.run", side_effect=lambda cmd, **_: commands.append(cmd)), \
                     patch("smu.os.chdir"):
                 ok = smu.uninstall_module("development-tools/xcode", dry_run=False)
 
             self.assertTrue(ok)
-            self.assertEqual(mock_run.call_count, 2)
-            commands = [call.args[0] for call in mock_run.call_args_list]
+            self.assertEqual(len(commands), 2)
             self.assertIn("xcode.uninstall.sh", commands[0])
             self.assertIn("brew bundle cleanup --file brewfile --force", commands[1])
 
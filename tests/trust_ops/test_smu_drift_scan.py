@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+from unittest.mock import patch
+
+import smu
+from tests.conftest import start_patches, temporary_dir
+
+
+class TestDriftScan(unittest.TestCase):
+    def setUp(self):
+        tempdir = temporary_dir(self)
+        self.home = os.path.join(tempdir, "home")
+        self.dotfiles = os.path.join(self.home, ".set-me-up", "dotfiles")
+        os.makedirs(os.path.join(self.home, ".config", "nvim"))
+        os.makedirs(os.path.join(self.home, ".cache"))
+        os.makedirs(self.dotfiles)
+        for name in ("bashrc", "oldrc", "vimrc", "init.lua"):
+            self._write(os.path.join(self.dotfiles, name))
+        self._link("bashrc", ".bashrc")
+        self._link("oldrc", ".oldrc")
+        self._link("gone", ".gone")
+        self._link("init.lua", ".config/nvim/init.lua")
+        self._link("oldrc", ".cache/oldrc")
+        self._write(os.path.join(self.home, ".vimrc"))
+        self._write(os.path.join(self.home, ".config", "nvim", "extra.lua"))
+        self.managed = {
+            os.path.join(self.home, path): os.path.join(self.dotfiles, source)
+            for path, source in ((".bashrc", "bashrc"), (".vimrc", "vimrc"), (".config/nvim/init.lua", "init.lua"))
+        }
+        start_patches(
+            self,
+            patch.object(smu, "smu_home_dir", os.path.join(self.home, ".set-me-up")),
+            patch.object(smu, "drift_scan_cache_path", os.path.join(tempdir, "drift-scan.json")),
+            patch.object(smu, "file_hash_cache_path", os.path.join(tempdir, "file-hashes.json")),
+            patch.object(smu, "rcm_managed_paths", return_value=self.managed),
+            patch.object(smu, "_read_adapter_manifest", return_value=[
+                {"mode": "copy", "source": os.path.join(self.dotfiles, "bashrc"), "target": os.path.join(self.home, ".missing")},
+            ]),
+        )
+
+    def _write(self, path):
+        with open(path, "w") as f:
+            f.write(os.path.basename(path))
+
+    def _link(self, source, path):
+        os.symlink(os.path.join(self.dotfiles, source), os.path.join(self.home, path))
+
+    def test_reports_stale_links_and_unmanaged_files(self):
+        report = smu.drift_file_report(self.home)
+
+        stale = {(os.path.relpath(item["path"], self.home), item["reason"]) for item in report["stale_config"]}
+        self.assertEqual(stale, {
+            (".oldrc", "not-in-lsrc"),
+            (".gone", "broken-link"),
+            (".missing", "adapter-target-missing"),
+        })
+        unmanaged = {(os.path.relpath(item["path"], self.home), item["reason"]) for item in report["unmanaged_files"]}
+        self.assertEqual(unmanaged, {
+            (".vimrc", "shadows-managed-dotfile"),
+            (".config/nvim/extra.lua", "unmanaged-in-managed-dir"),
+        })
+
+    def test_only_home_and_managed_directories_are_listed(self):
+        os.makedirs(os.path.join(self.home, "projects", "app"))
+        self._link("oldrc", "projects/app/.oldrc")
+
+        with patch.object(smu, "_list_drift_dir", wraps=smu._list_drift_dir) as listed:
+            report = smu.drift_file_report(self.home)
+
+        listed_dirs = sorted(os.path.relpath(call.args[0], self.home) for call in listed.call_args_list)
+        self.assertEqual(listed_dirs, [".", ".config/nvim"])
+        self.assertNotIn(os.path.join(self.home, "projects", "app", ".oldrc"), [item["path"] for item in report["stale_config"]])
+
+    def test_unchanged_directories_are_reused_from_the_previous_scan(self):
+        for root, dirs, _ in os.walk(self.home):
+            for path in [root] + [os.path.join(root, name) for name in dirs]:
+                os.utime(path, (1_000_000_000, 1_000_000_000), follow_symlinks=False)
+
+        first = smu.scan_home_tree(self.home)
+        with patch.object(smu.os, "scandir", side_effect=AssertionError("directory listed again")):
+            second = smu.scan_home_tree(self.home)
+
+        self.assertEqual(first["reused_dirs"], 0)
+        self.assertEqual(second["reused_dirs"], second["dirs"])
+        self.assertEqual(second["files"], first["files"])
+        self.assertNotIn(".cache/oldrc", [path for path, _, _ in first["files"]])
+
+    def test_package_report_compares_ledger_modules_with_installed_packages(self):
+        events = [
+            {"operation": "provision_modules", "items": [{"module": "tools"}, {"module": "old"}]},
+            {"operation": "uninstall_modules", "items": [{"module": "old"}]},
+        ]
+        entries = {
+            "tools": [("apt", ("git",)), ("apt", ("jq",))],
+            "old": [("apt", ("git",)), ("apt", ("htop",))],
+        }
+        installed = {"git", "htop"}
+        with patch.object(smu, "_module_package_entries", side_effect=entries.get), \
+                patch.object(smu, "package_snapshot_entry_installed", side_effect=lambda kind, groups: groups[0] in installed):
+            report = smu.drift_package_report(events)
+
+        self.assertEqual(report["missing"], [{"module": "tools", "kind": "apt", "name": "jq"}])
+        self.assertEqual(report["unexpected"], [{"module": "old", "kind": "apt", "name": "htop"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import smu
+from tests.conftest import start_patches, temporary_dir
+
+
+class TestFileHashCache(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = temporary_dir(self)
+        self.cache_path = os.path.join(self.tempdir, "cache", "file-hashes.json")
+        start_patches(
+            self,
+            patch.object(smu, "file_hash_cache_path", self.cache_path),
+            patch.dict(smu._file_hash_cache_state, clear=True),
+        )
+
+    def _write(self, content, age_seconds=60):
+        path = os.path.join(self.tempdir, "prompt.bash")
+        with open(path, "w") as f:
+            f.write(content)
+        mtime = os.stat(path).st_mtime - age_seconds
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_digest_is_reused_until_the_stat_fingerprint_changes(self):
+        path = self._write("before")
+        expected = smu.file_sha256(path)
+
+        with patch.object(smu, "file_sha256", wraps=smu.file_sha256) as hashed:
+            self.assertEqual(smu.cached_file_sha256(path), expected)
+            self.assertEqual(smu.cached_file_sha256(path), expected)
+            self.assertEqual(hashed.call_count, 1)
+
+            smu.save_file_hash_cache()
+            smu._file_hash_cache_state.clear()
+            self.assertEqual(smu.cached_file_sha256(path), expected)
+            self.assertEqual(hashed.call_count, 1)
+
+            self._write("after!")
+            self.assertEqual(smu.cached_file_sha256(path), smu.file_sha256(path))
+            self.assertNotEqual(smu.cached_file_sha256(path), expected)
+
+        with open(self.cache_path) as f:
+            self.assertIn(os.path.abspath(path), json.load(f)["files"])
+
+    def test_recently_written_files_are_not_cached(self):
+        path = self._write("fresh", age_seconds=0)
+
+        with patch.object(smu, "file_sha256", wraps=smu.file_sha256) as hashed:
+            smu.cached_file_sha256(path)
+            smu.cached_file_sha256(path)
+
+        self.assertEqual(hashed.call_count, 2)
+        self.assertIsNone(smu.cached_file_sha256(os.path.join(self.tempdir, "missing")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+import http.server
+import os
+import threading
+import unittest
+import urllib.error
+from unittest.mock import patch
+
+import smu
+from tests.conftest import start_patches, temporary_dir
+
+
+class _RegistryHandler(http.server.BaseHTTPRequestHandler):
+    body = b'{"entries": [{"id": "work", "url": "https://example.com/work.git"}]}'
+    etag = '"v1"'
+    requests = []
+    # Bytes sent before the connection drops, for one response only.
+    cut_after = None
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        if self.headers.get("Range") and self.headers.get("If-Range") == self.etag:
+            start = int(self.headers["Range"].removeprefix("bytes=").rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(self.body) - 1}/{len(self.body)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Last-Modified", "Wed, 01 Jan 2025 00:00:00 GMT")
+        self.send_header("Content-Length", str(len(self.body) - start))
+        self.end_headers()
+        if self.cut_after is not None:
+            self.wfile.write(self.body[start:start + self.cut_after])
+            type(self).cut_after = None
+            self.close_connection = True
+            return
+        self.wfile.write(self.body[start:])
+
+    def log_message(self, *_args):
+        pass
+
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        _RegistryHandler.requests = []
+        _RegistryHandler.cut_after = None
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _RegistryHandler)
+        thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = f"http://127.0.0.1:{server.server_address[1]}/registry.json"
+        start_patches(
+            self,
+            patch.object(smu, "http_cache_dir", os.path.join(temporary_dir(self), "http")),
+            patch.dict(os.environ, {"SMU_OFFLINE": ""}),
+        )
+
+    def test_revalidates_with_etag_and_serves_304_from_disk(self):
+        first = smu.http_fetch_bytes(self.url)
+        second = smu.http_fetch_bytes(self.url)
+
+        self.assertEqual(first, _RegistryHandler.body)
+        self.assertEqual(second, _RegistryHandler.body)
+        self.assertNotIn("If-None-Match", _RegistryHandler.requests[0])
+        self.assertEqual(_RegistryHandler.requests[1]["If-None-Match"], '"v1"')
+        self.assertEqual(_RegistryHandler.requests[1]["If-Modified-Since"], "Wed, 01 Jan 2025 00:00:00 GMT")
+        self.assertEqual(smu.http_cache_entry(self.url)["etag"], '"v1"')
+
+    def test_offline_mode_uses_only_cached_content(self):
+        with patch.dict(os.environ, {"SMU_OFFLINE": "1"}):
+            with self.assertRaises(urllib.error.URLError):
+                smu.http_fetch(self.url)
+        self.assertEqual(_RegistryHandler.requests, [])
+
+        smu.http_fetch(self.url)
+        with patch.dict(os.environ, {"SMU_OFFLINE": "1"}):
+            payload = smu.blueprint_registry_payload(registry_url=self.url)
+
+        self.assertIn("work", [entry["id"] for entry in payload["entries"]])
+        self.assertEqual(len(_RegistryHandler.requests), 1)
+
+    def test_update_manifest_is_fetched_through_the_cache(self):
+        with patch.object(_RegistryHandler, "body", b'{"version": "1.2.3"}'):
+            smu.fetch_update_manifest({"manifest_url": self.url})
+            with patch.dict(os.environ, {"SMU_OFFLINE": "1"}):
+                result = smu.fetch_update_manifest({"manifest_url": self.url})
+
+        self.assertEqual(result["manifest"], {"version": "1.2.3"})
+        self.assertEqual(len(_RegistryHandler.requests), 1)
+
+
+    def test_interrupted_download_resumes_with_range_and_verifies_sha256(self):
+        body = os.urandom(4096)
+        with patch.object(_RegistryHandler, "body", body):
+            _RegistryHandler.cut_after = 1000
+            with self.assertRaises(urllib.error.URLError):
+                smu.http_fetch(self.url, sha256=smu.hashlib.sha256(body).hexdigest())
+            path = smu.http_fetch(self.url, sha256=smu.hashlib.sha256(body).hexdigest())
+
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), body)
+        self.assertEqual(_RegistryHandler.requests[1]["Range"], "bytes=1000-")
+        self.assertEqual(_RegistryHandler.requests[1]["If-Range"], '"v1"')
+
+    def test_oversized_mismatched_or_invalid_bodies_are_not_cached(self):
+        with self.assertRaisesRegex(ValueError, "more than the pinned 10"):
+            smu.http_fetch(self.url, max_bytes=10)
+        with self.assertRaisesRegex(ValueError, "sha256 mismatch"):
+            smu.http_fetch(self.url, sha256="0" * 64)
+        with self.assertRaisesRegex(ValueError, "not a valid zip archive"):
+            smu.http_fetch(self.url, validate=smu._validate_zip_pack)
+
+        self.assertIsNone(smu.http_cache_entry(self.url))
+        self.assertEqual(sorted(os.listdir(smu.http_cache_dir)), [f"{os.path.basename(smu._http_cache_base(self.url))}.lock"])
+
+if __name__ == "__main__":
+    unittest.main()
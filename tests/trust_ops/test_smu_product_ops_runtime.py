@@ -56,12 +56,44 @@ class TestSmuProductOpsRuntime(unittest.TestCase):
     def test_state_timeline_combines_ledger_and_drift(self):
         with patch.object(smu, "read_state_ledger", return_value=[{"operation": "materialize_adapters", "timestamp": "2026-01-01T00:00:00Z"}]), \
                 patch.object(smu, "_read_json_file", return_value=[]), \
-                patch.object(smu, "drift_payload", return_value={"ok": True}):
+                patch.object(smu, "drift_payload", return_value={"ok": True}) as drift:
             payload = smu.state_timeline_payload()
+            self.assertEqual([event["source"] for event in payload["events"]], ["ledger"])
+            drift.assert_not_called()
+            payload = smu.state_timeline_payload(include_drift=True)
 
         self.assertEqual(payload["events"][0]["source"], "ledger")
         self.assertTrue([event for event in payload["events"] if event["source"] == "drift"])
 
+    def test_state_timeline_filters_and_pages_back_through_both_sources(self):
+        for backend in ("json", "sqlite"):
+            with self.subTest(backend=backend), tempfile.TemporaryDirectory() as tempdir:
+                state_dir = os.path.join(tempdir, "state")
+                with patch.object(smu, "state_dir", state_dir), \
+                        patch.object(smu, "state_ledger_path", os.path.join(state_dir, "ledger.json")), \
+                        patch.object(smu, "update_history_path", os.path.join(tempdir, "update-history.json")), \
+                        patch.object(smu, "update_lock_path", os.path.join(tempdir, "update.lock")), \
+                        patch.dict(os.environ, {"SMU_STATE_BACKEND": backend}):
+                    smu.write_state_ledger([
+                        {"id": f"2026-01-0{day}T00:00:00+00:00", "operation": operation, "items": []}
+                        for day, operation in ((1, "provision_modules"), (3, "client_update"), (5, "client_update"))
+                    ])
+                    with patch.object(smu, "read_update_policy", return_value=smu.default_update_policy()):
+                        for day in (2, 4):
+                            smu.append_update_history({"updated_at": f"2026-01-0{day}T00:00:00+00:00"})
+
+                    first = smu.state_timeline_payload(limit=2)
+                    second = smu.state_timeline_payload(limit=2, cursor=first["next_cursor"])
+                    third = smu.state_timeline_payload(limit=2, cursor=second["next_cursor"])
+                    days = [[event["timestamp"][8:10] for event in page["events"]] for page in (first, second, third)]
+                    self.assertEqual(days, [["04", "05"], ["02", "03"], ["01"]])
+                    self.assertIsNone(third["next_cursor"])
+
+                    payload = smu.state_timeline_payload(since="2026-01-02", operation="client_update")
+                    self.assertEqual([event["timestamp"][8:10] for event in payload["events"]], ["03", "05"])
+                    payload = smu.state_timeline_payload(until="2026-01-02T00:00:00Z", operation="update")
+                    self.assertEqual([event["source"] for event in payload["events"]], ["update"])
+
     def test_lock_payload_records_blueprint_and_registry(self):
         with patch.object(smu, "_git_head", return_value="abc123"), \
                 patch.object(smu, "config_drift_report", return_value={"items": []}):
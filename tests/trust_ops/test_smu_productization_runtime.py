@@ -161,6 +161,19 @@ class TestSmuProductizationRuntime(unittest.TestCase):
         self.assertEqual(custom["blockers"][0]["type"], "missing_dependency")
         self.assertTrue([item for item in custom["blockers"] if item["type"] == "conflict"])
 
+    def test_contract_examples_do_not_scan_the_host(self):
+        with patch.object(smu, "drift_file_report", side_effect=AssertionError("home scanned")), \
+                patch.object(smu, "drift_package_report", side_effect=AssertionError("packages queried")), \
+                patch.object(smu, "adapter_conflict_report", return_value={"conflicted": False, "items": []}), \
+                patch.object(smu, "config_drift_report", return_value={"drifted": False, "items": []}):
+            payload = smu.drift_example_payload("/path/to/blueprint")
+            timeline = smu.state_timeline_payload(include_drift=True, drift=smu.drift_example_payload)
+
+        self.assertEqual(payload["scan"]["home"], "/home/user")
+        self.assertEqual(payload["unmanaged_files"], [])
+        self.assertEqual(timeline["events"][-1]["event"]["scan"], payload["scan"])
+        self.assertFalse(smu.smu_contract.json_contract_errors("drift-doctor", payload))
+
     def test_drift_payload_includes_state_engines(self):
         with patch.object(smu, "adapter_conflict_report", return_value={"conflicted": False, "items": []}), \
                 patch.object(smu, "config_drift_report", return_value={"drifted": False, "items": []}), \
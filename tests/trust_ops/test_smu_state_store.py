@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import smu
+from tests.conftest import start_patches, temporary_dir
+
+
+class TestSqliteStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = temporary_dir(self)
+        self.state_dir = os.path.join(self.tempdir, "state")
+        start_patches(
+            self,
+            patch.object(smu, "state_dir", self.state_dir),
+            patch.object(smu, "state_ledger_path", os.path.join(self.state_dir, "ledger.json")),
+            patch.object(smu, "update_history_path", os.path.join(self.tempdir, "update-history.json")),
+            patch.object(smu, "update_lock_path", os.path.join(self.tempdir, "update.lock")),
+            patch.dict(os.environ, {"SMU_STATE_BACKEND": ""}),
+            patch.object(smu, "read_update_policy", return_value={
+                **smu.default_update_policy(), "history_limit": 2,
+            }),
+        )
+
+    def test_migration_imports_json_state_once(self):
+        smu.record_state_event("provision_modules", [{"module": "base"}])
+        smu.write_update_lock({"theme": "nord"})
+        self.assertEqual(smu.state_backend(), "json")
+
+        smu.migrate_state_to_sqlite()
+        self.assertEqual(smu.state_backend(), "sqlite")
+        with open(smu.state_ledger_path) as f:
+            json_ledger = json.load(f)
+        self.assertEqual(smu.read_state_ledger(), json_ledger)
+        self.assertEqual(smu.read_update_lock()["theme"], "nord")
+        self.assertEqual(len(smu.read_update_history()), 1)
+
+        smu.record_state_event("uninstall_modules", [{"module": "base"}])
+        smu.migrate_state_to_sqlite()
+        self.assertEqual([event["operation"] for event in smu.read_state_ledger()],
+                         ["provision_modules", "uninstall_modules"])
+        with open(smu.state_ledger_path) as f:
+            self.assertEqual(len(json.load(f)), 1)
+
+        with sqlite3.connect(smu.state_db_path()) as db:
+            self.assertEqual(db.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_reports_name_the_sqlite_database_after_migration(self):
+        smu.migrate_state_to_sqlite()
+        with patch.object(smu, "module_status_report", return_value=[]), \
+                patch.object(smu, "_read_adapter_manifest", return_value=[]), \
+                patch.object(smu, "config_drift_report", return_value={"drifted": False, "items": []}):
+            report = smu.status_report()
+        rollback = smu.rollback_doctor_payload()
+
+        self.assertEqual((report["ledger"]["backend"], report["ledger"]["path"]), ("sqlite", smu.state_db_path()))
+        self.assertEqual(report["updates"]["path"], smu.state_db_path())
+        self.assertEqual(report["updates"]["history_path"], smu.state_db_path())
+        self.assertEqual((rollback["backend"], rollback["path"]), ("sqlite", smu.state_db_path()))
+
+    def test_sqlite_ledger_lookup_pop_and_history_limit(self):
+        smu.migrate_state_to_sqlite()
+        smu.write_state_ledger([
+            {"id": "first", "operation": "a", "items": [{"module": "x"}, {"module": "y"}]},
+            {"id": "second", "operation": "b", "items": []},
+        ])
+
+        self.assertEqual(smu.state_event("first")["items"], [{"module": "x"}, {"module": "y"}])
+        self.assertEqual(smu.last_state_event()["id"], "second")
+        self.assertEqual(smu.pop_state_event("first")["operation"], "a")
+        self.assertEqual([event["id"] for event in smu.read_state_ledger()], ["second"])
+        self.assertEqual(smu.pop_last_state_event()["id"], "second")
+        self.assertIsNone(smu.last_state_event())
+
+        for theme in ("gruvbox", "nord", "dracula"):
+            smu.append_update_history({"theme": theme})
+        self.assertEqual([entry["theme"] for entry in smu.read_update_history()], ["nord", "dracula"])
+
+    def test_export_writes_json_files(self):
+        smu.migrate_state_to_sqlite()
+        smu.write_update_lock({"theme": "nord"})
+        smu.record_state_event("provision_modules", [{"module": "base"}])
+
+        paths = smu.export_state_json(os.path.join(self.tempdir, "export"))
+
+        with open(paths["ledger"]) as f:
+            self.assertEqual(json.load(f)[0]["items"], [{"module": "base"}])
+        with open(paths["update_lock"]) as f:
+            self.assertEqual(json.load(f)["theme"], "nord")
+        with open(paths["update_history"]) as f:
+            self.assertEqual(len(json.load(f)), 1)
+
+
+class TestSnapshotBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = temporary_dir(self)
+        state_dir = os.path.join(self.tempdir, "state")
+        start_patches(
+            self,
+            patch.object(smu, "state_dir", state_dir),
+            patch.object(smu, "state_ledger_path", os.path.join(state_dir, "ledger.json")),
+            patch.dict(os.environ, {"SMU_STATE_BACKEND": "json"}),
+            *(patch.object(smu, name, os.path.join(self.tempdir, "missing", name))
+              for name in ("update_schedule_path", "update_launchd_path", "update_systemd_dir",
+                           "catalog_cache_path", "module_index_path", "file_hash_cache_path",
+                           "drift_scan_cache_path", "tree_index_dir", "compiled_catalog_path", "http_cache_dir")),
+        )
+
+    def _write(self, name, content):
+        path = os.path.join(self.tempdir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_identical_content_is_stored_once_and_restored(self):
+        content = b"prompt adapter\n" * 4096
+        first = smu.file_snapshot(self._write("first", content))
+        second = smu.file_snapshot(self._write("second", content))
+
+        self.assertEqual(first["blob"], second["blob"])
+        self.assertNotIn("content_hex", first)
+        self.assertLess(os.path.getsize(smu.snapshot_blob_path(first["blob"])), len(content) // 10)
+
+        self._write("first", b"changed")
+        smu.restore_file_snapshot(first)
+        with open(os.path.join(self.tempdir, "first"), "rb") as f:
+            self.assertEqual(f.read(), content)
+
+    def test_legacy_hex_snapshots_still_restore(self):
+        path = self._write("legacy", b"after")
+        smu.restore_file_snapshot({"exists": True, "path": path, "type": "file", "content_hex": b"before".hex()})
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"before")
+
+    def test_prune_drops_old_events_and_unreferenced_blobs(self):
+        old = smu.file_snapshot(self._write("old", b"old"))
+        new = smu.file_snapshot(self._write("new", b"new"))
+        smu.write_state_ledger([
+            {"id": "1", "operation": "client_update", "items": [{"before": old}]},
+            {"id": "2", "operation": "client_update", "items": [{"before": new}]},
+        ])
+
+        with redirect_stdout(io.StringIO()):
+            smu.state_prune(["--dry-run"])
+        self.assertTrue(os.path.exists(smu.snapshot_blob_path(old["blob"])))
+
+        with redirect_stdout(io.StringIO()):
+            smu.state_prune(["--keep-events", "1"])
+
+        self.assertEqual([event["id"] for event in smu.read_state_ledger()], ["2"])
+        self.assertFalse(os.path.exists(smu.snapshot_blob_path(old["blob"])))
+        self.assertTrue(os.path.exists(smu.snapshot_blob_path(new["blob"])))
+
+    def test_prune_keeps_every_event_when_n_exceeds_the_ledger(self):
+        smu.write_state_ledger([{"id": str(index), "operation": "provision_modules", "items": []} for index in range(3)])
+
+        with redirect_stdout(io.StringIO()):
+            smu.state_prune(["--keep-events", "5"])
+
+        self.assertEqual([event["id"] for event in smu.read_state_ledger()], ["0", "1", "2"])
+
+    def test_prune_keeps_each_modules_latest_provision_or_uninstall(self):
+        smu.write_state_ledger([
+            {"id": "1", "operation": "provision_modules", "items": [{"module": "git", "fingerprint": "a"},
+                                                                   {"module": "node", "fingerprint": "b"}]},
+            {"id": "2", "operation": "provision_modules", "items": [{"module": "git", "fingerprint": "c"}]},
+            {"id": "3", "operation": "uninstall_modules", "items": [{"module": "fonts"}]},
+            {"id": "4", "operation": "client_update", "items": []},
+            {"id": "5", "operation": "client_update", "items": []},
+        ])
+        fingerprints = smu.recorded_module_fingerprints()
+
+        with redirect_stdout(io.StringIO()):
+            smu.state_prune(["--keep-events", "1"])
+
+        self.assertEqual([event["id"] for event in smu.read_state_ledger()], ["1", "2", "3", "5"])
+        self.assertEqual(smu.recorded_module_fingerprints(), fingerprints)
+
+
+class TestRollbackUntil(unittest.TestCase):
+    def test_restores_each_path_once_from_the_earliest_snapshot(self):
+        for backend in ("json", "sqlite"):
+            with self.subTest(backend=backend), tempfile.TemporaryDirectory() as tempdir:
+                state_dir = os.path.join(tempdir, "state")
+                target = os.path.join(tempdir, "prompt.bash")
+                with patch.object(smu, "state_dir", state_dir), \
+                        patch.object(smu, "state_ledger_path", os.path.join(state_dir, "ledger.json")), \
+                        patch.dict(os.environ, {"SMU_STATE_BACKEND": backend}):
+                    snapshots = []
+                    for content in ("original", "update-1", "update-2"):
+                        with open(target, "w") as f:
+                            f.write(content)
+                        snapshots.append(smu.file_snapshot(target))
+                    with open(target, "w") as f:
+                        f.write("update-3")
+                    smu.write_state_ledger([
+                        {"id": "keep", "operation": "provision_modules", "items": []},
+                        *({"id": f"u{index}", "operation": "client_update", "items": [{"before": snapshot}]}
+                          for index, snapshot in enumerate(snapshots)),
+                    ])
+
+                    plan = smu.rollback_until_plan("u0")
+                    self.assertEqual(plan["events"], ["u0", "u1", "u2"])
+                    self.assertEqual(plan["restore"], [snapshots[0]])
+
+                    with patch.object(smu, "restore_file_snapshot", wraps=smu.restore_file_snapshot) as restore, \
+                            patch.object(smu, "success"):
+                        self.assertTrue(smu.rollback_until_event("u0"))
+
+                    restore.assert_called_once_with(snapshots[0])
+                    with open(target) as f:
+                        self.assertEqual(f.read(), "original")
+                    self.assertEqual([event["id"] for event in smu.read_state_ledger()], ["keep"])
+                    self.assertFalse(smu.rollback_until_event("missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import smu
+from tests.conftest import start_patches, temporary_dir
+
+
+class TestTreeIndex(unittest.TestCase):
+    def setUp(self):
+        tempdir = temporary_dir(self)
+        self.root = os.path.join(tempdir, "set-me-up")
+        os.makedirs(os.path.join(self.root, "modules", "base"))
+        os.makedirs(os.path.join(self.root, "dotfiles"))
+        self._write("modules/base/base.sh", "echo base\n")
+        self._write("dotfiles/bashrc", "export PS1='$ '\n")
+        start_patches(
+            self,
+            patch.object(smu, "smu_home_dir", self.root),
+            patch.object(smu, "tree_index_dir", os.path.join(tempdir, "tree-index")),
+            patch.dict(smu._tree_index_state, clear=True),
+        )
+
+    def _write(self, rel_path, content):
+        path = os.path.join(self.root, rel_path)
+        with open(path, "w") as f:
+            f.write(content)
+        mtime = os.stat(path).st_mtime - 60
+        os.utime(path, (mtime, mtime))
+
+    def test_unchanged_files_are_not_hashed_again(self):
+        first = smu.tree_digest(self.root)
+        smu._tree_index_state.clear()
+
+        with patch.object(smu, "file_sha256", side_effect=AssertionError("file hashed again")):
+            self.assertEqual(smu.tree_digest(self.root), first)
+            self.assertEqual(
+                smu.tree_file_sha256(os.path.join(self.root, "dotfiles", "bashrc")),
+                smu.refresh_tree_index(self.root)["files"]["dotfiles/bashrc"][4],
+            )
+
+    def test_changes_since_an_earlier_digest(self):
+        before = smu.tree_digest(self.root)
+        self._write("dotfiles/bashrc", "export PS1='> '\n")
+        self._write("dotfiles/vimrc", "set number\n")
+        os.remove(os.path.join(self.root, "modules", "base", "base.sh"))
+
+        changes = smu.tree_changes_since(before, self.root)
+
+        self.assertEqual(sorted((change["path"], change["change"]) for change in changes), [
+            ("dotfiles/bashrc", "modified"),
+            ("dotfiles/vimrc", "added"),
+            ("modules/base/base.sh", "removed"),
+        ])
+        self.assertEqual(smu.tree_changes_since(smu.tree_digest(self.root), self.root), [])
+        self.assertIsNone(smu.tree_changes_since("0" * 64, self.root))
+
+    def test_secrets_scan_only_reads_changed_files(self):
+        self.assertTrue(smu.secrets_scan(self.root)["ok"])
+        self._write("dotfiles/gitconfig", "token = abcdefghijklmnopqrstuvwxyz\n")
+
+        with patch.object(smu, "_secret_finding", wraps=smu._secret_finding) as inspected:
+            payload = smu.secrets_scan(self.root)
+
+        self.assertEqual(payload["findings"], [{"path": "dotfiles/gitconfig", "risk": "secret-like-content"}])
+        self.assertEqual([call.args[1] for call in inspected.call_args_list], ["dotfiles/gitconfig"])
+
+    def test_secrets_scan_of_another_root_walks_it_without_an_index(self):
+        with tempfile.TemporaryDirectory() as other:
+            os.makedirs(os.path.join(other, "Caches"))
+            with open(os.path.join(other, "Caches", "gitconfig"), "w") as f:
+                f.write("token = abcdefghijklmnopqrstuvwxyz\n")
+            with open(os.path.join(other, "gitconfig"), "w") as f:
+                f.write("token = abcdefghijklmnopqrstuvwxyz\n")
+
+            with patch.object(smu, "refresh_tree_index", side_effect=AssertionError("indexed")):
+                payload = smu.secrets_scan(other)
+
+        self.assertEqual(payload["findings"], [{"path": "gitconfig", "risk": "secret-like-content"}])
+
+    def test_lock_records_the_tree_digest(self):
+        with patch.object(smu, "blueprint_registry_payload", return_value={"blueprints": []}), \
+                patch.object(smu, "_package_manager_state", return_value={}), \
+                patch.object(smu, "config_drift_report", return_value={"items": []}):
+            payload = smu.blueprint_lock_payload(["--root", self.root])
+
+        self.assertEqual(payload["tree"], {"digest": smu.tree_digest(self.root)})
+
+
+if __name__ == "__main__":
+    unittest.main()